@@ -0,0 +1,72 @@
+import getopt, sys, os
+
+from java import batch, watch
+
+_CACHE_DIR_ENV = 'JSON_SCHEMA_CACHE_DIR'
+
+def _printUsage():
+    print('usage:')
+    print('python3 batch-for-java.py [ -j|--jobs <number of processes> ] [ -c|--cache-dir <cache directory> ] ' +
+          '[ -w|--watch ] <manifest file>')
+    print('')
+    print('  The manifest lists the schemas to generate in one run. The number of processes defaults to')
+    print('  the number of CPUs. The cache directory can also be given by the environment variable')
+    print('  ' + _CACHE_DIR_ENV + '.')
+    print('')
+    print('  With --watch, the generator stays running after generating the schemas, and regenerates those')
+    print('  whose schema files change, or whose generated files are changed or removed, in one process.')
+
+def _parseJobs(a):
+    try:
+        jobs = int(a)
+    except ValueError:
+        jobs = 0
+    if jobs < 1:
+        print('error: number of processes must be a positive integer: ' + a)
+        _printUsage()
+        sys.exit(1)
+    return jobs
+
+def main():
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "j:c:w", ['jobs=', 'cache-dir=', 'watch'])
+    except getopt.GetoptError as err:
+        print(err)
+        _printUsage()
+        sys.exit(1)
+
+    if len(args) != 1:
+        _printUsage()
+        sys.exit(1)
+
+    jobs = os.cpu_count() or 1
+    cacheDir = os.environ.get(_CACHE_DIR_ENV)   # default is not to use a cache
+    watchMode = False
+
+    for o, a in opts:
+        if o == '-j' or o == '--jobs':
+            jobs = _parseJobs(a)
+        elif o == '-c' or o == '--cache-dir':
+            cacheDir = a
+        elif o == '-w' or o == '--watch':
+            watchMode = True
+        else:
+            assert False, ('illegal option ' + o)
+
+    entries = batch.readManifest(args[0])
+    if watchMode:
+        try:
+            watch.Watcher(entries, cacheDir).run()
+        except KeyboardInterrupt:
+            print('')
+            print('stopped watching')
+        return
+
+    failed = batch.generateAll(entries, jobs, cacheDir)
+    if len(failed) > 0:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
+elif __name__ != '__mp_main__':     # worker processes started by 'spawn' import this as __mp_main__
+    raise Exception('can only be run')
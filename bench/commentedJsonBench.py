@@ -0,0 +1,165 @@
+import io
+import os
+import ast
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from external.jsmin import jsmin
+from common import commentedJson
+from bench import synthSchema
+
+# checks common.commentedJson against jsmin followed by json.loads on the inputs of the jsmin test cases and on
+# the JSON files of the repository, and compares their speed on a large commented schema.
+#
+# usage: python3 -m bench.commentedJsonBench [ <number of structs> [ <repetitions> ] ]
+
+_rootDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_jsminTestPath = os.path.join(_rootDir, 'external', 'jsmin', 'test.py')
+_jsonFilePaths = [ os.path.join(_rootDir, 'examples', f) for f in sorted(os.listdir(os.path.join(_rootDir, 'examples')))
+                   if f.endswith('.json') ] + [ os.path.join(_rootDir, 'test-for-java.manifest.json') ]
+
+# inputs of the jsmin test cases: the strings assigned to js or passed first to assertMinified and _minify
+def _getCorpus():
+    corpus = []
+    for node in ast.walk(ast.parse(open(_jsminTestPath, encoding='utf-8').read())):
+        if isinstance(node, ast.Assign):
+            if any(map(lambda t: isinstance(t, ast.Name) and t.id == 'js', node.targets)):
+                value = node.value
+            else:
+                continue
+        elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and
+              node.func.attr in ('assertMinified', '_minify') and len(node.args) > 0):
+            value = node.args[0]
+        else:
+            continue
+
+        if isinstance(value, ast.Constant) and isinstance(value.value, str):
+            corpus.append(value.value)
+    return list(dict.fromkeys(corpus))
+
+# the JSON files of the repository, the example schemas and the commented test manifest
+def _getDocuments():
+    docs = []
+    for p in _jsonFilePaths:
+        with open(p, encoding='utf-8') as f:
+            docs.append(f.read())
+    return docs
+
+# a document with a jsmin test input put in a comment after its line of the given number: a block comment, or
+# line comments if the input ends a block comment
+def _commentOut(doc, lineNo, text):
+    lines = doc.split('\n')
+    lineNo = lineNo % len(lines)
+    if '*/' in text:
+        comment = '\n'.join(map(lambda l: '// ' + l, text.split('\n')))
+    else:
+        comment = '/*' + text + '*/'
+    return '\n'.join(lines[:lineNo + 1] + [ comment ] + lines[lineNo + 1:])
+
+def _loadByJsmin(text):
+    return json.loads(jsmin(text))
+
+def _tryLoad(load, text):
+    try:
+        return (True, load(text))
+    except Exception:
+        return (False, None)
+
+# each jsmin input is checked three ways:
+#  - embedded as a string value in a commented JSON document, which both readers must give back as it is,
+#    whatever comment markers and escapes it has
+#  - commented out in one of the documents, which both readers must read as the document without it
+#  - as it is, which both readers must agree on if it is JSON once its comments are stripped, which few are.
+# the documents themselves are checked as they are as well. returns the failures and the number of inputs
+# which were JSON once stripped
+def _checkCorpus(corpus, docs):
+    failures = []
+    asJson = 0
+
+    def checkAsItIs(i, how, text):
+        (jsminOk, jsminVal) = _tryLoad(_loadByJsmin, text)
+        if jsminOk:
+            if _tryLoad(lambda t: commentedJson.loads(t), text) != (True, jsminVal):
+                failures.append((i, how, text))
+        return jsminOk
+
+    for i, doc in enumerate(docs):
+        if checkAsItIs(i, 'document', doc):
+            asJson += 1
+
+    for i, text in enumerate(corpus):
+        doc = ('/* case ' + str(i) + ' */\n{\n    "js": ' + json.dumps(text) + ',   // the input\n' +
+               '    "n": [ 1, /* two */ 2 ]\n}\n// end')
+        expected = { 'js': text, 'n': [ 1, 2 ] }
+        if _tryLoad(lambda t: commentedJson.loads(t), doc) != (True, expected):
+            failures.append((i, 'embedded', text))
+
+        doc = docs[i % len(docs)]
+        (docOk, docVal) = _tryLoad(_loadByJsmin, doc)
+        if docOk:
+            commented = _commentOut(doc, i, text)
+            if _tryLoad(_loadByJsmin, commented) == (True, docVal):
+                asJson += 1
+                if _tryLoad(lambda t: commentedJson.loads(t), commented) != (True, docVal):
+                    failures.append((i, 'commented out', text))
+
+        if checkAsItIs(i, 'as it is', text):
+            asJson += 1
+
+    return (failures, asJson)
+
+# a schema of the given size as indented JSON with line and block comments between its lines
+def _makeCommentedSchema(numStructs):
+    lines = json.dumps(synthSchema.makeSchema(numStructs=numStructs), indent=4).split('\n')
+    out = io.StringIO()
+    for i, line in enumerate(lines):
+        if i % 7 == 3:
+            out.write('/* block comment\n   of line ' + str(i) + ' */\n')
+        out.write(line)
+        if i % 3 == 1:
+            out.write('    // line comment with "quotes" and /* markers */')
+        out.write('\n')
+    return out.getvalue()
+
+def _best(fn, reps):
+    best = None
+    for _ in range(reps):
+        start = time.perf_counter()
+        val = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best == None else min(best, elapsed)
+    return (best, val)
+
+def main():
+    numStructs = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    reps = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    corpus = _getCorpus()
+    docs = _getDocuments()
+    (failures, asJson) = _checkCorpus(corpus, docs)
+    print('corpus: ' + str(len(corpus)) + ' jsmin test inputs and ' + str(len(docs)) + ' JSON files, ' +
+          str(asJson) + ' inputs JSON once stripped, ' + str(len(failures)) + ' failures')
+    for i, how, text in failures:
+        print('  failed case ' + str(i) + ' (' + how + '): ' + repr(text[:60]))
+    if asJson == 0:
+        print('  no input is JSON once stripped, so the readers have not been compared')
+
+    text = _makeCommentedSchema(numStructs)
+    (jsminTime, jsminVal) = _best(lambda: _loadByJsmin(text), reps)
+    (readerTime, readerVal) = _best(lambda: commentedJson.loads(text), reps)
+    if jsminVal != readerVal:
+        raise Exception('jsmin and commentedJson read the commented schema differently')
+
+    print('commented schema: %.1fMB, best of %d' % (len(text) / 1e6, reps))
+    print('  jsmin + json.loads: %8.1f ms' % (jsminTime * 1000))
+    print('  commentedJson:      %8.1f ms' % (readerTime * 1000))
+    print('  speedup:            %8.1fx' % (jsminTime / readerTime))
+
+    if len(failures) > 0 or asJson == 0:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import io
+import os
+import sys
+import tempfile
+import contextlib
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import schemaParser, sampleGenerator
+from java import loaderGenerator
+from bench import synthSchema
+
+# compares the peak memory of generating the loader class as one string (getClassDef) against writing it to
+# the file fragment by fragment (writeClassDef), for synthetic schemas of growing sizes.
+#
+# usage: python3 -m bench.emitBench [ <number of structs> ... ]
+
+def _peakOf(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def main():
+    sizes = list(map(int, sys.argv[1:])) if len(sys.argv) > 1 else [ 20, 40, 80, 160 ]
+
+    print('%8s %12s %14s %14s' % ('structs', 'output', 'getClassDef', 'writeClassDef'))
+    with tempfile.TemporaryDirectory() as tmpDir:
+        for numStructs in sizes:
+            schemaPath = tmpDir + '/synth.schema.json'
+            synthSchema.writeSchema(schemaPath, numStructs=numStructs)
+            with contextlib.redirect_stdout(io.StringIO()):
+                (enumDef, structDef, arrElemTypes) = schemaParser.parse('synth', [ schemaPath ])
+                fldComments = sampleGenerator.generate(tmpDir + '/synth.sample.json', enumDef, structDef, 'synth')
+            args = ('synth', enumDef, structDef, arrElemTypes, True, fldComments)
+
+            outPath = tmpDir + '/SynthBase.java'
+            def writeWhole():
+                with open(outPath, 'w') as f:
+                    f.write(loaderGenerator.getClassDef(*args))
+            def writeStreamed():
+                with open(outPath, 'w') as f:
+                    loaderGenerator.writeClassDef(f, *args)
+
+            wholePeak = _peakOf(writeWhole)
+            streamedPeak = _peakOf(writeStreamed)
+            print('%8d %10.1fMB %12.1fMB %12.1fMB' % (len(structDef), os.path.getsize(outPath) / 1e6,
+                  wholePeak / 1e6, streamedPeak / 1e6))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+import io
+import os
+import sys
+import time
+import getopt
+import shutil
+import tempfile
+import statistics
+import subprocess
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from java import generator, misc
+from bench import synthSchema, suite
+
+# compares the startup of the implementation classes which embed the schema in string constants (the default)
+# and which read it from resources (--resource-dir). A synthetic schema of a case of the benchmark suite is
+# generated in both modes and compiled along with a main class, which is run a number of times, each in a new
+# JVM, to time the loading and initialization of the implementation class and then the construction of the
+# configuration from the sample. The medians are reported, with the size of the class files and the resources.
+# The schema constant of the default mode cannot exceed 65535 bytes, so bigger schemas fail to compile in it.
+#
+# javac and java must be on the PATH, and the class path must have the jsonschemalib, jsonden and minify jars.
+#
+# usage: python3 -m bench.startupBench -c|--classpath <class path> [ -r|--runs <runs> ] [ <case> ... ]
+
+_DEFAULT_RUNS = 10
+_DEFAULT_CASES = [ 'small', 'wide' ]
+
+_CLASS_PKG = 'synth.conf'
+_INTF_PKG = 'synth.intf'
+
+_mainClass = '''\
+package %s;
+
+public class StartupMain {
+    public static void main(String[] args) throws Exception {
+        long t0 = System.nanoTime();
+        Class.forName("%s.%s");
+        long t1 = System.nanoTime();
+        new %s(args[0], false, false);
+        long t2 = System.nanoTime();
+        System.out.println((t1 - t0) + " " + (t2 - t1));
+    }
+}
+'''
+
+modes = [ 'string', 'resource' ]
+
+# generate and compile a schema in a mode into dir, returning the directory of the classes and resources, or
+# None if it fails to compile
+def _build(schemaPath, dir, mode, classPath):
+    srcDir = dir + '/src'
+    clsDir = dir + '/classes'
+    os.makedirs(srcDir)
+    os.makedirs(clsDir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        generator.generate('synth', dir, srcDir, _CLASS_PKG, _INTF_PKG, None, [ schemaPath ],
+                           resourceDir=(clsDir if mode == 'resource' else None))
+
+    clasName = misc.getClasName('synth')
+    with open(srcDir + '/' + _CLASS_PKG.replace('.', '/') + '/StartupMain.java', 'w') as f:
+        f.write(_mainClass % (_CLASS_PKG, _CLASS_PKG, clasName, clasName))
+
+    sources = [ os.path.join(d, name) for d, _, names in os.walk(srcDir) for name in names if name.endswith('.java') ]
+    proc = subprocess.run([ 'javac', '-nowarn', '-cp', classPath, '-d', clsDir ] + sources,
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    if proc.returncode != 0:
+        print('failed to compile the ' + mode + ' mode: ' + proc.stdout.strip().split('\n')[0])
+        return None
+    return clsDir
+
+def _runOnce(clsDir, samplePath, classPath):
+    start = time.perf_counter()
+    out = subprocess.run([ 'java', '-cp', clsDir + os.pathsep + classPath, _CLASS_PKG + '.StartupMain',
+                           samplePath ], stdout=subprocess.PIPE, check=True, universal_newlines=True).stdout
+    jvm = time.perf_counter() - start
+    (init, construct) = map(int, out.split()[-2:])
+    return (init / 1e9, construct / 1e9, jvm)
+
+def _getSize(clsDir, suffix):
+    return sum(os.path.getsize(os.path.join(d, name))
+               for d, _, names in os.walk(clsDir) for name in names if name.endswith(suffix))
+
+def runCase(name, runs, classPath):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpDir:
+        schemaPath = tmpDir + '/synth.schema.json'
+        synthSchema.writeSuiteSchema(schemaPath, **suite.cases[name])
+        for mode in modes:
+            dir = tmpDir + '/' + mode
+            clsDir = _build(schemaPath, dir, mode, classPath)
+            if clsDir == None:
+                continue
+
+            times = [ _runOnce(clsDir, dir + '/synth.sample.json', classPath) for _ in range(runs) ]
+            results[mode] = {
+                'init': statistics.median(t[0] for t in times),
+                'construct': statistics.median(t[1] for t in times),
+                'jvm': statistics.median(t[2] for t in times),
+                'class-size': _getSize(clsDir, '.class'),
+                'resource-size': _getSize(clsDir, '.json'),
+            }
+    return results
+
+def _printUsage():
+    print('usage:')
+    print('python3 -m bench.startupBench -c|--classpath <class path> [ -r|--runs <runs> ] [ <case> ... ]')
+    print('')
+    print('  cases: ' + ', '.join(suite.cases.keys()) + ' (' + ', '.join(_DEFAULT_CASES) + ' by default)')
+
+def main():
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "c:r:", ['classpath=', 'runs='])
+    except getopt.GetoptError as err:
+        print(err)
+        _printUsage()
+        sys.exit(1)
+
+    classPath = os.environ.get('CLASSPATH')
+    runs = _DEFAULT_RUNS
+    for o, a in opts:
+        if o == '-c' or o == '--classpath':
+            classPath = a
+        elif o == '-r' or o == '--runs':
+            runs = int(a)
+        else:
+            assert False, ('illegal option ' + o)
+
+    for name in args:
+        if not name in suite.cases:
+            print('unknown case ' + name)
+            _printUsage()
+            sys.exit(1)
+    if classPath == None:
+        print('the class path of the runtime libraries is not given')
+        _printUsage()
+        sys.exit(1)
+    for tool in [ 'javac', 'java' ]:
+        if shutil.which(tool) == None:
+            print(tool + ' is not found on the PATH')
+            sys.exit(1)
+
+    print('%-14s %-9s %10s %11s %10s %10s %10s' % ('case', 'mode', 'init', 'construct', 'jvm', 'classes',
+                                                  'resources'))
+    for name in (args if args else _DEFAULT_CASES):
+        for mode, r in runCase(name, runs, classPath).items():
+            print('%-14s %-9s %8.1fms %9.1fms %8.1fms %8.1fKB %8.1fKB' % (name, mode, r['init'] * 1000,
+                  r['construct'] * 1000, r['jvm'] * 1000, r['class-size'] / 1e3, r['resource-size'] / 1e3))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+import io
+import os
+import sys
+import json
+import time
+import getopt
+import platform
+import tempfile
+import contextlib
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import schemaParser, sampleGenerator
+from java import loaderGenerator
+from bench import synthSchema
+
+# benchmark suite of the generator phases over synthetic schemas of various shapes (see
+# synthSchema.makeSuiteSchema). Each phase of each case is timed separately, as the best of some repetitions,
+# and its peak of traced memory is measured in a separate run, since tracing slows the run down. The results
+# are written to a JSON file, which can later be given as the baseline of another run: the run then fails when
+# a phase takes more time or memory than in the baseline by more than the tolerance.
+#
+# usage: python3 -m bench.suite [ -o|--output <results file> ] [ -b|--baseline <results file> ]
+#                               [ -t|--tolerance <percent> ] [ -r|--repeat <repetitions> ] [ <case> ... ]
+
+_DEFAULT_OUTPUT = 'bench-results.json'
+_DEFAULT_TOLERANCE = 30     # percent
+_DEFAULT_REPEAT = 3
+
+# differences below these are noise rather than regressions, whatever the ratio
+_MIN_TIME_DIFF = 0.005      # seconds
+_MIN_PEAK_DIFF = 256 * 1024 # bytes
+
+# the sample of nested structs doubles with each level of depth
+cases = {
+    'small':        dict(numStructs=8, depth=1, fanOut=6),
+    'wide':         dict(numStructs=40, depth=0, fanOut=40),
+    'deep':         dict(numStructs=4, depth=4, fanOut=4),
+    'many-structs': dict(numStructs=400, depth=0, fanOut=8),
+    'big-enums':    dict(numStructs=40, depth=0, fanOut=12, numEnums=16, enumSize=500),
+    'arrays':       dict(numStructs=80, depth=0, fanOut=12,
+                         elemTypes=('int8', 'uint64', 'float', 'bool', 'string', 'enum', 'struct')),
+    'extends':      dict(numStructs=8, depth=0, fanOut=8, extendsChains=30, extendsDepth=8),
+}
+
+phases = [ 'parse', 'sample', 'interface', 'class' ]
+
+def _runPhases(schemaPath, tmpDir, measure):
+    with contextlib.redirect_stdout(io.StringIO()):
+        (enumDef, structDef, arrElemTypes) = measure('parse', lambda: schemaParser.parse('synth', [ schemaPath ]))
+        fldComments = measure('sample', lambda: sampleGenerator.generate(tmpDir + '/synth.sample.json', enumDef,
+                                                                         structDef, 'synth'))
+        measure('interface', lambda: loaderGenerator.writeIntf(io.StringIO(), enumDef, structDef, 'synth'))
+        measure('class', lambda: loaderGenerator.getClassDef('synth', enumDef, structDef, arrElemTypes, True,
+                                                             fldComments))
+
+def _timePhases(schemaPath, tmpDir, repeat):
+    times = {}
+    def measure(phase, fn):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        times[phase] = min(times.get(phase, elapsed), elapsed)
+        return result
+
+    for _ in range(repeat):
+        _runPhases(schemaPath, tmpDir, measure)
+    return times
+
+def _tracePhases(schemaPath, tmpDir):
+    peaks = {}
+    def measure(phase, fn):
+        tracemalloc.start()
+        try:
+            result = fn()
+            peaks[phase] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return result
+
+    _runPhases(schemaPath, tmpDir, measure)
+    return peaks
+
+def runCase(name, repeat):
+    params = cases[name]
+    with tempfile.TemporaryDirectory() as tmpDir:
+        schemaPath = tmpDir + '/synth.schema.json'
+        synthSchema.writeSuiteSchema(schemaPath, **params)
+        times = _timePhases(schemaPath, tmpDir, repeat)
+        peaks = _tracePhases(schemaPath, tmpDir)
+        schemaSize = os.path.getsize(schemaPath)
+
+    return {
+        'params': json.loads(json.dumps(params)),   # as read back from a results file
+        'schema-size': schemaSize,
+        'phases': { p: { 'time': times[p], 'peak': peaks[p] } for p in phases },
+    }
+
+# return the list of regressions of results against baseline, for the cases and phases in both
+def compare(results, baseline, tolerance):
+    regressions = []
+    factor = 1 + tolerance / 100
+    for name, case in results['cases'].items():
+        baseCase = baseline['cases'].get(name)
+        if baseCase == None:
+            continue
+        if baseCase['params'] != case['params']:
+            print('warning: case ' + name + ' has other parameters in the baseline, not compared')
+            continue
+
+        for phase, m in case['phases'].items():
+            baseM = baseCase['phases'].get(phase)
+            if baseM == None:
+                continue
+            if m['time'] > baseM['time'] * factor and m['time'] - baseM['time'] > _MIN_TIME_DIFF:
+                regressions.append('%s/%s: time %.1f ms -> %.1f ms' % (name, phase, baseM['time'] * 1000,
+                                                                      m['time'] * 1000))
+            if m['peak'] > baseM['peak'] * factor and m['peak'] - baseM['peak'] > _MIN_PEAK_DIFF:
+                regressions.append('%s/%s: peak memory %.1f MB -> %.1f MB' % (name, phase, baseM['peak'] / 1e6,
+                                                                             m['peak'] / 1e6))
+    return regressions
+
+def _printUsage():
+    print('usage:')
+    print('python3 -m bench.suite [ -o|--output <results file> ] [ -b|--baseline <results file> ] ' +
+          '[ -t|--tolerance <percent> ] [ -r|--repeat <repetitions> ] [ <case> ... ]')
+    print('')
+    print('  Results are written to ' + _DEFAULT_OUTPUT + ' by default. With a baseline, the exit code is 1')
+    print('  when a phase regresses by more than the tolerance, ' + str(_DEFAULT_TOLERANCE) + '% by default.')
+    print('  cases: ' + ', '.join(cases.keys()))
+
+def main():
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "o:b:t:r:",
+                                   ['output=', 'baseline=', 'tolerance=', 'repeat='])
+    except getopt.GetoptError as err:
+        print(err)
+        _printUsage()
+        sys.exit(1)
+
+    output = _DEFAULT_OUTPUT
+    baselinePath = None
+    tolerance = _DEFAULT_TOLERANCE
+    repeat = _DEFAULT_REPEAT
+
+    for o, a in opts:
+        if o == '-o' or o == '--output':
+            output = a
+        elif o == '-b' or o == '--baseline':
+            baselinePath = a
+        elif o == '-t' or o == '--tolerance':
+            tolerance = float(a)
+        elif o == '-r' or o == '--repeat':
+            repeat = int(a)
+        else:
+            assert False, ('illegal option ' + o)
+
+    for name in args:
+        if not name in cases:
+            print('unknown case ' + name)
+            _printUsage()
+            sys.exit(1)
+
+    # read the baseline first, which may be the output file of the previous run
+    baseline = None
+    if baselinePath:
+        with open(baselinePath, 'r') as f:
+            baseline = json.load(f)
+
+    results = { 'python': platform.python_version(), 'repeat': repeat, 'cases': {} }
+    print('%-14s %10s' % ('case', 'schema') + ''.join('%18s' % p for p in phases))
+    for name in (args if args else cases.keys()):
+        case = runCase(name, repeat)
+        results['cases'][name] = case
+        print('%-14s %8.1fKB' % (name, case['schema-size'] / 1e3) +
+              ''.join('%9.1fms %5.1fMB' % (case['phases'][p]['time'] * 1000, case['phases'][p]['peak'] / 1e6)
+                      for p in phases))
+
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print('results written to ' + output)
+
+    if baseline != None:
+        regressions = compare(results, baseline, tolerance)
+        if len(regressions) > 0:
+            print(str(len(regressions)) + ' regression(s) against ' + baselinePath + ':')
+            for r in regressions:
+                print('  ' + r)
+            sys.exit(1)
+        print('no regression against ' + baselinePath)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+import json
+
+# builds a large synthetic schema exercising every kind of field the generators handle: built-in types,
+# enums, structs, arrays of them, implicit nested structs and settable fields.
+#
+# structs s0, s1, ... each have fldsPerStruct fields, and struct si refers to s(i+1) within groups of four so
+# that the nested classes, pprint and set methods all recurse. (samples are expanded per path, so longer chains
+# grow the output exponentially rather than linearly in numStructs.)
+def makeSchema(numStructs=60, fldsPerStruct=12, numEnums=8):
+    schema = {}
+
+    for e in range(numEnums):
+        schema['%enum e' + str(e)] = [ 'E' + str(e) + '_' + str(i) for i in range(6) ]
+
+    builtIns = [ ('int32', 1), ('uint64', 2), ('float', 0.5), ('bool', True), ('string', 'x'), ('int8', 3) ]
+    for s in range(numStructs):
+        body = {}
+        for f in range(fldsPerStruct):
+            name = 'f' + str(f)
+            kind = f % 6
+            settable = (f % 2 == 0)
+            if kind == 0 or kind == 1:
+                ty, val = builtIns[(s + f) % len(builtIns)]
+                body[name] = { '%type': ty, '%default': val, '%desc': 'field ' + name + ' of s' + str(s) }
+            elif kind == 2:
+                enum = 'e' + str((s + f) % numEnums)
+                body[name] = { '%type': enum, '%default': 'E' + str((s + f) % numEnums) + '_0' }
+            elif kind == 3:
+                ty, val = builtIns[(s + f) % len(builtIns)]
+                body[name] = { '%type': [ ty ], '%default': [ val, val ] }
+            elif kind == 4:
+                if (s + 1) % 4 != 0 and s + 1 < numStructs:
+                    body[name] = { '%type': [ 's' + str(s + 1) ], '%default': [] }
+                else:
+                    body[name] = { '%type': [ 'e0' ], '%default': [ 'E0_1' ] }
+            else:
+                body[name] = { '%type': {
+                    'a': { '%type': 'int16', '%default': 4, '%settable': True },
+                    'b': { '%type': [ 'string' ], '%default': [ 'y' ], '%settable': True },
+                }, '%default': {} }
+            if settable:
+                body[name]['%settable'] = True
+        schema['%struct s' + str(s)] = body
+
+    for s in range(0, numStructs, 4):
+        schema['top' + str(s)] = { '%type': 's' + str(s), '%default': {}, '%settable': True }
+        schema['tops' + str(s)] = { '%type': [ 's' + str(s) ], '%default': [], '%settable': True }
+
+    return schema
+
+def writeSchema(path, **kwargs):
+    with open(path, 'w') as f:
+        json.dump(makeSchema(**kwargs), f, indent=4)
+
+_builtInSamples = {
+    'int8': -3, 'int16': 300, 'int32': 70000, 'int64': 1 << 40,
+    'uint8': 200, 'uint16': 60000, 'uint32': 1 << 31, 'uint64': '0xffffffffffffffff',
+    'float': 0.5, 'bool': True, 'string': 'x',
+}
+_builtInCycle = [ 'int32', 'string', 'float', 'bool', 'uint64', 'int8', 'uint16', 'int64' ]
+
+# builds a synthetic schema of the given shape for the benchmark suite:
+#   numStructs      named structs s0, s1, ..., each referring to the next one within groups of four through
+#                   an array field (longer reference chains grow the sample exponentially)
+#   depth           levels of implicit nested structs in each named struct, one nested field per level
+#   fanOut          fields of each struct and of each nested level
+#   numEnums        enums e0, e1, ..., of enumSize items each
+#   elemTypes       element types of array fields, built-in type names or 'enum' or 'struct'
+#   extendsChains   chains of structs of extendsDepth structs each, every one extending the previous one, on
+#                   top of an abstract base
+def makeSuiteSchema(numStructs=40, depth=2, fanOut=8, numEnums=4, enumSize=8,
+                    elemTypes=('int32', 'string', 'enum', 'struct'), extendsChains=2, extendsDepth=3):
+    schema = {}
+
+    for e in range(max(numEnums, 1)):
+        schema['%enum e' + str(e)] = [ 'E' + str(e) + '_' + str(i) for i in range(max(enumSize, 1)) ]
+
+    def enumOf(n):
+        e = n % max(numEnums, 1)
+        return ('e' + str(e), 'E' + str(e) + '_' + str(n % max(enumSize, 1)))
+
+    def arrayField(s, n):
+        kind = elemTypes[n % len(elemTypes)]
+        if kind == 'struct':
+            if s != None and (s + 1) % 4 != 0 and s + 1 < numStructs:
+                return { '%type': [ 's' + str(s + 1) ], '%default': [] }
+            kind = 'enum'
+        if kind == 'enum':
+            ty, val = enumOf(n)
+        else:
+            ty, val = kind, _builtInSamples[kind]
+        return { '%type': [ ty ], '%default': [ val, val ], '%sample': [ val ] }
+
+    # fields of a struct or a nested level. s is the index of the named struct, None in extends chains
+    def fields(prefix, s, n, level):
+        body = {}
+        refDone = False
+        for f in range(fanOut):
+            name = prefix + 'f' + str(f)
+            kind = (n + f) % 4
+            if kind == 0:
+                ty = _builtInCycle[(n + f) % len(_builtInCycle)]
+                body[name] = { '%type': ty, '%default': _builtInSamples[ty], '%desc': 'field ' + name }
+            elif kind == 1:
+                ty, val = enumOf(n + f)
+                body[name] = { '%type': ty, '%default': val, '%sample': val }
+            elif kind == 2 or refDone:
+                body[name] = arrayField(None, n + f)
+            else:
+                body[name] = arrayField(s, n + f)
+                refDone = True
+            if f % 2 == 0:
+                body[name]['%settable'] = True
+        if level < depth:
+            body[prefix + 'nested'] = { '%type': fields(prefix, s, n + 1, level + 1), '%default': {},
+                                        '%settable': True }
+        return body
+
+    for s in range(numStructs):
+        schema['%struct s' + str(s)] = fields('', s, s, 0)
+
+    for c in range(extendsChains):
+        base = 'c' + str(c) + '_0'
+        schema['%struct ' + base + ' abstract'] = fields(base + '_', None, c, depth)
+        for d in range(1, extendsDepth + 1):
+            name = 'c' + str(c) + '_' + str(d)
+            schema['%struct ' + name + ' extends c' + str(c) + '_' + str(d - 1)] = fields(name + '_', None, c + d, depth)
+        schema['chain' + str(c)] = { '%type': 'c' + str(c) + '_' + str(extendsDepth), '%default': None,
+                                     '%settable': True }
+
+    for s in range(0, numStructs, 4):
+        schema['top' + str(s)] = { '%type': 's' + str(s), '%default': None, '%settable': True }
+        schema['tops' + str(s)] = { '%type': [ 's' + str(s) ], '%default': [], '%settable': True }
+
+    return schema
+
+def writeSuiteSchema(path, **kwargs):
+    with open(path, 'w') as f:
+        json.dump(makeSuiteSchema(**kwargs), f, indent=4)
@@ -0,0 +1,97 @@
+import os
+import sys
+import json
+import tarfile
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench import synthSchema
+
+# compares rendering the loader class of a large synthetic schema by the generator before its templates were
+# compiled, which substituted each slot with a str.replace pass over the whole text, and by the generator of
+# the commit which compiled them. Both are checked out of the git history of this repository, the commit which
+# added common/template.py and its parent, and run in processes of their own. They generate the same class.
+#
+# usage: python3 -m bench.templateBench [ <number of structs> [ <repetitions> ] ]
+
+_rootDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# run in the checked out tree: parses the schema, times getClassDef and writes the class and the best time
+_timer = '''
+import io, sys, json, time, contextlib
+tree, schemaPath, sampleDir, outPath, reps = sys.argv[1:6]
+sys.path.insert(0, tree)
+from common import schemaParser, sampleGenerator
+from java import loaderGenerator
+
+with contextlib.redirect_stdout(io.StringIO()):
+    (enumDef, structDef, arrElemTypes) = schemaParser.parse('synth', [ schemaPath ])
+    fldComments = sampleGenerator.generate(sampleDir + '/synth.sample.json', enumDef, structDef, 'synth')
+
+best = None
+for _ in range(int(reps)):
+    start = time.perf_counter()
+    clasDef = loaderGenerator.getClassDef('synth', enumDef, structDef, arrElemTypes, True, fldComments)
+    elapsed = time.perf_counter() - start
+    best = elapsed if best == None else min(best, elapsed)
+
+with open(outPath, 'w') as f:
+    json.dump({ 'time': best, 'class': clasDef, 'structs': len(structDef), 'enums': len(enumDef) }, f)
+'''
+
+def _git(*args):
+    return subprocess.run([ 'git' ] + list(args), cwd=_rootDir, check=True, stdout=subprocess.PIPE,
+                          universal_newlines=True).stdout.strip()
+
+# the commit which compiled the templates and its parent
+def _getRevisions():
+    added = _git('log', '--diff-filter=A', '--format=%H', '--', 'common/template.py').split('\n')
+    if added == [ '' ]:
+        raise Exception('common/template.py is not in the git history')
+    after = added[-1]
+    return (_git('rev-parse', after + '~1'), after)
+
+def _checkout(rev, dirPath):
+    os.makedirs(dirPath)
+    archive = subprocess.run([ 'git', 'archive', rev, 'common', 'java', 'external' ], cwd=_rootDir, check=True,
+                             stdout=subprocess.PIPE).stdout
+    with tempfile.TemporaryFile() as f:
+        f.write(archive)
+        f.seek(0)
+        with tarfile.open(fileobj=f) as tar:
+            tar.extractall(dirPath)
+
+def _run(tree, schemaPath, tmpDir, reps):
+    outPath = tree + '.json'
+    subprocess.run([ sys.executable, '-c', _timer, tree, schemaPath, tmpDir, outPath, str(reps) ], check=True,
+                   env=dict(os.environ, PYTHONHASHSEED='0'))
+    with open(outPath) as f:
+        return json.load(f)
+
+def main():
+    numStructs = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    reps = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    (before, after) = _getRevisions()
+    with tempfile.TemporaryDirectory() as tmpDir:
+        schemaPath = tmpDir + '/synth.schema.json'
+        synthSchema.writeSchema(schemaPath, numStructs=numStructs)
+
+        _checkout(before, tmpDir + '/before')
+        _checkout(after, tmpDir + '/after')
+        replaced = _run(tmpDir + '/before', schemaPath, tmpDir, reps)
+        compiled = _run(tmpDir + '/after', schemaPath, tmpDir, reps)
+
+    if compiled['class'] != replaced['class']:
+        raise Exception('the generators before and after compiling the templates generated different classes')
+
+    print('schema: ' + str(compiled['structs']) + ' structs, ' + str(compiled['enums']) + ' enums, ' +
+          str(len(compiled['class'])) + ' chars of generated class, best of ' + str(reps))
+    print('  replace chains (%s):     %8.1f ms' % (before[:7], replaced['time'] * 1000))
+    print('  compiled templates (%s): %8.1f ms' % (after[:7], compiled['time'] * 1000))
+    print('  speedup:                          %8.2fx' % (replaced['time'] / compiled['time']))
+
+if __name__ == '__main__':
+    main()
@@ -22,76 +22,44 @@ def _typeCheckFloat(val):
     if not isinstance(val, float):
         raise Exception(str(val) + ' is not of the declared type float')
 
-def _hexStrToLong(s):
+def _hexStrToInt(s):
     if s.startswith('0x'):
-        return long(s, 16)
+        try:
+            return int(s, 16)
+        except ValueError:
+            raise Exception(s + ' is not a hexadecimal integer literal') from None
     else:
         raise Exception('string literals for an integer field must start with "0x": ' + s)
 
-def _typeCheckInt(val, bits):
-    if util.isString(val):
-        val2 = _hexStrToLong(val)
-    else:
-        val2 = val
-
-    if isinstance(val2, int) or isinstance(val2, long):
-        bound = 1 << (bits - 1)
-        if (val2 < -bound) or (val2 >= bound):
-            raise Exception('value ' + str(val) + ' is out of valid range of the declared type int' + str(bits))
-    else:
-        raise Exception(str(val) + ' is not of an integer type')
-
-def _typeCheckUint(val, bits):
-    if util.isString(val):
-        val2 = _hexStrToLong(val)
-    else:
-        val2 = val
-
-    if isinstance(val2, int) or isinstance(val2, long):
-        if (val2 < 0) or (val2 >= (1 << bits)):
-            raise Exception('value ' + str(val) + ' is out of valid range of the declared type uint' + str(bits))
-    else:
-        raise Exception(str(val) + ' is not of an integer type')
-
-def _typeCheckInt8(val):
-    _typeCheckInt(val, 8)
-
-def _typeCheckInt16(val):
-    _typeCheckInt(val, 16)
-
-def _typeCheckInt32(val):
-    _typeCheckInt(val, 32)
-
-def _typeCheckInt64(val):
-    _typeCheckInt(val, 64)
-
-def _typeCheckUint8(val):
-    _typeCheckUint(val, 8)
-
-def _typeCheckUint16(val):
-    _typeCheckUint(val, 16)
-
-def _typeCheckUint32(val):
-    _typeCheckUint(val, 32)
-
-def _typeCheckUint64(val):
-    _typeCheckUint(val, 64)
+# integer types check values against bounds computed once per type
+def _makeIntTypeCheck(ty, low, high):
+    def check(val):
+        if util.isString(val):
+            val2 = _hexStrToInt(val)
+        else:
+            val2 = val
+
+        if isinstance(val2, int):
+            if (val2 < low) or (val2 >= high):
+                raise Exception('value ' + str(val) + ' is out of valid range of the declared type ' + ty)
+        else:
+            raise Exception(str(val) + ' is not of an integer type')
+    return check
 
 _typeCheckFuncs = {
     'string': _typeCheckString,
     'bool': _typeCheckBool,
 
     'float': _typeCheckFloat,
-
-    'int8': _typeCheckInt8,
-    'int16': _typeCheckInt16,
-    'int32': _typeCheckInt32,
-    'int64': _typeCheckInt64,
-    'uint8': _typeCheckUint8,
-    'uint16': _typeCheckUint16,
-    'uint32': _typeCheckUint32,
-    'uint64': _typeCheckUint64,
 }
+for bits in [8, 16, 32, 64]:
+    _typeCheckFuncs['int' + str(bits)] = _makeIntTypeCheck('int' + str(bits), -(1 << (bits - 1)), 1 << (bits - 1))
+    _typeCheckFuncs['uint' + str(bits)] = _makeIntTypeCheck('uint' + str(bits), 0, 1 << bits)
+assert set(_typeCheckFuncs.keys()) == types
+
+# function checking values of a built-in type, which raises an exception for an invalid one
+def getTypeCheck(ty):
+    return _typeCheckFuncs[ty]
 
 def typeCheck(val, ty):
     _typeCheckFuncs[ty](val)
@@ -0,0 +1,257 @@
+import os
+import json
+import pickle
+import shutil
+import hashlib
+import tempfile
+
+from . import outputFile
+
+# bump this when the generated code changes in a way the source digest below cannot see
+GENERATOR_VERSION = '1'
+
+_ENTRY_MANIFEST = 'manifest.json'
+_INDEX_DIR = 'index'
+_ENTRY_DIR = 'entries'
+_IR_DIR = 'ir'
+
+# bump this when the layout of the parsed schema changes
+IR_FORMAT_VERSION = '1'
+
+_generatorStamp = None
+
+def _sha256OfFile(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _sha256OfStr(s):
+    return hashlib.sha256(s.encode('utf-8')).hexdigest()
+
+# version of the generator: GENERATOR_VERSION and a digest of all the generator sources
+def getGeneratorStamp():
+    global _generatorStamp
+
+    if _generatorStamp == None:
+        rootDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        h = hashlib.sha256()
+        for sub in ['common', 'java', 'external']:
+            for dirPath, dirNames, fileNames in os.walk(os.path.join(rootDir, sub)):
+                dirNames.sort()
+                for name in sorted(fileNames):
+                    if name.endswith('.py'):
+                        path = os.path.join(dirPath, name)
+                        h.update(os.path.relpath(path, rootDir).encode('utf-8'))
+                        h.update(_sha256OfFile(path).encode('utf-8'))
+        _generatorStamp = GENERATOR_VERSION + ':' + h.hexdigest()
+
+    return _generatorStamp
+
+# components which decide the generated files: contents of the schema files, the arguments which affect
+# the generated code, and the generator version
+def getKeyComponents(schemaFiles, args):
+    return {
+        'generator': getGeneratorStamp(),
+        'args': args,
+        'schema-files': [ [p, _sha256OfFile(p)] for p in schemaFiles ],
+    }
+
+def getKey(components):
+    # schema file paths are not part of the key so that checkouts in different directories share entries
+    keyed = {
+        'generator': components['generator'],
+        'args': components['args'],
+        'schema-files': [ digest for _, digest in components['schema-files'] ],
+    }
+    return _sha256OfStr(json.dumps(keyed, sort_keys=True))
+
+def _getInvalidationReasons(prev, curr):
+    reasons = []
+    if prev['generator'] != curr['generator']:
+        reasons.append('generator version changed')
+    if prev['args'] != curr['args']:
+        for k in sorted(set(prev['args'].keys()) | set(curr['args'].keys())):
+            if prev['args'].get(k) != curr['args'].get(k):
+                reasons.append('argument ' + k + ' changed')
+
+    prevFiles = prev['schema-files']
+    currFiles = curr['schema-files']
+    if [p for p, _ in prevFiles] != [p for p, _ in currFiles]:
+        reasons.append('schema file list changed')
+    else:
+        for (p, prevDigest), (_, currDigest) in zip(prevFiles, currFiles):
+            if prevDigest != currDigest:
+                reasons.append('schema file ' + p + ' changed')
+
+    return reasons
+
+# content-addressed cache of generated files, which can be shared by several checkouts or CI workers.
+# An entry is a directory named after the key and holding the generated files. Entries are completed in a
+# temporary directory and then renamed into place, so that concurrent writers never expose a partial entry.
+class Cache:
+
+    def __init__(self, cacheDir):
+        self.cacheDir = cacheDir
+        os.makedirs(os.path.join(cacheDir, _ENTRY_DIR), exist_ok=True)
+        os.makedirs(os.path.join(cacheDir, _INDEX_DIR), exist_ok=True)
+
+    def _entryDir(self, key):
+        return os.path.join(self.cacheDir, _ENTRY_DIR, key[:2], key)
+
+    def _indexPath(self, target):
+        return os.path.join(self.cacheDir, _INDEX_DIR, _sha256OfStr(target) + '.json')
+
+    # return the entry directory of the key, or None after reporting why the cache missed
+    def lookup(self, key, components, target):
+        entryDir = self._entryDir(key)
+        if os.path.isfile(os.path.join(entryDir, _ENTRY_MANIFEST)):
+            print('cache hit for ' + target + ' (key ' + key[:12] + ')')
+            self._writeIndex(target, components)
+            return entryDir
+
+        reasons = None
+        try:
+            with open(self._indexPath(target), 'r') as f:
+                reasons = _getInvalidationReasons(json.load(f), components)
+        except (IOError, ValueError, KeyError):
+            pass
+
+        if reasons == None:
+            print('cache miss for ' + target + ': not generated before')
+        elif len(reasons) == 0:
+            print('cache miss for ' + target + ': entry ' + key[:12] + ' has been evicted')
+        else:
+            print('cache miss for ' + target + ': ' + ', '.join(reasons))
+
+        return None
+
+    def _readManifest(self, entryDir):
+        with open(os.path.join(entryDir, _ENTRY_MANIFEST), 'r') as f:
+            return json.load(f)
+
+    # roles of the files of an entry, for the outputs which are known only once the schema is parsed
+    def getOutputRoles(self, entryDir):
+        return self._readManifest(entryDir)['outputs']
+
+    # copy the files of an entry to the paths of the given {role: path} dict
+    def restore(self, entryDir, outputs):
+        manifest = self._readManifest(entryDir)
+        if set(manifest['outputs']) != set(outputs.keys()):
+            raise Exception('cache entry ' + entryDir + ' does not have the outputs ' + str(sorted(outputs.keys())))
+
+        for role, path in outputs.items():
+            print('restoring ' + path + ' from the cache')
+            outputFile.copyIfChanged(os.path.join(entryDir, role), path)
+
+    # store the files of the given {role: path} dict as the entry of the key
+    def store(self, key, components, target, outputs):
+        entryDir = self._entryDir(key)
+        parentDir = os.path.dirname(entryDir)
+        os.makedirs(parentDir, exist_ok=True)
+
+        if not os.path.isdir(entryDir):
+            tmpDir = tempfile.mkdtemp(prefix='.tmp-', dir=parentDir)
+            try:
+                for role, path in outputs.items():
+                    shutil.copyfile(path, os.path.join(tmpDir, role))
+                with open(os.path.join(tmpDir, _ENTRY_MANIFEST), 'w') as f:
+                    json.dump({ 'components': components, 'outputs': sorted(outputs.keys()) }, f, indent=2)
+                os.rename(tmpDir, entryDir)
+            except OSError:
+                # another worker has completed the same entry first
+                shutil.rmtree(tmpDir, ignore_errors=True)
+                if not os.path.isdir(entryDir):
+                    raise
+
+        self._writeIndex(target, components)
+
+    def _writeIndex(self, target, components):
+        indexPath = self._indexPath(target)
+        fd, tmpPath = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(indexPath))
+        with os.fdopen(fd, 'w') as f:
+            json.dump(components, f, indent=2)
+        os.replace(tmpPath, indexPath)
+
+# key of the parsed schema: the schema name, which names the top-level struct, the contents of the schema files
+# in their order, and the versions of the generator and the IR format
+def getIrKey(schemaName, fileDigests):
+    return _sha256OfStr(json.dumps({
+        'generator': getGeneratorStamp(),
+        'ir-format': IR_FORMAT_VERSION,
+        'schema-name': schemaName,
+        'schema-files': fileDigests,
+    }, sort_keys=True))
+
+def getFileDigests(schemaFiles):
+    return [ _sha256OfFile(p) for p in schemaFiles ]
+
+# cache of parsed schemas, the normalized (enumDefs, structDefs, arrElemTypes) result of schemaParser.parse,
+# pickled in the 'ir' subdirectory of a generated file cache. It serves the runs whose generated files miss the
+# cache, for example the same schema generated into another package, without reading the JSON of the schema.
+# An entry starts with the version stamp it was written by, and is ignored unless the stamp is the current one.
+class IrCache:
+
+    def __init__(self, cacheDir):
+        self.cacheDir = cacheDir
+        os.makedirs(os.path.join(cacheDir, _IR_DIR), exist_ok=True)
+
+    def _entryPath(self, key):
+        return os.path.join(self.cacheDir, _IR_DIR, key[:2], key + '.pickle')
+
+    def _getStamp(self):
+        return getGeneratorStamp() + ':' + IR_FORMAT_VERSION
+
+    # return the parsed schema of the key, or None
+    def load(self, key, schemaName):
+        try:
+            with open(self._entryPath(key), 'rb') as f:
+                if pickle.load(f) != self._getStamp():
+                    print('IR cache miss for ' + schemaName + ': written by another generator version')
+                    return None
+                ir = pickle.load(f)
+        except FileNotFoundError:
+            print('IR cache miss for ' + schemaName)
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print('IR cache miss for ' + schemaName + ': unreadable entry (' + str(e) + ')')
+            return None
+
+        print('IR cache hit for ' + schemaName + ' (key ' + key[:12] + ')')
+        return ir
+
+    def store(self, key, ir, schemaName):
+        entryPath = self._entryPath(key)
+        os.makedirs(os.path.dirname(entryPath), exist_ok=True)
+
+        fd, tmpPath = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(entryPath))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(self._getStamp(), f, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(ir, f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpPath, entryPath)
+        except:
+            os.remove(tmpPath)
+            raise
+
+# cache of parsed schemas in memory, for a resident generator such as the watch mode. It keeps the latest parse
+# of each schema, pickled so that a generator changing the parsed schema cannot change the cached one, and is
+# keyed like IrCache, so that a schema is parsed again only once one of its files changes.
+class MemoryIrCache:
+
+    def __init__(self):
+        self._entries = {}  # schema name -> (key, pickled parsed schema)
+
+    # return the parsed schema of the key, or None
+    def load(self, key, schemaName):
+        entry = self._entries.get(schemaName)
+        if entry == None or entry[0] != key:
+            print('IR cache miss for ' + schemaName + ' in memory')
+            return None
+
+        print('IR cache hit for ' + schemaName + ' in memory (key ' + key[:12] + ')')
+        return pickle.loads(entry[1])
+
+    def store(self, key, ir, schemaName):
+        self._entries[schemaName] = (key, pickle.dumps(ir, pickle.HIGHEST_PROTOCOL))
@@ -0,0 +1,156 @@
+# characters str.splitlines() breaks lines at
+_lineEnds = '\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029'
+
+# Writer of generated code which indents and prefixes lines when they are written, instead of re-indenting
+# text fragments each time they are embedded in an outer one.
+#
+# indent() and prefix() push a frame for the duration of a with statement. A line gets the frames that are in
+# effect when the line starts, which transform it from the innermost to the outermost:
+#   indent(level, indentSize)   line -> (indent string + line).rstrip(), as util.indent does
+#   prefix(p)                   line -> p + line.rstrip(), as util.prefixLines does
+# so writing a fragment under nested frames gives the same text as applying util.indent and util.prefixLines
+# to it from the inside out. Lines started outside of any frame are written as they are.
+#
+# Any stack of frames maps a line with non-blank content c to P + c, where P is the prefixes of the frames from
+# the outermost to the innermost, and a blank line to a fixed text. So each line is transformed at once, and
+# is written as it comes rather than buffered: P before the first non-blank piece of the line, and trailing
+# blanks only when something else follows them on the line.
+#
+# Call finish() at the end if the last line written under a frame may not end with a new line.
+class CodeWriter:
+    def __init__(self, out):
+        self._out = out
+        self._frames = []       # (P, text of a blank line) of the frames in effect, outermost first
+        self._prefix = None     # P of the current line, None if the line has no frames
+        self._blankLine = ''
+        self._atLineStart = True
+        self._contentWritten = False
+        self._heldBlanks = ''
+
+    def indent(self, level, indentSize=4):
+        return _Frame(self, ' ' * indentSize * level, True)
+
+    def prefix(self, prefix):
+        return _Frame(self, prefix, False)
+
+    def _pushFrame(self, prefix, stripAll):
+        # what this frame makes of a blank line, which the outer frames map in turn
+        blank = prefix.rstrip() if stripAll else prefix
+        if len(self._frames) == 0:
+            self._frames.append((prefix, blank))
+        else:
+            outerPrefix, outerBlank = self._frames[-1]
+            blank = blank.rstrip()
+            self._frames.append((outerPrefix + prefix, (outerPrefix + blank) if blank else outerBlank))
+
+    def _popFrame(self):
+        self._frames.pop()
+
+    def write(self, text):
+        if not text:
+            return
+
+        if self._atLineStart or self._prefix == None:
+            if len(self._frames) == 0:
+                # neither the current line nor the lines following it in the text have frames
+                self._out.write(text)
+                self._prefix = None
+                self._atLineStart = (text[-1] in _lineEnds)
+                return
+
+        lines = text.splitlines(True)
+        if not self._atLineStart:
+            # the first piece continues the current line
+            self._writeInLine(lines[0])
+            if len(lines) == 1:
+                return
+            del lines[0]
+
+        # the remaining lines start with the current frames
+        last = lines[-1]
+        if last[-1] in _lineEnds:
+            last = None
+        else:
+            del lines[-1]
+
+        if len(lines) > 0:
+            if len(self._frames) == 0:
+                self._out.write(''.join(lines))
+            else:
+                prefix, blank = self._frames[-1]
+                self._out.write(''.join([ (prefix + c + '\n') if c else (blank + '\n')
+                                          for c in map(str.rstrip, lines) ]))
+
+        if last != None:
+            self._writeInLine(last)
+
+    def finish(self):
+        if not self._atLineStart and self._prefix != None:
+            self._endLine('')
+
+    # write a piece of a line, which may start the line and end with a line end
+    def _writeInLine(self, piece):
+        if self._atLineStart:
+            self._atLineStart = False
+            if len(self._frames) == 0:
+                self._prefix = None
+            else:
+                self._prefix, self._blankLine = self._frames[-1]
+                self._contentWritten = False
+                self._heldBlanks = ''
+
+        ended = (piece[-1] in _lineEnds)
+        if self._prefix == None:
+            self._out.write(piece)
+            self._atLineStart = ended
+            return
+
+        content = piece.rstrip()
+        if content:
+            if self._contentWritten:
+                text = self._heldBlanks + content
+            else:
+                text = self._prefix + self._heldBlanks + content
+                self._contentWritten = True
+            if ended:
+                self._out.write(text + '\n')
+                self._heldBlanks = ''
+                self._atLineStart = True
+            else:
+                self._out.write(text)
+                self._heldBlanks = piece[len(content):]
+        elif ended:
+            self._endLine('\n')
+        else:
+            self._heldBlanks += piece
+
+    def _endLine(self, newLine):
+        if not self._contentWritten:
+            self._out.write(self._blankLine)
+        self._out.write(newLine)
+        self._heldBlanks = ''
+        self._atLineStart = True
+
+class _Frame:
+    def __init__(self, writer, prefix, stripAll):
+        self._writer = writer
+        self._prefix = prefix
+        self._stripAll = stripAll
+
+    def __enter__(self):
+        if self._prefix:
+            self._writer._pushFrame(self._prefix, self._stripAll)
+
+    def __exit__(self, excType, excVal, excTb):
+        if self._prefix:
+            self._writer._popFrame()
+
+# slot value for Template.emit() which writes value, a text or a function writing one, indented by level
+def indented(level, value, indentSize=4):
+    def emit(w):
+        with w.indent(level, indentSize):
+            if callable(value):
+                value(w)
+            else:
+                w.write(value)
+    return emit
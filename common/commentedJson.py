@@ -0,0 +1,61 @@
+import re
+import json
+
+# Reader of JSON with JavaScript style comments, // to the end of a line and /* ... */, as schema files and
+# manifests are written in.
+#
+# Comments are blanked out rather than removed, every character of them but new lines replaced by a space, so
+# that the text keeps the line and column of every JSON token and json.loads reports errors at their positions
+# in the original text. The scanner matches runs of JSON text, including string literals and the comment
+# markers in them, as a whole, so it only does work per comment.
+
+_tokenPattern = re.compile(r'''
+    (?P<json> [^"/]+ (?: "[^"\\\n]*(?:\\.[^"\\\n]*)*" [^"/]* )*
+            | (?: "[^"\\\n]*(?:\\.[^"\\\n]*)*" [^"/]* )+ )
+  | (?P<lineComment> //[^\n]* )
+  | (?P<blockComment> /\*.*?\*/ )
+  | (?P<unterminated> /\* )
+  | (?P<other> ["/] )           # a string literal not closed on its line or a stray slash, left to json.loads
+''', re.S | re.X)
+
+_JSON = _tokenPattern.groupindex['json']
+_BLOCK_COMMENT = _tokenPattern.groupindex['blockComment']
+_UNTERMINATED = _tokenPattern.groupindex['unterminated']
+_OTHER = _tokenPattern.groupindex['other']
+
+_notNewLine = re.compile(r'[^\n]')
+
+def _blankComment(m):
+    kind = m.lastindex
+    if kind == _JSON or kind == _OTHER:
+        return m.group()
+    elif kind == _UNTERMINATED:
+        raise _PositionedError('unterminated comment', m.string, m.start())
+
+    comment = m.group()
+    if kind == _BLOCK_COMMENT and '\n' in comment:
+        return _notNewLine.sub(' ', comment)
+    return ' ' * len(comment)
+
+class _PositionedError(Exception):
+    def __init__(self, msg, text, pos):
+        self.msg = msg
+        self.lineno = text.count('\n', 0, pos) + 1
+        self.colno = pos - text.rfind('\n', 0, pos)
+
+def stripComments(text):
+    if not '/' in text:
+        return text
+    return _tokenPattern.sub(_blankComment, text)
+
+# parse a JSON text with comments. srcName, the file name for example, is put in front of the line and column
+# of an error.
+def loads(text, srcName='<string>'):
+    try:
+        return json.loads(stripComments(text))
+    except (json.JSONDecodeError, _PositionedError) as e:
+        raise Exception(srcName + ':' + str(e.lineno) + ':' + str(e.colno) + ': ' + e.msg) from None
+
+def load(path):
+    with open(path, 'rb') as f:
+        return loads(f.read().decode('utf-8'), path)
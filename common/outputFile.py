@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+
+_COMPARE_CHUNK_SIZE = 1 << 16
+
+STATUS_CREATED = 'created'
+STATUS_UPDATED = 'updated'
+STATUS_UNCHANGED = 'unchanged'
+
+# Generated file which replaces its target only when its content differs, so that unchanged files keep their
+# modification times and build tools do not recompile what depends on them.
+#
+# Text is written to a temporary file in the directory of the target, which commit() compares with the target
+# and renames over it if they differ, or removes if they do not. So the target is never seen half written, and
+# is left as it was if the generation fails and discard() is called instead.
+class OutputFile:
+
+    # newline is as for open(). encoding None is the locale's encoding, as for open()
+    def __init__(self, path, encoding=None, newline=None):
+        self.name = path
+        fd, self._tmpPath = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(path) or '.')
+        self._file = os.fdopen(fd, 'w', encoding=encoding, newline=newline)
+
+    def write(self, text):
+        return self._file.write(text)
+
+    # replace the target by what has been written unless they are the same. returns one of the STATUS_*'s
+    def commit(self):
+        self._file.close()
+        return _install(self._tmpPath, self.name)
+
+    def discard(self):
+        self._file.close()
+        os.remove(self._tmpPath)
+
+def _sameContent(path1, path2):
+    if os.path.getsize(path1) != os.path.getsize(path2):
+        return False
+    with open(path1, 'rb') as f1, open(path2, 'rb') as f2:
+        while True:
+            chunk1 = f1.read(_COMPARE_CHUNK_SIZE)
+            if chunk1 != f2.read(_COMPARE_CHUNK_SIZE):
+                return False
+            if not chunk1:
+                return True
+
+def _getNewFileMode():
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+# move a temporary file to path if their contents differ, and report what happened to path
+def _install(tmpPath, path):
+    try:
+        if os.path.isfile(path):
+            if _sameContent(tmpPath, path):
+                os.remove(tmpPath)
+                print(path + ' is unchanged')
+                return STATUS_UNCHANGED
+            status = STATUS_UPDATED
+            mode = os.stat(path).st_mode & 0o7777
+        else:
+            status = STATUS_CREATED
+            mode = _getNewFileMode()    # rather than the 0600 of temporary files
+
+        os.chmod(tmpPath, mode)
+        os.replace(tmpPath, path)
+    except:
+        if os.path.exists(tmpPath):
+            os.remove(tmpPath)
+        raise
+
+    print(status + ' ' + path)
+    return status
+
+# copy the file src to path unless their contents are the same. returns one of the STATUS_*'s
+def copyIfChanged(src, path):
+    if os.path.isfile(path) and _sameContent(src, path):
+        print(path + ' is unchanged')
+        return STATUS_UNCHANGED
+
+    fd, tmpPath = tempfile.mkstemp(prefix='.tmp-', dir=os.path.dirname(path) or '.')
+    try:
+        with os.fdopen(fd, 'wb') as f, open(src, 'rb') as s:
+            shutil.copyfileobj(s, f)
+    except:
+        os.remove(tmpPath)
+        raise
+    return _install(tmpPath, path)
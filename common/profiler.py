@@ -0,0 +1,114 @@
+import sys
+import json
+import time
+import cProfile
+import tracemalloc
+
+# Per-phase profile of a generation: wall time, CPU time and the peak of memory traced by tracemalloc while
+# each phase runs. The generator marks its phases with
+#
+#   with profiler.phase('typecheck'):
+#       ...
+#
+# which costs nothing unless a profile has been started. Phases do not nest, and a phase run more than once
+# has its times summed and its peaks maxed. Peaks are of all the memory traced, including what earlier phases
+# left allocated. The whole run can also be profiled by cProfile, whose statistics are dumped to a file in the
+# pstats format.
+
+_active = None
+
+class _Profile:
+    def __init__(self, cProfilePath):
+        self.phases = {}    # name -> { 'wall': seconds, 'cpu': seconds, 'peak-memory': bytes }, in order of runs
+        self.inPhase = False
+        self.peak = 0       # peak before the last reset of the tracemalloc peak
+        self.cProfilePath = cProfilePath
+        self.cProfile = cProfile.Profile() if cProfilePath else None
+        self.startWall = time.perf_counter()
+        self.startCpu = time.process_time()
+
+class _Phase:
+    def __init__(self, name):
+        self._name = name
+
+    def __enter__(self):
+        assert not _active.inPhase, ('phase ' + self._name + ' started in another phase')
+        _active.inPhase = True
+        _active.peak = max(_active.peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        self._startWall = time.perf_counter()
+        self._startCpu = time.process_time()
+
+    def __exit__(self, excType, excVal, excTb):
+        wall = time.perf_counter() - self._startWall
+        cpu = time.process_time() - self._startCpu
+        peak = tracemalloc.get_traced_memory()[1]
+        _active.inPhase = False
+
+        m = _active.phases.setdefault(self._name, { 'wall': 0.0, 'cpu': 0.0, 'peak-memory': 0 })
+        m['wall'] += wall
+        m['cpu'] += cpu
+        m['peak-memory'] = max(m['peak-memory'], peak)
+
+class _NoPhase:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, excType, excVal, excTb):
+        pass
+
+_noPhase = _NoPhase()
+
+def phase(name):
+    if _active == None:
+        return _noPhase
+    return _Phase(name)
+
+# start profiling, also by cProfile if a path to dump its statistics to is given
+def start(cProfilePath=None):
+    global _active
+
+    assert _active == None
+    _active = _Profile(cProfilePath)
+    tracemalloc.start()
+    if _active.cProfile:
+        _active.cProfile.enable()
+
+# stop profiling and return the report, a dict which can be written as JSON
+def stop():
+    global _active
+
+    prof = _active
+    if prof.cProfile:
+        prof.cProfile.disable()
+    _active = None
+
+    report = {
+        'phases': prof.phases,
+        'total': {
+            'wall': time.perf_counter() - prof.startWall,
+            'cpu': time.process_time() - prof.startCpu,
+            'peak-memory': max(prof.peak, tracemalloc.get_traced_memory()[1]),
+        },
+        'python': sys.version.split()[0],
+    }
+    tracemalloc.stop()
+
+    if prof.cProfile:
+        prof.cProfile.dump_stats(prof.cProfilePath)
+        print('cProfile statistics written to ' + prof.cProfilePath)
+
+    return report
+
+def writeReport(report, path):
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('profile report written to ' + path)
+
+def printReport(report):
+    print('')
+    print('%-12s %12s %12s %14s' % ('phase', 'wall', 'cpu', 'peak memory'))
+    rows = list(report['phases'].items()) + [ ('total', report['total']) ]
+    for name, m in rows:
+        print('%-12s %10.1fms %10.1fms %12.1fMB' % (name, m['wall'] * 1000, m['cpu'] * 1000,
+                                                   m['peak-memory'] / 1e6))
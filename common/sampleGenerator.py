@@ -1,41 +1,130 @@
+import io
 import json
 import os
 import sys
-import codecs
 
-from . import util, schemaParser, builtInTypes
+from . import util, schemaParser, builtInTypes, outputFile
+from .codeWriter import CodeWriter
 
 _MAX_DESC_WIDTH = 80    # TODO: parameterize this
 
-def _getTypeText(schemaName, enumDefs, structDefs, ty, level, structNameStack):
+# state of writing the type texts of a schema
+#
+# The text of a struct is written in full where a field refers to it, except for the structs being expanded,
+# which are referred to by name to break cycles. Texts of structs which are not on a cycle of references are
+# memoized by (struct, level): none of their ancestors can be reachable from them, so they are written the
+# same wherever they are referred to. Those on a cycle are written again each time.
+#
+# With shareStructs, named structs are referred to by name in the type texts instead, and each of them is
+# defined once, after the comment of the first top-level field which refers to it.
+class _TypeTexts:
+    def __init__(self, schemaName, enumDefs, structDefs, shareStructs):
+        self.schemaName = schemaName
+        self.enumDefs = enumDefs
+        self.structDefs = structDefs
+        self.shareStructs = shareStructs
+        self.expanding = set()      # structs whose texts are being written
+        self.cyclic = _getCyclicStructs(structDefs)
+        self.structTexts = {}       # (struct, level) -> text
+        self.enumTexts = {}
+        self.referred = []          # named structs referred to and not defined yet, with shareStructs
+        self.defined = set()
+
+    def isImplicit(self, structName):
+        return structName.startswith(self.schemaName + '__')
+
+# structs which refer to themselves through their fields, directly or not, by Tarjan's algorithm
+def _getCyclicStructs(structDefs):
+    index = {}
+    lowLink = {}
+    stack = []
+    onStack = set()
+    cyclic = set()
+
+    def getRefs(structName):
+        for fldDesc in structDefs[structName].values():
+            ty = fldDesc[schemaParser.NVDK_TYPE]
+            if isinstance(ty, list):
+                ty = ty[0]
+            if ty in structDefs:
+                yield ty
+
+    def visit(v):
+        index[v] = lowLink[v] = len(index)
+        stack.append(v)
+        onStack.add(v)
+        selfRef = False
+        for u in getRefs(v):
+            if u == v:
+                selfRef = True
+            if not u in index:
+                visit(u)
+                lowLink[v] = min(lowLink[v], lowLink[u])
+            elif u in onStack:
+                lowLink[v] = min(lowLink[v], index[u])
+
+        if lowLink[v] == index[v]:
+            component = []
+            while True:
+                u = stack.pop()
+                onStack.discard(u)
+                component.append(u)
+                if u == v:
+                    break
+            if len(component) > 1 or selfRef:
+                cyclic.update(component)
+
+    for structName in structDefs:
+        if not structName in index:
+            visit(structName)
+    return cyclic
+
+def _writeTypeText(w, tt, ty, level):
     if isinstance(ty, list):
-        return 'array of ' + _getTypeText(schemaName, enumDefs, structDefs, ty[0], level, structNameStack)
+        w.write('array of ')
+        _writeTypeText(w, tt, ty[0], level)
     else:
         assert util.isString(ty)
         if ty in builtInTypes.types:
-            return ty
-        elif ty in enumDefs:
-            enumLines = []
-            enumLines.append('enum [')
-            for i in enumDefs[ty]:
-                enumLines.append('  "' + i + '"')   # indent of size 2
-            enumLines.append(']')
-            return '\n'.join(enumLines)
-        elif ty in structDefs:
-            visited = False
-            for s in structNameStack:
-                if s == ty:
-                    visited = True
-                    break
-            if visited:
-                assert not ty.startswith(schemaName + '__')
-                return 'struct ' + ty
+            w.write(ty)
+        elif ty in tt.enumDefs:
+            text = tt.enumTexts.get(ty)
+            if text == None:
+                enumLines = []
+                enumLines.append('enum [')
+                for i in tt.enumDefs[ty]:
+                    enumLines.append('  "' + i + '"')   # indent of size 2
+                enumLines.append(']')
+                text = tt.enumTexts[ty] = '\n'.join(enumLines)
+            w.write(text)
+        elif ty in tt.structDefs:
+            if ty in tt.expanding:
+                assert not tt.isImplicit(ty)
+                w.write('struct ' + ty)
+            elif tt.shareStructs and not tt.isImplicit(ty):
+                w.write('struct ' + ty)
+                if not ty in tt.defined:
+                    tt.defined.add(ty)
+                    tt.referred.append(ty)
             else:
-                return ('struct ' + ('' if ty.startswith(schemaName + '__') else (ty + ' ')) +
-                        _getStructText(None, schemaName, enumDefs, structDefs, ty, level + 1, structNameStack))
+                w.write('struct ' + ('' if tt.isImplicit(ty) else (ty + ' ')))
+                _writeStructTypeText(w, tt, ty, level + 1)
         else:
             assert False
 
+def _writeStructTypeText(w, tt, structName, level):
+    if structName in tt.cyclic:
+        _writeStructText(w, None, tt, structName, level)
+        return
+
+    key = (structName, level)
+    text = tt.structTexts.get(key)
+    if text == None:
+        buf = io.StringIO()
+        cw = CodeWriter(buf)
+        _writeStructText(cw, None, tt, structName, level)
+        text = tt.structTexts[key] = buf.getvalue()
+    w.write(text)
 
 def _getValueText(val):
     return json.dumps(val, sort_keys=False, indent=2, separators=(',', ': '))
@@ -48,42 +137,54 @@ def _appendCommentToFirstLine(text, comment):
     else:
         return text
 
-def _getStructText(confFldComments, schemaName, enumDefs, structDefs, structName, level, structNameStack):
-    structDesc = structDefs[structName]
+def _writeFldComment(w, tt, fldName, fldDesc, level):
+    fldType = fldDesc[schemaParser.NVDK_TYPE]
+    hasFldDefault = (schemaParser.NVDK_DEFAULT in fldDesc)
+
+    w.write('field: ' + fldName + '\n')
+    descWidth = _MAX_DESC_WIDTH - 4 - 3 * (level + 1)
+    with w.indent(1, 2):
+        w.write(util.lineBreak(fldDesc[schemaParser.NVDK_DESC], descWidth))
+    w.write('\ntype: ')
+    _writeTypeText(w, tt, fldType, level)
+    w.write('\nsettable: ' + ('yes' if fldDesc[schemaParser.NVDK_SETTABLE] else 'no') +
+            '\ndefault: ' + (_getValueText(fldDesc[schemaParser.NVDK_DEFAULT]) if hasFldDefault else '<none>'))
+
+    # definitions of the structs the comment is the first to refer to by name, and of those they refer to
+    if level == 0:
+        while len(tt.referred) > 0:
+            structName = tt.referred.pop(0)
+            w.write('\n\nstruct ' + structName + ' ')
+            _writeStructTypeText(w, tt, structName, level + 1)
+
+def _writeStructText(w, confFldComments, tt, structName, level):
+    structDesc = tt.structDefs[structName]
     assert structDesc != None
 
-    structNameStack.append(structName)
+    tt.expanding.add(structName)
 
-    fldLines = []
+    w.write('{')
     fldNames = list(structDesc.keys())
     fldNames.sort()
-    for fldName in fldNames:
+    for i, fldName in enumerate(fldNames):
         fldDesc = structDesc[fldName]
-        fldType = fldDesc[schemaParser.NVDK_TYPE]
         hasFldDefault = (schemaParser.NVDK_DEFAULT in fldDesc)
-        fldDefault = fldDesc[schemaParser.NVDK_DEFAULT] if hasFldDefault else None
-
-        ## comment
-        ##
-        commentLines = []
-        commentLines.append('field: ' + fldName)
-        descWidth = _MAX_DESC_WIDTH - 4 - 3 * (level + 1)
-        commentLines.append(util.indent(util.lineBreak(fldDesc[schemaParser.NVDK_DESC], descWidth), 1, 2))
-        commentLines.append('type: ' + _getTypeText(schemaName, enumDefs, structDefs, fldType, level, structNameStack))
-        commentLines.append('settable: ' + ('yes' if fldDesc[schemaParser.NVDK_SETTABLE] else 'no'))
-        commentLines.append('default: ' + (_getValueText(fldDefault) if hasFldDefault else '<none>'))
-        if level == 0:
-            commentLines = util.lineComment('\n'.join(commentLines))
-        else:
-            commentLines = util.prefixLines('\n'.join(commentLines), '. ')
 
-        valueLines = ''
+        sep = '\n\n' if i > 0 else '\n'
         if level == 0:
-            ## value
+            ## comment, which is also given to the loader
             ##
             assert confFldComments != None
-            confFldComments[fldName] = util.indent(commentLines, 1, 2)
+            buf = io.StringIO()
+            cw = CodeWriter(buf)
+            with cw.indent(1, 2), cw.prefix('// '):
+                _writeFldComment(cw, tt, fldName, fldDesc, level)
+            cw.finish()
+            confFldComments[fldName] = buf.getvalue()
+            w.write(sep + confFldComments[fldName] + '\n')
 
+            ## value
+            ##
             marker = ''
             if schemaParser.NVDK_SAMPLE in fldDesc:
                 fldSample = fldDesc[schemaParser.NVDK_SAMPLE]
@@ -97,39 +198,44 @@ def _getStructText(confFldComments, schemaName, enumDefs, structDefs, structName
                 else:
                     valueLines = util.lineComment('"' + fldName + '": <undefined>,')
                     marker = '%sample'
-            valueLines = _appendCommentToFirstLine(valueLines, marker)
+            with w.indent(1, 2):
+                w.write(_appendCommentToFirstLine(valueLines, marker))
         else:
-            ## field name in the struct type
+            ## comment and field name in the struct type
             ##
             assert confFldComments == None
-            valueLines = '"' + fldName + '"'
-
-        fldLines.append('\n' + util.indent(commentLines + '\n' + valueLines, 1, 2 if level == 0 else 1))
+            w.write(sep)
+            with w.indent(1, 1):
+                with w.prefix('. '):
+                    _writeFldComment(w, tt, fldName, fldDesc, level)
+                w.write('\n"' + fldName + '"')
 
     if (len(fldNames) > 0) and (level == 0):
-        fldLines.append('\n\n  "%end%": null')
+        w.write('\n\n\n  "%end%": null')
 
-    structNameStack.pop()
+    tt.expanding.discard(structName)
 
-    return '{' + '\n'.join(fldLines) + '\n}'
+    w.write('\n}')
 
-def generate(path, enumDefs, structDefs, schemaName):
+# write the sample file of a schema, and return the comments of its top-level fields. with shareStructs, the
+# comments define each named struct once and refer to it by name elsewhere, so that they grow linearly with
+# the schema
+def generate(path, enumDefs, structDefs, schemaName, shareStructs=False):
     assert path != '%NONE%'
 
     print('creating a sample file ' + path)
 
-    structNameStack = []    # without this, _getStructText can fall into an infinite loop for
-                            # mutually recursive struct definitions
+    tt = _TypeTexts(schemaName, enumDefs, structDefs, shareStructs)
     confFldComments = {}
-    with codecs.open(path, 'w', encoding='utf-8') as f:
-        try:
-            text = _getStructText(confFldComments, schemaName, enumDefs, structDefs, schemaName, 0, structNameStack)
-        except:
-            f.close()
-            os.remove(path)
-            raise
-
-        f.write(text)
-        f.close()
+    f = outputFile.OutputFile(path, encoding='utf-8', newline='')
+    try:
+        w = CodeWriter(f)
+        _writeStructText(w, confFldComments, tt, schemaName, 0)
+        w.finish()
+    except:
+        f.discard()
+        raise
+
+    f.commit()
 
     return confFldComments
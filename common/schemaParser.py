@@ -1,6 +1,5 @@
-import sys, json
-from external.jsmin import jsmin
-from . import util, builtInTypes
+import sys
+from . import util, builtInTypes, symbolTable, commentedJson, typeValidator, profiler
 
 STRUCT_LINK_TO_SUPER = '%%super'
 STRUCT_ABSTRACT = '%%abstract'
@@ -15,7 +14,7 @@ normFieldDescKeys = set([ NVDK_DESC, NVDK_TYPE, NVDK_DEFAULT, NVDK_SAMPLE, NVDK_
 
 reservedFlds = set(['_config_file_path_', '_revision_', 'ERROR'])
 
-def registerEnumDef(enumDefs, enumName, enumBody):
+def registerEnumDef(symtab, enumName, enumBody):
     #print(enumName)
     if not isinstance(enumBody, list):
         raise Exception('enum must be an array, which is not for ' + enumName)
@@ -23,27 +22,25 @@ def registerEnumDef(enumDefs, enumName, enumBody):
     if len(enumBody) == 0:
         raise Exception('enum must be a non-emptyt array, which is not for ' + enumName)
 
-    for i in enumDefs:
-        if i[0] == enumName:
-            raise Exception('enum ' + enumName + ' has already been defined')
+    symtab.declareEnum(enumName)
 
     for i in enumBody:
         if not util.isString(i):
             raise Exception('enum must be an array of strings, which is not for ' + enumName)
 
     #print('registering enum ' + enumName)
-    enumDefs.append([enumName, enumBody])
+    symtab.defineEnum(enumName, enumBody)
 
-def registerStructDef(structName, structBody, enumDefs, structDefs, arrElemTypes, superName, abstract):
+def registerStructDef(structName, structBody, symtab, arrElemTypes, superName, abstract):
     #print(structName)
     if not isinstance(structBody, dict):
         raise Exception('struct body must be an object, which is not for ' + structName)
 
-    for i in structDefs:
-        if i[0] == structName:
-            raise Exception('strcut ' + strcutName + ' has already been defined')
+    symtab.declareStruct(structName)
 
-    structDesc = parseStruct(structBody, enumDefs, structDefs, arrElemTypes, structName)
+    symtab.enterScope(structName)
+    structDesc = parseStruct(structBody, symtab, arrElemTypes, structName)
+    symtab.exitScope()
 
     if superName:
         structDesc[STRUCT_LINK_TO_SUPER] = superName
@@ -51,29 +48,23 @@ def registerStructDef(structName, structBody, enumDefs, structDefs, arrElemTypes
         structDesc[STRUCT_ABSTRACT] = True;
 
     #print('registering struct ' + structName)
-    structDefs.append([structName, structDesc])
+    symtab.defineStruct(structName, structDesc)
 
-def isDefinedType(tyName, definedList):
-    for pair in definedList:
-        if tyName == pair[0]:
-            return True
-    return False
-
-def getArrayElementType(arrDesc, enumDefs, structDefs, arrElemTypes, scope):
+def getArrayElementType(arrDesc, symtab, arrElemTypes, scope):
     if len(arrDesc) != 1:
         raise Exception('array field descriptor must have exactly one element, which is not for ' + str(arrDesc))
 
     elmtDesc = arrDesc[0]
 
     if isinstance(elmtDesc, dict):
-        registerStructDef(scope, elmtDesc, enumDefs, structDefs, arrElemTypes, None, False)
+        registerStructDef(scope, elmtDesc, symtab, arrElemTypes, None, False)
         return scope
     elif util.isString(elmtDesc):
         return elmtDesc
     else:
         raise Exception('array field descriptor must have a string or object element, which is not for ' + str(arrDesc))
 
-def normalizeFieldDescriptor(fldName, fldDesc, enumDefs, structDefs, arrElemTypes, scope):
+def normalizeFieldDescriptor(fldName, fldDesc, symtab, arrElemTypes, scope):
 
     # field descriptor must be a JSON object
     if not isinstance(fldDesc, dict):
@@ -109,10 +100,14 @@ def normalizeFieldDescriptor(fldName, fldDesc, enumDefs, structDefs, arrElemType
     ty = fldDesc[NVDK_TYPE]
     if isinstance(ty, dict):
         implicitStructName = scope + '__' + fldName
-        registerStructDef(implicitStructName, ty, enumDefs, structDefs, arrElemTypes, None, False)
+        symtab.enterKey(NVDK_TYPE)
+        registerStructDef(implicitStructName, ty, symtab, arrElemTypes, None, False)
+        symtab.exitKey()
         result[NVDK_TYPE] = implicitStructName
     elif isinstance(ty, list):
-        arrElemType = getArrayElementType(ty, enumDefs, structDefs, arrElemTypes, scope + '__' + fldName + '_elem')
+        symtab.enterKey(NVDK_TYPE)
+        arrElemType = getArrayElementType(ty, symtab, arrElemTypes, scope + '__' + fldName + '_elem')
+        symtab.exitKey()
         arrElemTypes.append(arrElemType)
         result[NVDK_TYPE] = [ arrElemType ]
     elif util.isString(ty):
@@ -140,13 +135,14 @@ def normalizeFieldDescriptor(fldName, fldDesc, enumDefs, structDefs, arrElemType
 
     return result
 
-def parseStruct(schema, enumDefs, structDefs, arrElemTypes, scope):
+def parseStruct(schema, symtab, arrElemTypes, scope):
     if not isinstance(schema, dict):
         raise Exception('given schema is not a JSON object')
 
     result = {}
 
     for key in schema.keys():
+        symtab.enterKey(key)
         if key != key.strip():
             raise Exception('key "' + key + '" starts or ends with a whitespace')
 
@@ -159,7 +155,7 @@ def parseStruct(schema, enumDefs, structDefs, arrElemTypes, scope):
             enumName = split[1]
             # check if enum name is a valid C identifier or not
             util.checkIfIdIsValid(enumName)
-            registerEnumDef(enumDefs, enumName, schema[key])
+            registerEnumDef(symtab, enumName, schema[key])
         elif key.startswith('%struct '):
             # struct definition
             split = key.split()
@@ -169,11 +165,11 @@ def parseStruct(schema, enumDefs, structDefs, arrElemTypes, scope):
             util.checkIfIdIsValid(structName)
 
             if len(split) == 2:
-                registerStructDef(structName, schema[key], enumDefs, structDefs, arrElemTypes, None, False)
+                registerStructDef(structName, schema[key], symtab, arrElemTypes, None, False)
             elif len(split) == 3 and split[2] == 'abstract':
-                registerStructDef(structName, schema[key], enumDefs, structDefs, arrElemTypes, None, True)
+                registerStructDef(structName, schema[key], symtab, arrElemTypes, None, True)
             elif len(split) == 4 and split[2] == 'extends':
-                registerStructDef(structName, schema[key], enumDefs, structDefs, arrElemTypes, split[3], False)
+                registerStructDef(structName, schema[key], symtab, arrElemTypes, split[3], False)
             else:
                 raise Exception('struct definition must be of the form "%struct <struct-name>", ' +
                     'which is not for "' + key + '"')
@@ -186,145 +182,103 @@ def parseStruct(schema, enumDefs, structDefs, arrElemTypes, scope):
 
             # check if key is a valid C identifier or not
             util.checkIfIdIsValid(key)
-            fldDescriptor = normalizeFieldDescriptor(key, schema[key], enumDefs, structDefs, arrElemTypes, scope)
+            fldDescriptor = normalizeFieldDescriptor(key, schema[key], symtab, arrElemTypes, scope)
             result[key] = fldDescriptor
+        symtab.exitKey()
 
     return result
 
-def checkIfDeclaredType(enumDefs, structDefs, ty):
-    return (ty in builtInTypes.types) or (ty in enumDefs) or (ty in structDefs)
-
-def typeCheckValue(enumDefs, structDefs, val, ty):
-    if isinstance(ty, list):
-        assert len(ty) == 1 and util.isString(ty[0])
-
-        elemTy = ty[0]
-        checkIfDeclaredType(enumDefs, structDefs, elemTy)
-
-        if val == None:
-            pass # null is OK for arrays
-        else:
-            if isinstance(val, list):
-                for elem in val:
-                    typeCheckValue(enumDefs, structDefs, elem, elemTy)
-            else:
-                raise Exception('value of an array field must be null or an array, which is not for ' + str(val))
-    else:
-        assert util.isString(ty)
-
-        checkIfDeclaredType(enumDefs, structDefs, ty)
-
-        if ty in builtInTypes.types:
-            builtInTypes.typeCheck(val, ty)
-        elif ty in enumDefs:
-            if not (util.isString(val) and (val in set(enumDefs[ty]))):
-                raise Exception(str(val) + ' is not a valid item of enum ' + ty)
-        elif ty in structDefs:
-            if val == None:
-                pass    # null is OK for struct type
-            elif isinstance(val, dict):
-                structDesc = structDefs[ty]
-                structDescKeys = structDesc.keys()
-
-                # keys of val must be a subset of keys of struct desc
-                keyDiff = set(val.keys()) - set(structDescKeys)
-                if len(keyDiff) > 0:
-                    raise Exception(str(val) + ' has fields ' + str(keyDiff) + ' which are undeclared in type ' + ty)
-
-                # val must have a field whose default value is not defined
-                for k in structDescKeys:
-                    kDesc = structDesc[k]
-                    if (not (NVDK_DEFAULT in kDesc)) and (not (k in val)):
-                        raise Exception('value ' + str(val) + ' must have field ' + k + ' because its type ' + ty +
-                                ' does not define a default value of ' + k)
-
-                # check into the field recursively
-                for k, v in val.items():
-                    typeCheckValue(enumDefs, structDefs, v, structDesc[k][NVDK_TYPE])
-            else:
-                raise Exception('value of a struct field must be null or a struct, which is not for ' + str(val))
-        else:
-            assert False, ('unreachable: ty = ' + str(ty))
+# check a value against a type with the validator of the schema, which is built once per schema
+def typeCheckValue(validator, val, ty):
+    validator.validate(val, ty)
 
-def typeCheckFieldValues(enumDefs, structDefs, structDesc):
+def typeCheckFieldValues(symtab, validator, structName, structDesc):
     for fldName, fldDesc in structDesc.items():
         ty = fldDesc[NVDK_TYPE]
         assert ty
         if isinstance(ty, list):
             assert len(ty) == 1 and util.isString(ty[0])
             elemTy = ty[0]
-            checkIfDeclaredType(enumDefs, structDefs, elemTy)
         else:
             assert util.isString(ty)
-            checkIfDeclaredType(enumDefs, structDefs, ty)
+            elemTy = ty
+
+        if not ((elemTy in builtInTypes.types) or symtab.isDefined(elemTy)):
+            raise Exception('field ' + fldName + ' of struct ' + structName + ' defined in ' +
+                    symtab.lookup(structName).getLocation() + ' has an undeclared type ' + elemTy)
 
         # check default value
         if NVDK_DEFAULT in fldDesc:
-            typeCheckValue(enumDefs, structDefs, fldDesc[NVDK_DEFAULT], ty)
+            typeCheckValue(validator, fldDesc[NVDK_DEFAULT], ty)
 
         # check sample value
         if NVDK_SAMPLE in fldDesc:
-            typeCheckValue(enumDefs, structDefs, fldDesc[NVDK_SAMPLE], ty)
+            typeCheckValue(validator, fldDesc[NVDK_SAMPLE], ty)
+
+# loadFile reads a schema file into a JSON document, which is not modified, commentedJson.load by default
+def parse(schemaName, schemaFilePaths, loadFile=None):
+    if loadFile == None:
+        loadFile = commentedJson.load
 
-def parse(schemaName, schemaFilePaths):
-    enumDefs = []
-    structDefs = []
+    symtab = symbolTable.SymbolTable()
     arrElemTypes = []
     schema = {}
     for p in schemaFilePaths:
         print('merging ' + p + ' into schema ' + schemaName)
-        minified = jsmin(open(p, 'rb').read().decode('utf-8'))
-        partial = json.loads(minified)
+        with profiler.phase('read'):
+            partial = loadFile(p)
 
         for k, v in partial.items():
             if k in schema:
                 raise Exception('key ' + k + ' appears second time in ' + p)
             schema[k] = v
+            symtab.setKeySource(k, p)
 
-    registerStructDef(schemaName, schema, enumDefs, structDefs, arrElemTypes, None, False)
+    with profiler.phase('register'):
+        registerStructDef(schemaName, schema, symtab, arrElemTypes, None, False)
     print('parsed schema ' + schemaName)
-    enumDefs = dict(enumDefs)
-    structDefs = dict(structDefs)
-    arrElemTypes = set(arrElemTypes)
-
-    # replace link to super in struct descriptors with the super's field descriptors
-    for k, v in structDefs.items():
-        if STRUCT_LINK_TO_SUPER in v:
-            superName = v[STRUCT_LINK_TO_SUPER]
-            del v[STRUCT_LINK_TO_SUPER]
-            if superName in structDefs:
-                superDesc = structDefs[superName]
-                for k2, v2 in superDesc.items():
-                    if not k2.startswith('%%'):
-                        if k2 in v:
-                            raise Exception('struct ' + k + ' has a field that is also declared in its super')
-                        else:
-                            v[k2] = v2
-            else:
-                raise Exception('struct ' + k + ' extends undefined ' + superName)
-
-    # remove definitions of abstract structures
-    abstractStruct = []
-    for k, v in structDefs.items():
-        if STRUCT_ABSTRACT in v:
-            abstractStruct.append(k)
-    for k in abstractStruct:
-        del structDefs[k]
-
-    enumTypes = set(enumDefs.keys())
-    structTypes = set(structDefs.keys())
-    cap = builtInTypes.types & enumTypes
-    if len(cap) > 0:
-        raise Exception('some enums have names of built-in types: ' + str(cap))
-    cap = builtInTypes.types & structTypes
-    if len(cap) > 0:
-        raise Exception('some structs have names of built-in types: ' + str(cap))
-    cap = enumTypes & structTypes
-    if len(cap) > 0:
-        raise Exception('some names are declared as both an enum and a struct: ' + str(cap))
-
-    for _, structDesc in structDefs.items():
-        typeCheckFieldValues(enumDefs, structDefs, structDesc)
+    enumDefs = symtab.enums
+    structDefs = symtab.structs
+    arrElemTypes = list(dict.fromkeys(arrElemTypes))  # unique, in the order of appearance for deterministic output
+
+    with profiler.phase('flatten'):
+        # replace link to super in struct descriptors with the super's field descriptors
+        for k, v in structDefs.items():
+            if STRUCT_LINK_TO_SUPER in v:
+                superName = v[STRUCT_LINK_TO_SUPER]
+                del v[STRUCT_LINK_TO_SUPER]
+                if superName in structDefs:
+                    superDesc = structDefs[superName]
+                    for k2, v2 in superDesc.items():
+                        if not k2.startswith('%%'):
+                            if k2 in v:
+                                raise Exception('struct ' + k + ' has a field that is also declared in its super')
+                            else:
+                                v[k2] = v2
+                else:
+                    raise Exception('struct ' + k + ' extends undefined ' + superName)
+
+        # remove definitions of abstract structures
+        abstractStruct = []
+        for k, v in structDefs.items():
+            if STRUCT_ABSTRACT in v:
+                abstractStruct.append(k)
+        for k in abstractStruct:
+            symtab.removeStruct(k)
+
+    with profiler.phase('typecheck'):
+        enumTypes = set(enumDefs.keys())
+        structTypes = set(structDefs.keys())
+        cap = builtInTypes.types & enumTypes
+        if len(cap) > 0:
+            raise Exception('some enums have names of built-in types: ' + str(cap))
+        cap = builtInTypes.types & structTypes
+        if len(cap) > 0:
+            raise Exception('some structs have names of built-in types: ' + str(cap))
+
+        validator = typeValidator.TypeValidator(enumDefs, structDefs)
+        for structName, structDesc in structDefs.items():
+            typeCheckFieldValues(symtab, validator, structName, structDesc)
     print('typechecked schema ' + schemaName)
 
     return (enumDefs, structDefs, arrElemTypes)
@@ -0,0 +1,104 @@
+KIND_ENUM = 'enum'
+KIND_STRUCT = 'struct'
+
+class Symbol:
+    def __init__(self, kind, name, scope, srcFile, position):
+        self.kind = kind
+        self.name = name
+        self.scope = scope          # names of the enclosing structs, outermost first
+        self.srcFile = srcFile
+        self.position = position    # path of the defining key in the source file
+
+    def getLocation(self):
+        if self.srcFile == None:
+            return 'the top level of the schema'    # merged from all the schema files
+        return self.srcFile + ' at ' + self.position
+
+# Symbol table of the enums and structs of a schema.
+#
+# enums and structs are dicts from names to enum items and struct descriptors respectively, in the order of
+# definition, which are shared with the type checker and the generators. Every name is reserved when its
+# definition starts, so that duplicate definitions are detected in O(1) even while the body of a struct is
+# being parsed.
+#
+# The generators get only the two dicts, which is what the IR cache keeps of a parsed schema; the symbols,
+# with their scopes and source positions, are used by the parser alone.
+class SymbolTable:
+    def __init__(self):
+        self.enums = {}
+        self.structs = {}
+        self._symbols = {}
+        self._scope = []
+        self._keyPath = []
+        self._keySources = {}
+        self._srcFile = None
+
+    # - source position tracking ------------------------------------
+
+    # the top-level key of the schema comes from the source file
+    def setKeySource(self, key, srcFile):
+        self._keySources[key] = srcFile
+
+    def enterKey(self, key):
+        if len(self._keyPath) == 0:
+            self._srcFile = self._keySources.get(key)
+        self._keyPath.append(key)
+
+    def exitKey(self):
+        self._keyPath.pop()
+
+    def enterScope(self, structName):
+        self._scope.append(structName)
+
+    def exitScope(self):
+        self._scope.pop()
+
+    def getScope(self):
+        return tuple(self._scope)
+
+    def getPosition(self):
+        return '/' + '/'.join(self._keyPath)
+
+    # - definitions -------------------------------------------------
+
+    def _reserve(self, kind, name):
+        symbol = Symbol(kind, name, self.getScope(), self._srcFile, self.getPosition())
+        if name in self._symbols:
+            prev = self._symbols[name]
+            raise Exception(kind + ' ' + name + ' has already been defined as ' + prev.kind + ' in ' +
+                    prev.getLocation() + ' (redefined in ' + symbol.getLocation() + ')')
+
+        self._symbols[name] = symbol
+        return symbol
+
+    def declareEnum(self, name):
+        return self._reserve(KIND_ENUM, name)
+
+    def defineEnum(self, name, items):
+        assert self._symbols[name].kind == KIND_ENUM
+        self.enums[name] = items
+
+    def declareStruct(self, name):
+        return self._reserve(KIND_STRUCT, name)
+
+    def defineStruct(self, name, desc):
+        assert self._symbols[name].kind == KIND_STRUCT
+        self.structs[name] = desc
+
+    def removeStruct(self, name):
+        del self.structs[name]
+        del self._symbols[name]
+
+    # - lookup ------------------------------------------------------
+
+    def lookup(self, name):
+        return self._symbols.get(name)
+
+    def isDefined(self, name):
+        return (name in self.enums) or (name in self.structs)
+
+    def isEnum(self, name):
+        return name in self.enums
+
+    def isStruct(self, name):
+        return name in self.structs
@@ -0,0 +1,66 @@
+import re
+
+# slots are upper-case names between two %'s such as %FIELD-NAME%. lower-case %...% sequences such as "%end%"
+# and "%struct-def" are literal text.
+_slotPattern = re.compile(r'%([A-Z][A-Z0-9]*(?:-[A-Z0-9]+)*)%')
+
+# Template parsed once into a list of literal and slot segments, which is rendered with a single join.
+#
+# Slot values are given as keyword arguments whose names are the slot names with '-' replaced by '_', for
+# example FIELD_NAME for %FIELD-NAME%. Every slot must be filled and no other value may be given. Values are
+# inserted verbatim, so %...% sequences in them are never taken as slots.
+#
+# emit() writes the segments straight to a file object instead. A slot value given to emit() may also be a
+# function taking the file object, which is called at the slot's position to write a fragment of its own, so
+# that large fragments need not be materialized as a whole.
+class Template:
+    def __init__(self, text):
+        self.text = text
+        self._parts = []
+        self._slotIdx = []  # (index in _parts, keyword name)
+
+        pos = 0
+        for m in _slotPattern.finditer(text):
+            self._parts.append(text[pos:m.start()])
+            self._slotIdx.append((len(self._parts), m.group(1).replace('-', '_')))
+            self._parts.append(None)
+            pos = m.end()
+        self._parts.append(text[pos:])
+
+        self.slots = frozenset(name for _, name in self._slotIdx)
+        self._slotNames = dict(self._slotIdx)
+
+    def render(self, **values):
+        self._checkSlots(values)
+
+        parts = self._parts[:]
+        for i, name in self._slotIdx:
+            parts[i] = values[name]
+        return ''.join(parts)
+
+    def emit(self, out, **values):
+        self._checkSlots(values)
+
+        for i, part in enumerate(self._parts):
+            if part == None:
+                val = values[self._slotNames[i]]
+                if callable(val):
+                    val(out)
+                else:
+                    out.write(val)
+            elif part:
+                out.write(part)
+
+    def _checkSlots(self, values):
+        if len(values) != len(self.slots) or not self.slots.issuperset(values.keys()):
+            self._raiseSlotMismatch(values)
+
+    def _raiseSlotMismatch(self, values):
+        unfilled = sorted(self.slots - set(values.keys()))
+        unknown = sorted(set(values.keys()) - self.slots)
+        msg = []
+        if unfilled:
+            msg.append('unfilled slots ' + ', '.join(map(lambda x: '%' + x.replace('_', '-') + '%', unfilled)))
+        if unknown:
+            msg.append('unknown slots ' + ', '.join(map(lambda x: '%' + x.replace('_', '-') + '%', unknown)))
+        raise Exception('template ' + repr(self.text[:40]) + '... has ' + ' and '.join(msg))
@@ -0,0 +1,117 @@
+from . import util, builtInTypes
+
+# descriptor keys of schemaParser, which imports this module
+_NVDK_TYPE = '%type'
+_NVDK_DEFAULT = '%default'
+
+# Validator of values against the types of a parsed schema, such as the %default and %sample values of fields.
+#
+# Each type is compiled once, on its first use, into a function checking values of the type, with the items of
+# enums, the field names of structs and the fields without default values computed in advance, so that a value
+# is checked in time linear in its size. Struct types are registered before their fields are compiled, so that
+# recursive structs refer to their own function. validate() raises an exception for an invalid value.
+class TypeValidator:
+
+    def __init__(self, enumDefs, structDefs):
+        self._enumDefs = enumDefs
+        self._structDefs = structDefs
+        self._compiled = {}     # type, with '[]' after the element type for arrays -> check function
+
+    def validate(self, value, ty):
+        self.getCheck(ty)(value)
+
+    def getCheck(self, ty):
+        if isinstance(ty, list):
+            assert len(ty) == 1 and util.isString(ty[0])
+            key = ty[0] + '[]'
+        else:
+            assert util.isString(ty)
+            key = ty
+
+        check = self._compiled.get(key)
+        if check == None:
+            if isinstance(ty, list):
+                check = self._compileArray(key, ty[0])
+            else:
+                check = self._compile(ty)
+        return check
+
+    def _isDeclared(self, ty):
+        return (ty in builtInTypes.types) or (ty in self._enumDefs) or (ty in self._structDefs)
+
+    def _compileUndeclared(self, key, ty):
+        # errors of undeclared types are reported when a value is checked against them
+        def check(val):
+            raise Exception('type ' + str(ty) + ' is not declared')
+        self._compiled[key] = check
+        return check
+
+    def _compileArray(self, key, elemTy):
+        if not self._isDeclared(elemTy):
+            return self._compileUndeclared(key, elemTy)
+
+        elemCheck = self.getCheck(elemTy)
+        def check(val):
+            if val == None:
+                pass # null is OK for arrays
+            elif isinstance(val, list):
+                for elem in val:
+                    elemCheck(elem)
+            else:
+                raise Exception('value of an array field must be null or an array, which is not for ' + str(val))
+        self._compiled[key] = check
+        return check
+
+    def _compile(self, ty):
+        if ty in builtInTypes.types:
+            check = builtInTypes.getTypeCheck(ty)
+        elif ty in self._enumDefs:
+            check = self._compileEnum(ty)
+        elif ty in self._structDefs:
+            return self._compileStruct(ty)
+        else:
+            return self._compileUndeclared(ty, ty)
+
+        self._compiled[ty] = check
+        return check
+
+    def _compileEnum(self, ty):
+        items = frozenset(self._enumDefs[ty])
+        def check(val):
+            if not (util.isString(val) and (val in items)):
+                raise Exception(str(val) + ' is not a valid item of enum ' + ty)
+        return check
+
+    def _compileStruct(self, ty):
+        structDesc = self._structDefs[ty]
+        fldNames = frozenset(structDesc.keys())
+        requiredFlds = [ k for k, kDesc in structDesc.items() if not (_NVDK_DEFAULT in kDesc) ]
+        fldChecks = {}
+
+        def check(val):
+            if val == None:
+                pass    # null is OK for struct type
+            elif isinstance(val, dict):
+                keys = val.keys()
+
+                # keys of val must be a subset of keys of struct desc
+                if not (keys <= fldNames):
+                    raise Exception(str(val) + ' has fields ' + str(set(keys) - fldNames) +
+                            ' which are undeclared in type ' + ty)
+
+                # val must have a field whose default value is not defined
+                for k in requiredFlds:
+                    if not (k in val):
+                        raise Exception('value ' + str(val) + ' must have field ' + k + ' because its type ' + ty +
+                                ' does not define a default value of ' + k)
+
+                # check into the field recursively
+                for k, v in val.items():
+                    fldChecks[k](v)
+            else:
+                raise Exception('value of a struct field must be null or a struct, which is not for ' + str(val))
+
+        self._compiled[ty] = check
+        for k, kDesc in structDesc.items():
+            fldChecks[k] = self.getCheck(kDesc[_NVDK_TYPE])
+        return check
@@ -1,5 +1,7 @@
 import re
 
+from . import outputFile
+
 _gen_header = """\
 /*============================================================================
 * This file is generated by json-schema during the pre-compilation phase.
@@ -15,8 +17,9 @@ _lineCommentStr = '// '
 def writeln(file, line):
     file.write(line + "\n")
 
+# the file is an outputFile.OutputFile, to be committed when complete
 def createFile(name):
-    f = open(name, 'w')
+    f = outputFile.OutputFile(name)
     writeln(f, _gen_header)
     return f
 
@@ -0,0 +1,142 @@
+import io
+import os
+import traceback
+import contextlib
+import concurrent.futures
+
+from common import commentedJson
+from . import generator
+
+# keys of a schema entry in a manifest
+MKEY_NAME = 'name'
+MKEY_SAMPLE_DIR = 'sample-dir'
+MKEY_PKG_ROOT_DIR = 'package-root-dir'
+MKEY_CLASS_PKG = 'class-package'
+MKEY_INTERFACE_PKG = 'interface-package'
+MKEY_SCHEMA_FILES = 'schema-files'
+MKEY_SHARE_STRUCTS = 'share-structs'
+MKEY_SPLIT = 'split'
+MKEY_RESOURCE_DIR = 'resource-dir'
+
+_mandatoryKeys = [ MKEY_NAME, MKEY_SAMPLE_DIR, MKEY_PKG_ROOT_DIR, MKEY_CLASS_PKG, MKEY_SCHEMA_FILES ]
+_entryKeys = set(_mandatoryKeys + [ MKEY_INTERFACE_PKG, MKEY_SHARE_STRUCTS, MKEY_SPLIT,
+                                   MKEY_RESOURCE_DIR ])
+
+# read a manifest, a JSON file (comments allowed) of the form
+#   { "schemas": [ { "name": ..., "sample-dir": ..., "package-root-dir": ..., "class-package": ...,
+#                    "interface-package": ... (optional), "schema-files": [ ... ],
+#                    "share-structs": true or false (optional, false by default),
+#                    "split": true or false (optional, false by default),
+#                    "resource-dir": ... (optional) }, ... ] }
+# relative paths in a manifest are relative to the directory of the manifest
+def readManifest(path):
+    manifest = commentedJson.load(path)
+    if not (isinstance(manifest, dict) and isinstance(manifest.get('schemas'), list)):
+        raise Exception('manifest ' + path + ' must be an object with a "schemas" array')
+
+    baseDir = os.path.dirname(path)
+    def resolve(p):
+        return os.path.normpath(os.path.join(baseDir, p))
+
+    entries = []
+    outputs = {}    # path -> schema name
+    for e in manifest['schemas']:
+        if not isinstance(e, dict):
+            raise Exception('schema entry must be an object, which is not for ' + str(e))
+        for k in _mandatoryKeys:
+            if not k in e:
+                raise Exception('schema entry must have a ' + k + ' field, which is not for ' + str(e))
+        diff = set(e.keys()) - _entryKeys
+        if len(diff) > 0:
+            raise Exception('schema entry has invalid keys: ' + str(diff))
+
+        entry = {
+            MKEY_NAME: e[MKEY_NAME],
+            MKEY_SAMPLE_DIR: resolve(e[MKEY_SAMPLE_DIR]),
+            MKEY_PKG_ROOT_DIR: resolve(e[MKEY_PKG_ROOT_DIR]),
+            MKEY_CLASS_PKG: e[MKEY_CLASS_PKG],
+            MKEY_INTERFACE_PKG: e.get(MKEY_INTERFACE_PKG),
+            MKEY_SCHEMA_FILES: [ resolve(p) for p in e[MKEY_SCHEMA_FILES] ],
+            MKEY_SHARE_STRUCTS: e.get(MKEY_SHARE_STRUCTS, False),
+            MKEY_SPLIT: e.get(MKEY_SPLIT, False),
+            MKEY_RESOURCE_DIR: resolve(e[MKEY_RESOURCE_DIR]) if MKEY_RESOURCE_DIR in e else None,
+        }
+        for k in [ MKEY_SHARE_STRUCTS, MKEY_SPLIT ]:
+            if not isinstance(entry[k], bool):
+                raise Exception(k + ' of schema ' + entry[MKEY_NAME] + ' must be true or false')
+
+        # schemas generated in parallel must not write the same files. the files of split structs are known
+        # only once the schemas are parsed, and are checked by generateAll
+        for path in _getOutputs(entry).values():
+            if path in outputs:
+                raise Exception('schema ' + entry[MKEY_NAME] + ' writes ' + path +
+                                ', which another schema of the manifest also writes')
+            outputs[path] = entry[MKEY_NAME]
+
+        entries.append(entry)
+
+    return entries
+
+# paths of the files of a schema entry but the split ones by their roles, as generator.getOutputs returns them
+def _getOutputs(entry):
+    outputs = generator.getOutputs(entry[MKEY_NAME], entry[MKEY_SAMPLE_DIR], entry[MKEY_PKG_ROOT_DIR],
+            entry[MKEY_CLASS_PKG], entry[MKEY_INTERFACE_PKG], resourceDir=entry[MKEY_RESOURCE_DIR])
+    return { role: os.path.normpath(path) for role, path in outputs.items() }
+
+# generate a schema, returning its log, the error if any and the paths of the generated files, instead of
+# printing or raising them
+def _generateOne(entry, cacheDir):
+    log = io.StringIO()
+    err = None
+    outputs = {}
+    with contextlib.redirect_stdout(log):
+        try:
+            outputs = generator.generate(entry[MKEY_NAME], entry[MKEY_SAMPLE_DIR], entry[MKEY_PKG_ROOT_DIR],
+                    entry[MKEY_CLASS_PKG], entry[MKEY_INTERFACE_PKG], cacheDir, entry[MKEY_SCHEMA_FILES],
+                    shareStructs=entry[MKEY_SHARE_STRUCTS], split=entry[MKEY_SPLIT],
+                    resourceDir=entry[MKEY_RESOURCE_DIR])
+        except generator.ArgError as e:
+            err = 'error: ' + str(e)
+        except Exception:
+            err = traceback.format_exc()
+
+    return (log.getvalue(), err, { role: os.path.normpath(path) for role, path in outputs.items() })
+
+# generate all the schemas of a manifest, fanning them out over a pool of the given number of processes.
+# logs are printed in the order of the entries regardless of the order of completion.
+# returns the list of (schema name, error) of the failed schemas.
+def generateAll(entries, jobs, cacheDir):
+    if jobs < 1:
+        raise Exception('number of processes must be positive: ' + str(jobs))
+
+    if jobs == 1 or len(entries) <= 1:
+        results = map(lambda e: _generateOne(e, cacheDir), entries)
+        return _reportResults(entries, results)
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(jobs, len(entries))) as pool:
+            results = pool.map(_generateOne, entries, [cacheDir] * len(entries))
+            return _reportResults(entries, results)
+
+def _reportResults(entries, results):
+    failed = []
+    writers = {}    # path -> name of the schema which wrote it
+    for entry, (log, err, outputs) in zip(entries, results):
+        print('=== ' + entry[MKEY_NAME])
+        print(log, end='')
+        if not err:
+            # split structs of the same name in schemas sharing packages
+            for path in outputs.values():
+                if path in writers:
+                    err = 'error: ' + path + ' is written by both ' + writers[path] + ' and ' + entry[MKEY_NAME]
+                    break
+                writers[path] = entry[MKEY_NAME]
+        if err:
+            print(err.rstrip('\n'))
+            failed.append((entry[MKEY_NAME], err))
+
+    print('')
+    print(str(len(entries) - len(failed)) + ' schema(s) generated, ' + str(len(failed)) + ' failed')
+    for name, _ in failed:
+        print('  failed: ' + name)
+
+    return failed
@@ -0,0 +1,272 @@
+import os
+
+from common import schemaParser, sampleGenerator, cache, profiler, outputFile
+from . import misc, loaderGenerator
+
+class ArgError(Exception):
+    pass
+
+def checkArgs(schemaName, sampleDir, pkgRootDir, clasPkg, intfPkg, cacheDir, schemaFiles, resourceDir=None):
+    print('')
+    print('  schema name: ' + schemaName)
+    print('   sample dir: ' + sampleDir)
+    print(' pkg root dir: ' + pkgRootDir)
+    print('    class pkg: ' + clasPkg)
+    print('interface pkg: ' + (intfPkg if intfPkg else '<none>'))
+    print('    cache dir: ' + (cacheDir if cacheDir else '<none>'))
+    print(' resource dir: ' + (resourceDir if resourceDir else '<none>'))
+    print(' schema files: ' + str(schemaFiles))
+    print('')
+
+    # sample dir must exist
+    if not os.path.isdir(sampleDir):
+        raise ArgError(sampleDir + ' is not an existing directory')
+
+    # package root dir must exist
+    if not os.path.isdir(pkgRootDir):
+        raise ArgError(pkgRootDir + ' is not an existing directory')
+
+    # class dir must exist
+    clasDir = pkgRootDir + '/' + clasPkg.replace('.', '/')
+    if not os.path.isdir(clasDir):
+        print('creating a directory ' + clasDir + ' to put the generated implementation class file in');
+        os.makedirs(clasDir, exist_ok=True)
+
+    # interface dir must exist
+    if intfPkg:
+        intfDir = pkgRootDir + '/' + intfPkg.replace('.', '/')
+        if not os.path.isdir(intfDir):
+            print('creating a directory ' + intfDir + ' to put the generated interface file in');
+            os.makedirs(intfDir, exist_ok=True)
+    else:
+        intfDir = None
+
+    # resource root dir must exist
+    if resourceDir:
+        if not os.path.isdir(resourceDir):
+            raise ArgError(resourceDir + ' is not an existing directory')
+        resDir = resourceDir + '/' + clasPkg.replace('.', '/')
+        if not os.path.isdir(resDir):
+            print('creating a directory ' + resDir + ' to put the generated resource files in');
+            os.makedirs(resDir, exist_ok=True)
+
+    return (clasDir, intfDir)
+
+# roles of the files split out of the implementation class and the interface are these prefixes followed by the
+# names of the classes and interfaces
+_SPLIT_CLASS_ROLE = 'class.'
+_SPLIT_INTF_ROLE = 'interface.'
+
+# paths of the generated files by their roles. splitClasses and splitIntfs are the names of the classes and
+# interfaces split out of the implementation class and the interface in the split mode
+def getOutputs(schemaName, sampleDir, pkgRootDir, clasPkg, intfPkg, splitClasses=(), splitIntfs=(),
+               resourceDir=None):
+    clasDir = pkgRootDir + '/' + clasPkg.replace('.', '/')
+    outputs = { 'sample': sampleDir + '/' + schemaName + '.sample.json',
+                'class': clasDir + '/' + misc.getClasName(schemaName) + '.java' }
+    for name in splitClasses:
+        outputs[_SPLIT_CLASS_ROLE + name] = clasDir + '/' + name + '.java'
+    if intfPkg != None:
+        intfDir = pkgRootDir + '/' + intfPkg.replace('.', '/')
+        outputs['interface'] = intfDir + '/' + misc.getIntfName(schemaName) + '.java'
+        for name in splitIntfs:
+            outputs[_SPLIT_INTF_ROLE + name] = intfDir + '/' + name + '.java'
+    if resourceDir != None:
+        resDir = resourceDir + '/' + clasPkg.replace('.', '/')
+        outputs['schema-resource'] = resDir + '/' + misc.getSchemaResourceName(schemaName)
+        outputs['comments-resource'] = resDir + '/' + misc.getFldCommentsResourceName(schemaName)
+    return outputs
+
+def _getSplitNames(roles):
+    splitClasses = [ r[len(_SPLIT_CLASS_ROLE):] for r in roles if r.startswith(_SPLIT_CLASS_ROLE) ]
+    splitIntfs = [ r[len(_SPLIT_INTF_ROLE):] for r in roles if r.startswith(_SPLIT_INTF_ROLE) ]
+    return (splitClasses, splitIntfs)
+
+# jobs is the number of processes to render the implementation class with. with shareStructs, the comments of
+# the sample refer to named structs by name and define each of them once. with split, the classes and
+# interfaces of the structs and the array methods are written to files of their own (see loaderGenerator).
+# with resourceDir, the root directory of the resources, the schema and the field comments are written to
+# resources in the class package there, which the implementation class reads, instead of string constants in it.
+# loadFile, if given, reads a schema file as schemaParser.parse does. memIrCache, if given, a cache.MemoryIrCache,
+# keeps the parsed schema in memory for the later runs, and is looked up before the cache directory.
+# returns the paths of the generated files by their roles, as getOutputs does
+def generate(schemaName, sampleDir, pkgRootDir, clasPkg, intfPkg, cacheDir, schemaFiles, jobs=1,
+             shareStructs=False, split=False, resourceDir=None, loadFile=None, memIrCache=None):
+    checkArgs(schemaName, sampleDir, pkgRootDir, clasPkg, intfPkg, cacheDir, schemaFiles, resourceDir)
+    outputs = getOutputs(schemaName, sampleDir, pkgRootDir, clasPkg, intfPkg, resourceDir=resourceDir)
+
+    irCaches = [ memIrCache ] if memIrCache != None else []
+    if cacheDir:
+        genCache = cache.Cache(cacheDir)
+        irCaches.append(cache.IrCache(cacheDir))
+        cacheKeyComponents = cache.getKeyComponents(schemaFiles, {
+            'schema-name': schemaName,
+            'class-package': clasPkg,
+            'interface-package': intfPkg,
+            'share-structs': shareStructs,
+            'split': split,
+            'resources': resourceDir != None,
+        })
+        cacheKey = cache.getKey(cacheKeyComponents)
+        cacheEntry = genCache.lookup(cacheKey, cacheKeyComponents, schemaName)
+        if cacheEntry:
+            if split:
+                (splitClasses, splitIntfs) = _getSplitNames(genCache.getOutputRoles(cacheEntry))
+                outputs = getOutputs(schemaName, sampleDir, pkgRootDir, clasPkg, intfPkg, splitClasses, splitIntfs,
+                                     resourceDir)
+            genCache.restore(cacheEntry, outputs)
+            return outputs
+        irKey = cache.getIrKey(schemaName, [ digest for _, digest in cacheKeyComponents['schema-files'] ])
+    else:
+        genCache = None
+        irKey = cache.getIrKey(schemaName, cache.getFileDigests(schemaFiles)) if len(irCaches) > 0 else None
+
+    _generateFiles(schemaName, clasPkg, intfPkg, schemaFiles, outputs, irCaches, irKey, jobs, shareStructs, split,
+                   resourceDir != None, loadFile)
+
+    if genCache:
+        genCache.store(cacheKey, cacheKeyComponents, schemaName, outputs)
+    return outputs
+
+# the parsed schema from the first of the IR caches which has it, which is then stored in those before it
+def _parse(schemaName, schemaFiles, irCaches, irKey, loadFile):
+    for i, irCache in enumerate(irCaches):
+        ir = irCache.load(irKey, schemaName)
+        if ir != None:
+            for missed in irCaches[:i]:
+                missed.store(irKey, ir, schemaName)
+            return ir
+
+    ir = schemaParser.parse(schemaName, schemaFiles, loadFile)
+    for irCache in irCaches:
+        irCache.store(irKey, ir, schemaName)
+    return ir
+
+# Java files of the split mode, opened in a package as they are written, and committed or discarded together
+# with the file they are split out of. Their paths are added to the outputs as they are opened
+class _SplitFiles:
+    def __init__(self, package, dirPath, imports, rolePrefix, outputs):
+        self._package = package
+        self._dirPath = dirPath
+        self._imports = imports
+        self._rolePrefix = rolePrefix
+        self._outputs = outputs
+        self._files = []
+
+    def open(self, name):
+        f = misc.createJavaFile(name, self._package, self._dirPath, self._imports)
+        self._files.append(f)
+        self._outputs[self._rolePrefix + name] = f.name
+        return f
+
+    def commit(self):
+        for f in self._files:
+            f.commit()
+
+    def discard(self):
+        for f in self._files:
+            f.discard()
+
+def _generateFiles(schemaName, clasPkg, intfPkg, schemaFiles, outputs, irCaches, irKey, jobs, shareStructs, split,
+                   useResources, loadFile):
+    (enumDef, structDef, arrElemTypes) = _parse(schemaName, schemaFiles, irCaches, irKey, loadFile)
+
+    samplePath = outputs['sample']
+    with profiler.phase('sample'):
+        fldComments = sampleGenerator.generate(samplePath, enumDef, structDef, schemaName, shareStructs)
+    assert fldComments != None
+
+    genIntf = (intfPkg != None)
+    intfName = misc.getIntfName(schemaName)
+
+    if genIntf:
+        # create a java file defining the interface
+        intfDir = os.path.dirname(outputs['interface'])
+        print("creating the interface file " + intfDir + '/' + intfName + '.java')
+        intfImports = [
+                "io.github.hyunikn.jsonschemalib.UINT64"
+        ]
+        intfFile = misc.createJavaFile(intfName, intfPkg, intfDir, intfImports)
+        if split:
+            # enums stay nested in the interface of the schema
+            splitIntfFiles = _SplitFiles(intfPkg, intfDir, intfImports + [ intfPkg + '.' + intfName + '.*' ],
+                                         _SPLIT_INTF_ROLE, outputs)
+        try:
+            with profiler.phase('interface'):
+                loaderGenerator.writeIntf(intfFile, enumDef, structDef, schemaName,
+                                          splitIntfFiles.open if split else None)
+        except:
+            intfFile.discard()
+            if split:
+                splitIntfFiles.discard()
+            raise
+
+        intfFile.commit()
+        if split:
+            splitIntfFiles.commit()
+
+    # create a java file defining the implementation class
+    imports = [
+        "io.github.hyunikn.jsonschemalib.*",
+        "io.github.hyunikn.jsonden.*",
+        "io.github.hyunikn.jsonden.exception.*",
+        'io.github.getify.minify.Minify',
+        'java.io.File',
+        'java.io.IOException',
+        'java.util.concurrent.CompletableFuture',
+        'java.util.TreeSet',
+        'java.util.Set',
+        'java.util.List',
+    ]
+    if genIntf:
+        imports.append(intfPkg + '.' + intfName)
+    if useResources:
+        imports += [ 'java.io.InputStream', 'java.io.ByteArrayOutputStream' ]
+
+    clasName = misc.getClasName(schemaName)
+    clasDir = os.path.dirname(outputs['class'])
+    if split:
+        # the split classes refer to each other and to the members of the implementation class they used to
+        # be nested in by their simple names, as the implementation class refers to the array methods
+        if genIntf:
+            imports += [ intfPkg + '.*', intfPkg + '.' + intfName + '.*' ]
+        if len(arrElemTypes) > 0:
+            imports.append('static ' + clasPkg + '.' + misc.getArrClasName(schemaName) + '.*')
+        splitImports = imports + [
+            (clasPkg + '.' + clasName + '._SchemaHolder_') if useResources else
+                ('static ' + clasPkg + '.' + clasName + '.schemaJSON'),
+            'static ' + clasPkg + '.' + clasName + '.NVDK_DEFAULT',
+            clasPkg + '.' + clasName + '.KeyPath',
+        ]
+        if not genIntf:
+            splitImports.append(clasPkg + '.' + clasName + '.*')   # enums
+        splitClasFiles = _SplitFiles(clasPkg, clasDir, splitImports, _SPLIT_CLASS_ROLE, outputs)
+
+    print("creating the implementation class file " + clasDir + '/' + clasName + '.java')
+    clasFile = misc.createJavaFile(clasName, clasPkg, clasDir, imports)
+    resourceFiles = []
+    try:
+        with profiler.phase('class'):
+            loaderGenerator.writeClassDef(clasFile, schemaName, enumDef, structDef, arrElemTypes, genIntf,
+                                          fldComments, jobs, splitClasFiles.open if split else None, useResources)
+
+        if useResources:
+            print('creating the resource files ' + outputs['schema-resource'] + ' and ' +
+                  outputs['comments-resource'])
+            resourceFiles.append(outputFile.OutputFile(outputs['schema-resource'], encoding='utf-8'))
+            loaderGenerator.writeSchemaResource(resourceFiles[-1], structDef)
+            resourceFiles.append(outputFile.OutputFile(outputs['comments-resource'], encoding='utf-8'))
+            loaderGenerator.writeFldCommentsResource(resourceFiles[-1], fldComments)
+    except:
+        clasFile.discard()
+        if split:
+            splitClasFiles.discard()
+        for f in resourceFiles:
+            f.discard()
+        raise
+
+    clasFile.commit()
+    if split:
+        splitClasFiles.commit()
+    for f in resourceFiles:
+        f.commit()
@@ -0,0 +1,266 @@
+package io.github.hyunikn.jsonschemalib;
+
+import java.io.File;
+import java.io.FileInputStream;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.RandomAccessFile;
+
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Files;
+
+import java.util.ArrayList;
+import java.util.List;
+import java.util.zip.CRC32;
+
+// Append-only journal of the changes of a configuration, kept next to its JSON file, so that persisting a
+// change costs as much as the change rather than a rewrite of the whole file.
+//
+// The journal starts with a header line holding the CRC32 of the JSON file it applies to, followed by a line
+// per change:
+//
+//   <revision> TAB <UPDATE|INSERT|REMOVE> TAB <array index> TAB <key> TAB <new value JSON>
+//
+// with backslashes, tabs and line breaks in the key and the value escaped. A journal whose header does not
+// match the JSON file, as left by a crash between rewriting the JSON file and resetting the journal, is
+// stale and is discarded. So is an incomplete or malformed last line, as left by a crash or a failure in the
+// middle of an append. Nothing is appended after a failed append until the journal is reset.
+//
+// The JSON file is written while changes go on being appended, so a reset keeps the entries of the revisions
+// after the one written, which the journal then holds for the new JSON file.
+public final class Journal {
+
+    public static final class Entry {
+        public final int rev;
+        public final JsonSchema.SetMode mode;
+        public final int idx;
+        public final String key;
+        public final String val;    // null for REMOVE
+
+        Entry(int rev, JsonSchema.SetMode mode, int idx, String key, String val) {
+            this.rev = rev;
+            this.mode = mode;
+            this.idx = idx;
+            this.key = key;
+            this.val = val;
+        }
+    }
+
+    public static File getJournalFile(String jsonFilePath) {
+        return new File(jsonFilePath + ".journal");
+    }
+
+    public Journal(File file) {
+        this.file = file;
+    }
+
+    // returns the entries of the journal if it applies to the JSON file, and opens it to append more.
+    // With fsync, the writes are synced to the disk
+    public List<Entry> open(File jsonFile, boolean fsync) throws IOException {
+        List<Entry> entries = new ArrayList<Entry>();
+        String header = getHeader(jsonFile);
+
+        String txt = file.exists() ? readFile(file) : "";
+        int nl = txt.indexOf('\n');
+        if (nl < 0 || !txt.substring(0, nl + 1).equals(header)) {
+            reset(jsonFile, fsync);
+            return entries;
+        }
+
+        int begin = nl + 1;
+        int end;
+        long offset = begin;
+        while ((end = txt.indexOf('\n', begin)) >= 0) {
+            String l = txt.substring(begin, end);
+            Entry e = parseEntry(l);
+            if (e == null) {
+                if (end + 1 < txt.length()) {
+                    throw new Error("malformed line in the journal " + file + ": " + l);
+                }
+                break;  // a torn last line
+            }
+            entries.add(e);
+            revs.add(e.rev);
+            offsets.add(offset);
+            offset += l.getBytes(StandardCharsets.UTF_8).length + 1;
+            begin = end + 1;
+        }
+
+        if (begin < txt.length()) {
+            // drop the torn last line, to append after the complete ones
+            JsonSchema.writeFileAtomically(new StringBuilder(txt.substring(0, begin)), file, fsync);
+        }
+        out = new FileOutputStream(file, true);
+        size = offset;
+        return entries;
+    }
+
+    public void append(int rev, JsonSchema.SetMode mode, int idx, String key, String val, boolean fsync)
+            throws IOException {
+        if (out == null) {
+            throw new IOException("the journal " + file + " is not open");
+        }
+
+        line.setLength(0);
+        line.append(rev).append('\t').append(mode.name()).append('\t').append(idx).append('\t');
+        escape(line, key);
+        line.append('\t');
+        if (val != null) {
+            escape(line, val);
+        }
+        line.append('\n');
+
+        byte[] bytes = line.toString().getBytes(StandardCharsets.UTF_8);
+        out.write(bytes);
+        if (fsync) {
+            out.getFD().sync();
+        }
+        revs.add(rev);
+        offsets.add(size);
+        size += bytes.length;
+    }
+
+    // bytes in the journal, header included
+    public long size() {
+        return size;
+    }
+
+    // empties the journal for the JSON file as it is now, once the changes have been written to it
+    public void reset(File jsonFile, boolean fsync) throws IOException {
+        reset(getHeader(jsonFile), Integer.MAX_VALUE, fsync);
+    }
+
+    // starts the journal over with the header got from the JSON file once the changes up to revision rev have
+    // been written to it, keeping the entries of the later revisions
+    public void reset(String header, int rev, boolean fsync) throws IOException {
+        int first = 0;
+        while (first < revs.size() && revs.get(first) <= rev) {
+            first++;
+        }
+
+        StringBuilder txt = new StringBuilder(header);
+        long shift = header.length();
+        boolean keep = first < revs.size();
+        if (keep) {
+            // up to size, which leaves out the part of a failed append
+            long from = offsets.get(first);
+            txt.append(readRange(from, size));
+            shift -= from;
+        }
+
+        close();
+        JsonSchema.writeFileAtomically(txt, file, fsync);
+        out = new FileOutputStream(file, true);
+
+        revs.subList(0, first).clear();
+        offsets.subList(0, first).clear();
+        for (int i = 0; i < offsets.size(); i++) {
+            offsets.set(i, offsets.get(i) + shift);
+        }
+        size = (keep ? size + shift : header.length());
+    }
+
+    // header of the journals applying to the JSON file as it is now, which it reads whole
+    public static String getHeader(File jsonFile) throws IOException {
+        CRC32 crc = new CRC32();
+        byte[] chunk = new byte[READ_CHUNK_SIZE];
+        FileInputStream in = new FileInputStream(jsonFile);
+        try {
+            int n;
+            while ((n = in.read(chunk)) > 0) {
+                crc.update(chunk, 0, n);
+            }
+        } finally {
+            in.close();
+        }
+        return HEADER_PREFIX + Long.toHexString(crc.getValue()) + "\n";
+    }
+
+    public void close() throws IOException {
+        if (out != null) {
+            out.close();
+            out = null;
+        }
+    }
+
+    // -------------------------------------------------------
+    // Private
+    // -------------------------------------------------------
+
+    private static final String HEADER_PREFIX = "json-schema-journal ";
+    private static final int READ_CHUNK_SIZE = 8192;
+
+    private final File file;
+    private final StringBuilder line = new StringBuilder();
+    private final List<Integer> revs = new ArrayList<Integer>();    // of the entries, in order
+    private final List<Long> offsets = new ArrayList<Long>();       // of the entries in the file
+    private FileOutputStream out;
+    private long size;
+
+    private static String readFile(File file) throws IOException {
+        byte[] bytes = Files.readAllBytes(file.toPath());
+        return new String(bytes, StandardCharsets.UTF_8);
+    }
+
+    private String readRange(long from, long to) throws IOException {
+        byte[] bytes = new byte[(int) (to - from)];
+        RandomAccessFile in = new RandomAccessFile(file, "r");
+        try {
+            in.seek(from);
+            in.readFully(bytes);
+        } finally {
+            in.close();
+        }
+        return new String(bytes, StandardCharsets.UTF_8);
+    }
+
+    // null if the line is malformed
+    private static Entry parseEntry(String line) {
+        String[] cols = line.split("\t", -1);
+        if (cols.length != 5) {
+            return null;
+        }
+        try {
+            JsonSchema.SetMode mode = JsonSchema.SetMode.valueOf(cols[1]);
+            return new Entry(Integer.parseInt(cols[0]), mode, Integer.parseInt(cols[2]), unescape(cols[3]),
+                    (mode == JsonSchema.SetMode.REMOVE ? null : unescape(cols[4])));
+        } catch (IllegalArgumentException e) {
+            return null;
+        }
+    }
+
+    private static void escape(StringBuilder sb, String s) {
+        for (int i = 0; i < s.length(); i++) {
+            char c = s.charAt(i);
+            switch (c) {
+                case '\\': sb.append("\\\\"); break;
+                case '\t': sb.append("\\t"); break;
+                case '\n': sb.append("\\n"); break;
+                case '\r': sb.append("\\r"); break;
+                default: sb.append(c);
+            }
+        }
+    }
+
+    private static String unescape(String s) {
+        if (s.indexOf('\\') < 0) {
+            return s;
+        }
+
+        StringBuilder sb = new StringBuilder(s.length());
+        for (int i = 0; i < s.length(); i++) {
+            char c = s.charAt(i);
+            if (c == '\\' && i + 1 < s.length()) {
+                c = s.charAt(++i);
+                switch (c) {
+                    case 't': c = '\t'; break;
+                    case 'n': c = '\n'; break;
+                    case 'r': c = '\r'; break;
+                    default: break;     // '\\'
+                }
+            }
+            sb.append(c);
+        }
+        return sb.toString();
+    }
+}
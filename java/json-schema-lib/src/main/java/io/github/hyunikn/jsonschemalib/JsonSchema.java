@@ -9,6 +9,18 @@ import java.math.BigInteger;
 import java.io.File;
 import java.io.IOException;
 import java.io.FileInputStream;
+import java.io.FileOutputStream;
+import java.io.OutputStream;
+import java.io.OutputStreamWriter;
+import java.io.Writer;
+
+import java.nio.channels.FileChannel;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.AtomicMoveNotSupportedException;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.StandardCopyOption;
+import java.nio.file.StandardOpenOption;
 
 public class JsonSchema {
 
@@ -220,6 +232,64 @@ public class JsonSchema {
         bprint(sbuf, "" + val);
     }
 
+    // the same with StringBuilders, appending the values directly without intermediate strings
+
+    public static void pprint_string(String val, StringBuilder sb) {
+        if (val == null) {
+            sb.append("null");
+        } else {
+            sb.append('"').append(val).append('"');
+        }
+    }
+
+    public static void pprint_bool(boolean val, StringBuilder sb) {
+        sb.append(val);
+    }
+
+    public static void pprint_float(double val, StringBuilder sb) {
+        sb.append(val);
+    }
+
+    public static void pprint_int8(byte val, StringBuilder sb) {
+        sb.append(val);
+    }
+
+    public static void pprint_int16(short val, StringBuilder sb) {
+        sb.append(val);
+    }
+
+    public static void pprint_int32(int val, StringBuilder sb) {
+        sb.append(val);
+    }
+
+    public static void pprint_int64(long val, StringBuilder sb) {
+        sb.append(val);
+    }
+
+    public static void pprint_uint8(short val, StringBuilder sb) {
+        sb.append(val);
+    }
+
+    public static void pprint_uint16(int val, StringBuilder sb) {
+        sb.append(val);
+    }
+
+    public static void pprint_uint32(long val, StringBuilder sb) {
+        sb.append(val);
+    }
+
+    public static void pprint_uint64(UINT64 val, StringBuilder sb) {
+        sb.append(val);
+    }
+
+    public static void pprint_enum(Enum<?> val, PrintMode mode, StringBuilder sb) {
+        if (mode == PrintMode.JSON) {
+            sb.append('"').append(val.name()).append('"');
+        } else {
+            sb.append(val.name());
+        }
+    }
+
     // - end of pretty-print functions -------------------------------------------
 
     public static void printIndent(int indent, StringBuffer sbuf) {
@@ -228,6 +298,84 @@ public class JsonSchema {
         }
     }
 
+    private static final int MAX_TABLED_INDENT = 32;
+    private static final String[] INDENTS = new String[MAX_TABLED_INDENT + 1];
+    static {
+        StringBuilder sb = new StringBuilder();
+        for (int i = 0; i <= MAX_TABLED_INDENT; i++) {
+            INDENTS[i] = sb.toString();
+            sb.append("  ");
+        }
+    }
+
+    public static void printIndent(int indent, StringBuilder sb) {
+        if (indent <= MAX_TABLED_INDENT) {
+            sb.append(INDENTS[indent]);
+        } else {
+            sb.append(INDENTS[MAX_TABLED_INDENT]);
+            for (int i = MAX_TABLED_INDENT; i < indent; i++) {
+                sb.append("  ");
+            }
+        }
+    }
+
+    private static final int WRITE_CHUNK_SIZE = 8192;
+
+    // writes the content of sb to out in UTF-8, chunk by chunk, without a String or byte[] copy of the whole
+    public static void writeUTF8(StringBuilder sb, OutputStream out) throws IOException {
+        Writer writer = new OutputStreamWriter(out, StandardCharsets.UTF_8);
+        char[] chunk = new char[WRITE_CHUNK_SIZE];
+        int len = sb.length();
+        for (int begin = 0; begin < len; begin += WRITE_CHUNK_SIZE) {
+            int end = Math.min(begin + WRITE_CHUNK_SIZE, len);
+            sb.getChars(begin, end, chunk, 0);
+            writer.write(chunk, 0, end - begin);
+        }
+        writer.flush();
+    }
+
+    // replaces file by the content of sb in UTF-8. The content is written to a temporary file in the same
+    // directory, synced to the disk if fsync is true, and renamed over file, so that file is never seen half
+    // written and is left as it was if the write fails.
+    public static void writeFileAtomically(StringBuilder sb, File file, boolean fsync) throws IOException {
+        Path target = file.toPath().toAbsolutePath();
+        Path tmp = Files.createTempFile(target.getParent(), "." + target.getFileName() + ".", ".tmp");
+        try {
+            try {
+                Files.setPosixFilePermissions(tmp, Files.getPosixFilePermissions(target));
+            } catch (UnsupportedOperationException | IOException e) {
+                // not a POSIX file system, or no file yet: keep the permissions of the temporary file
+            }
+
+            FileOutputStream out = new FileOutputStream(tmp.toFile());
+            try {
+                writeUTF8(sb, out);
+                if (fsync) {
+                    out.getFD().sync();
+                }
+            } finally {
+                out.close();
+            }
+
+            try {
+                Files.move(tmp, target, StandardCopyOption.ATOMIC_MOVE, StandardCopyOption.REPLACE_EXISTING);
+            } catch (AtomicMoveNotSupportedException e) {
+                Files.move(tmp, target, StandardCopyOption.REPLACE_EXISTING);
+            }
+        } catch (IOException | RuntimeException | Error e) {
+            Files.deleteIfExists(tmp);
+            throw e;
+        }
+
+        if (fsync) {
+            // make the rename durable as well. Directories cannot be opened on some platforms
+            try (FileChannel dir = FileChannel.open(target.getParent(), StandardOpenOption.READ)) {
+                dir.force(true);
+            } catch (IOException e) {
+            }
+        }
+    }
+
     public static void bprint(StringBuffer sbuf, String str) {
         if (sbuf == null) {
             System.out.print(str);
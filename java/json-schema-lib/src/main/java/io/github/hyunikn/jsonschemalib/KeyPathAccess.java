@@ -0,0 +1,16 @@
+package io.github.hyunikn.jsonschemalib;
+
+// ConfigAccess with the overloads taking keys compiled once by compileKey, so that callers holding the interface
+// can reuse compiled keys as well. P is the KeyPath class nested in the generated implementation class, which
+// keeps the keys compiled for one schema from being given to the configuration of another.
+public interface KeyPathAccess<P> extends ConfigAccess {
+    P compileKey(String key);
+    void prettyPrint(StringBuffer sbuf, JsonSchema.PrintMode mode, long selectionBits, P path);
+    void prettyPrintTo(StringBuilder sb, JsonSchema.PrintMode mode, long selectionBits, P path);
+    JsonSchema.SetErr update(int targetRev, P path, String newValJSON, boolean checkOnly, boolean save,
+            Object[] onVal, StringBuffer errMsg);
+    JsonSchema.SetErr insertArrElem(int targetRev, P path, int idx, String newValJSON, boolean checkOnly,
+            boolean save, Object[] onVal, StringBuffer errMsg);
+    JsonSchema.SetErr removeArrElem(int targetRev, P path, int idx, boolean checkOnly, boolean save,
+            Object[] onVal, StringBuffer errMsg);
+}
@@ -0,0 +1,101 @@
+package io.github.hyunikn.jsonschemalib;
+
+import java.util.concurrent.Executor;
+import java.util.concurrent.Executors;
+import java.util.concurrent.ScheduledExecutorService;
+import java.util.concurrent.TimeUnit;
+
+// How a generated configuration saves itself to its JSON file when update, insertArrElem or removeArrElem is
+// called with save = true.
+//
+// IMMEDIATE writes the file in the calling thread before the call returns, as configurations always did.
+// DEBOUNCED writes it in a shared daemon thread the given delay after the first change not yet saved, and
+// BACKGROUND writes it in the given executor as soon as it runs the write. In the latter two modes the call
+// returns without waiting for the write, and the changes made until the write starts are all saved by it.
+//
+// Files are written to a temporary file which is then renamed over the JSON file, so that the JSON file is
+// never seen half written. With fsync, the temporary file is synced to the disk before it is renamed.
+public final class SavePolicy {
+
+    public enum Mode {
+        IMMEDIATE,
+        DEBOUNCED,
+        BACKGROUND,
+    }
+
+    public static final SavePolicy IMMEDIATE = immediate(false);
+
+    public static SavePolicy immediate(boolean fsync) {
+        return new SavePolicy(Mode.IMMEDIATE, 0, null, fsync);
+    }
+
+    public static SavePolicy debounced(long delayMillis, boolean fsync) {
+        if (delayMillis < 0) {
+            throw new Error("delay of a debounced save policy cannot be negative: " + delayMillis);
+        }
+        return new SavePolicy(Mode.DEBOUNCED, delayMillis, null, fsync);
+    }
+
+    public static SavePolicy background(Executor executor, boolean fsync) {
+        if (executor == null) {
+            throw new Error("executor of a background save policy cannot be null");
+        }
+        return new SavePolicy(Mode.BACKGROUND, 0, executor, fsync);
+    }
+
+    public Mode mode() {
+        return mode;
+    }
+
+    public long delayMillis() {
+        return delayMillis;
+    }
+
+    public boolean fsync() {
+        return fsync;
+    }
+
+    // runs a write according to the mode. Writes of the IMMEDIATE mode are run by the caller, not scheduled
+    public void schedule(Runnable write) {
+        switch (mode) {
+            case DEBOUNCED:
+                SchedulerHolder.scheduler.schedule(write, delayMillis, TimeUnit.MILLISECONDS);
+                break;
+            case BACKGROUND:
+                executor.execute(write);
+                break;
+            default:
+                throw new Error("writes of the " + mode + " save policy are not scheduled");
+        }
+    }
+
+    @Override
+    public String toString() {
+        return mode + (mode == Mode.DEBOUNCED ? "(" + delayMillis + "ms)" : "") + (fsync ? "+fsync" : "");
+    }
+
+    // -------------------------------------------------------
+    // Private
+    // -------------------------------------------------------
+
+    private final Mode mode;
+    private final long delayMillis;
+    private final Executor executor;
+    private final boolean fsync;
+
+    private SavePolicy(Mode mode, long delayMillis, Executor executor, boolean fsync) {
+        this.mode = mode;
+        this.delayMillis = delayMillis;
+        this.executor = executor;
+        this.fsync = fsync;
+    }
+
+    // created on the first debounced save
+    private static final class SchedulerHolder {
+        static final ScheduledExecutorService scheduler = Executors.newSingleThreadScheduledExecutor(r -> {
+            Thread t = new Thread(r, "json-schema-debounced-save");
+            t.setDaemon(true);
+            return t;
+        });
+    }
+}
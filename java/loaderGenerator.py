@@ -1,8 +1,13 @@
+import io
 import os
 import sys
 import json
+import math
+import concurrent.futures
 
 from common import util, schemaParser, builtInTypes, sampleGenerator
+from common.template import Template
+from common.codeWriter import CodeWriter, indented
 from . import misc
 
 _builtInTypeToJavaTypeMap = {
@@ -23,19 +28,19 @@ assert set(_builtInTypeToJavaTypeMap.keys()) == builtInTypes.types, 'every built
 
 # ------Write Interface-----------------------------------------------------
 
-_tmplEnumDef = '''
+_tmplEnumDef = Template('''
 enum %ENUM-TYPE% {
 %ENUM-ITEMS%
 }
-'''
+''')
 
-_tmplInnerIntfDef = '''
-interface %INTERFACE-TYPE% {
+_tmplInnerIntfDef = Template('''
+%INTERFACE-MODIFIERS%interface %INTERFACE-TYPE% {
 %FIELD-ACCESSORS%
 }
-'''
+''')
 
-_tmplIntfDef = '''
+_tmplIntfDef = Template('''
 public interface %INTERFACE-TYPE% {
 
     // field getters
@@ -50,7 +55,7 @@ public interface %INTERFACE-TYPE% {
     // inner interface definitions
 %NESTED-INTERFACE-DEFS%
 }
-'''
+''')
 
 def _schemaTypeToJavaType(sType, enumDef, structDef, forIntf):
     if isinstance(sType, list):
@@ -77,7 +82,8 @@ def _getFldJavaType(fldDesc, enumDef, structDef, forIntf):
 
     return fldJavaType
 
-def _getInnerIntfDef(name, desc, enumDef, structDef):
+# a split interface is a public top-level one of its own, rather than nested in the interface of the schema
+def _writeInnerIntfDef(w, name, desc, enumDef, structDef, split=False):
     intfType = misc.getIntfName(name)
 
     # get field accessors
@@ -87,156 +93,394 @@ def _getInnerIntfDef(name, desc, enumDef, structDef):
         fldJavaType = _getFldJavaType(desc, enumDef, structDef, True)
         fldAccessors.append(fldJavaType + ' ' + fld + '();')
 
-    return (_tmplInnerIntfDef
-                .replace('%INTERFACE-TYPE%', intfType)
-                .replace('%FIELD-ACCESSORS%', util.indent('\n'.join(fldAccessors), 1)))
+    _tmplInnerIntfDef.emit(w,
+                INTERFACE_MODIFIERS=('public ' if split else ''),
+                INTERFACE_TYPE=intfType,
+                FIELD_ACCESSORS=indented(1, '\n'.join(fldAccessors)))
 
-def _getEnumDefStrList(enumDef, forInterface):
-    enumDefStrList = []
+def _writeEnumDefs(w, enumDef):
     for name, body in enumDef.items():
         enumType = misc.getTypeName(name)
-        enumDefStrList.append(_tmplEnumDef
-                                  .replace('%ENUM-TYPE%', enumType)
-                                  .replace('%ENUM-ITEMS%', util.indent(',\n'.join(body), 1)))
-    return enumDefStrList
+        _tmplEnumDef.emit(w,
+                ENUM_TYPE=enumType,
+                ENUM_ITEMS=indented(1, ',\n'.join(body)))
 
 # ------Write Implementation-----------------------------------------------------
 
-_tmplParseEnum = '''\
+# access of the members which the classes of a schema use of each other: private while they are all nested in
+# the implementation class, package-private once they are split into top-level classes of their own
+def _getSharedAccess(split):
+    return '' if split else 'private '
+
+_tmplParseEnum = Template('''\
 (%VAL%.isStr() ? %TY%.valueOf(%VAL%.asStr().getString()) : (%TY%) JsonSchema.throwAsExpr("enum value must be a string"))\
-'''
-_tmplParseStruct = '''(%VAL%.isNull() ? null : new %TY%((JsonObj) %VAL%))'''
+''')
+_tmplParseStruct = Template('''(%VAL%.isNull() ? null : new %TY%((JsonObj) %VAL%))''')
+_tmplParseArr = Template('''parseArr_%TY%(%VAL%)''')
+_tmplParseBuiltIn = Template('''JsonSchema.parseJSON%TY%(%VAL%)''')
 
-def _getParseValTmpl(valType, enumDef, structDef):
+def _getParseVal(valType, val, enumDef, structDef):
     if isinstance(valType, list):
-        parseVal = 'parseArr_%TY%(%VAL%)'.replace('%TY%', valType[0])
+        parseVal = _tmplParseArr.render(TY=valType[0], VAL=val)
     elif valType in builtInTypes.types:
-        parseVal = 'JsonSchema.parseJSON%TY%(%VAL%)'.replace('%TY%', valType)
+        parseVal = _tmplParseBuiltIn.render(TY=valType, VAL=val)
     elif valType in enumDef:
         enumJavaType = misc.getTypeName(valType)
-        parseVal = _tmplParseEnum.replace('%TY%', enumJavaType)
+        parseVal = _tmplParseEnum.render(TY=enumJavaType, VAL=val)
     elif valType in structDef:
         structJavaType = misc.getClasName(valType)
-        parseVal = _tmplParseStruct.replace('%TY%', structJavaType)
+        parseVal = _tmplParseStruct.render(TY=structJavaType, VAL=val)
 
     return parseVal
 
 # -------------------------------------------------------------------------------
 
-_tmplAssignParsedFieldVal = '%FIELD-JAVA-NAME% = %PARSE-FIELD-VAL%;'
+_tmplAssignParsedFieldVal = Template('%FIELD-JAVA-NAME% = %PARSE-FIELD-VAL%;')
 
 def _getAssignParsedFldStatements(fldName, fldType, enumDef, structDef):
-    parseFld = _getParseValTmpl(fldType, enumDef, structDef).replace('%VAL%', 'fld')
-    return (_tmplAssignParsedFieldVal
-                .replace('%FIELD-JAVA-NAME%', fldName)
-                .replace('%PARSE-FIELD-VAL%', parseFld))
+    parseFld = _getParseVal(fldType, 'fld', enumDef, structDef)
+    return _tmplAssignParsedFieldVal.render(
+                FIELD_JAVA_NAME=fldName,
+                PARSE_FIELD_VAL=parseFld)
 
 # -------------------------------------------------------------------------------
 
-_tmplParseFieldDefaultedTopLevel = '''
-if (json.has("%FIELD-NAME%")) {
-    fld = json.get("%FIELD-NAME%");
-    %FIELD-NAME%__uses_default = false;
-} else {
-    fld = structDesc.get("%FIELD-NAME%").asObj().get(NVDK_DEFAULT);
+# Constructors bind the members of a JSON object to the fields in a single pass over the members, which
+# dispatches on the ordinals of the fields and marks the fields set in a bitset, a long or an array of longs
+# by the number of fields. Undeclared members are found along the way, and defaults are given afterwards to
+# the fields whose bits are not set.
+_tmplParseFields = Template('''\
+%SEEN-DECL%
+Set _undeclared_ = null;
+for (Object _k_: json.keySet()) {
+    String _key_ = (String) _k_;
+    fld = json.get(_key_);
+    switch (fldOrdinal(_key_)) {%PARSE-FIELD-CASES%
+    default:
+        if (!_key_.equals("%end%")) {   // end marker
+            if (_undeclared_ == null) {
+                _undeclared_ = new TreeSet();
+            }
+            _undeclared_.add(_key_);
+        }
+    }
+}
+if (_undeclared_ != null) {
+    throw new Error("the JSON file has fields undeclared in the schema: " + _undeclared_);
+}%CHECK-UNSET-FIELDS%
+''')
+
+_tmplParseFieldCase = Template('''
+case %FIELD-NAME%__ord:
+    %SET-FIELD-VAL%
+    %MARK-SEEN%
+    break;\
+''')
+
+_tmplFillDefaultTopLevel = Template('''
+if (%NOT-SEEN%) {
+    %FIELD-NAME% = %DEFAULT-VAL%;
     %FIELD-NAME%__uses_default = true;
+}\
+''')
+
+_tmplFillDefaultInner = Template('''
+if (%NOT-SEEN%) {
+    %FIELD-NAME% = %DEFAULT-VAL%;
+}\
+''')
+
+_tmplCheckUndefaultedSet = Template('''
+if (%NOT-SEEN%) {
+    throw new Error("field '%FIELD-NAME%' has no default value in the schema and is not set in the JSON file");
+}\
+''')
+
+# declaration of the bitset of the fields set, and functions giving the statement marking a field and the
+# condition that a field is not marked, given the expression of its ordinal
+def _getSeenBitsetCode(numFields):
+    if numFields <= 64:
+        return ('long _seen_ = 0L;',
+                lambda ord: '_seen_ |= 1L << ' + ord + ';',
+                lambda ord: '(_seen_ & (1L << ' + ord + ')) == 0')
+    else:
+        return ('long[] _seen_ = new long[' + str((numFields + 63) // 64) + '];',
+                lambda ord: '_seen_[' + ord + ' >>> 6] |= 1L << ' + ord + ';',
+                lambda ord: '(_seen_[' + ord + ' >>> 6] & (1L << ' + ord + ')) == 0')
+
+# -------------------------------------------------------------------------------
+
+# Defaults are given to the fields missing in the JSON without looking them up in the schema. They are Java
+# literals where they can be, and otherwise values built once per class, which fields get copies of: arrays of
+# literals are array constants, and all the other values, uint64 ones included, in decimal or hex, are parsed
+# from the schema by the accessor of a volatile field the first time they are needed, so that initializing the
+# class neither reads the schema nor constructs other classes being initialized.
+
+_intLiteralFormats = {
+    'int8': '(byte) %d',
+    'int16': '(short) %d',
+    'int32': '%d',
+    'int64': '%dL',
+    'uint8': '(short) %d',
+    'uint16': '%d',
+    'uint32': '%dL',
 }
-%SET-FIELD-VAL%\
-'''
 
-_tmplParseFieldDefaultedInner = '''
-if (json.has("%FIELD-NAME%")) {
-    fld = json.get("%FIELD-NAME%");
-} else {
-    fld = structDesc.get("%FIELD-NAME%").asObj().get(NVDK_DEFAULT);
+def _getJavaStrLiteral(s):
+    chars = []
+    for c in s:
+        if c == '"' or c == '\\':
+            chars.append('\\' + c)
+        elif c == '\n':
+            chars.append('\\n')
+        elif c == '\r':
+            chars.append('\\r')
+        elif ord(c) < 0x20:
+            chars.append('\\%03o' % ord(c))   # not \u, which javac translates before it reads literals
+        elif ord(c) < 0x7f:
+            chars.append(c)
+        else:
+            code = ord(c)
+            if code > 0xffff:   # as a surrogate pair
+                code -= 0x10000
+                chars.append('\\u%04x\\u%04x' % (0xd800 + (code >> 10), 0xdc00 + (code & 0x3ff)))
+            else:
+                chars.append('\\u%04x' % code)
+    return '"' + ''.join(chars) + '"'
+
+# Java literal of a value of a built-in or enum type, or None if the type has no literals
+def _getJavaLiteral(ty, val, enumDef):
+    if val == None:
+        return 'null'
+    elif ty in enumDef:
+        return misc.getTypeName(ty) + '.' + val
+    elif ty == 'string':
+        return _getJavaStrLiteral(val)
+    elif ty == 'bool':
+        return 'true' if val else 'false'
+    elif ty == 'float':
+        if math.isnan(val):
+            return 'Double.NaN'
+        elif math.isinf(val):
+            return 'Double.POSITIVE_INFINITY' if val > 0 else 'Double.NEGATIVE_INFINITY'
+        return repr(val)
+    elif ty in _intLiteralFormats:
+        return _intLiteralFormats[ty] % (int(val, 16) if util.isString(val) else val)
+    else:
+        return None     # uint64
+
+_tmplConstDefault = Template('''\
+private static final %JAVA-TYPE% %FIELD-NAME%__default = %VAL%;\
+''')
+
+_tmplLazyDefault = Template('''\
+private static volatile %JAVA-TYPE% %FIELD-NAME%__default;
+
+private static %JAVA-TYPE% %FIELD-NAME%__default() {
+    %JAVA-TYPE% dflt = %FIELD-NAME%__default;
+    if (dflt == null) {
+        dflt = %VAL%;
+        %FIELD-NAME%__default = dflt;
+    }
+    return dflt;
+}\
+''')
+
+# Java expression of the default of a field, and the declaration of what it is copied from if any
+def _getDefaultCode(fldName, fldType, dflt, enumDef, structDef):
+    javaType = _schemaTypeToJavaType(fldType, enumDef, structDef, False)
+    schemaVal = 'structDesc().get("' + fldName + '").asObj().get(NVDK_DEFAULT)'
+    if dflt == None:
+        return ('null', None)
+
+    # defaults without literals are read from the schema when they are first needed
+    if isinstance(fldType, list):
+        elemType = fldType[0]
+        if elemType in structDef:
+            decl = _tmplLazyDefault.render(JAVA_TYPE=javaType, FIELD_NAME=fldName,
+                                           VAL=_tmplParseArr.render(TY=elemType, VAL=schemaVal))
+            return ('copyArr_' + elemType + '(' + fldName + '__default())', decl)
+
+        literals = [ _getJavaLiteral(elemType, v, enumDef) for v in dflt ]
+        if None in literals:
+            decl = _tmplLazyDefault.render(JAVA_TYPE=javaType, FIELD_NAME=fldName,
+                                           VAL=_tmplParseArr.render(TY=elemType, VAL=schemaVal))
+            return (fldName + '__default().clone()', decl)
+
+        val = '{ ' + ', '.join(literals) + ' }' if literals else '{}'
+        decl = _tmplConstDefault.render(JAVA_TYPE=javaType, FIELD_NAME=fldName, VAL=val)
+        return (fldName + '__default.clone()', decl)
+
+    if fldType in structDef:
+        decl = _tmplLazyDefault.render(JAVA_TYPE=javaType, FIELD_NAME=fldName,
+                                       VAL='new ' + javaType + '((JsonObj) ' + schemaVal + ')')
+        return (fldName + '__default().copy()', decl)
+
+    literal = _getJavaLiteral(fldType, dflt, enumDef)
+    if literal != None:
+        return (literal, None)
+    decl = _tmplLazyDefault.render(JAVA_TYPE=javaType, FIELD_NAME=fldName,
+                                   VAL=_getParseVal(fldType, schemaVal, enumDef, structDef))
+    return (fldName + '__default()', decl)
+
+# statement copying a field of the struct o
+def _getCopyFldStatement(fldName, fldType, structDef):
+    if isinstance(fldType, list):
+        if fldType[0] in structDef:
+            return fldName + ' = copyArr_' + fldType[0] + '(o.' + fldName + ');'
+        else:
+            return fldName + ' = (o.' + fldName + ' == null ? null : o.' + fldName + '.clone());'
+    elif fldType in structDef:
+        return fldName + ' = (o.' + fldName + ' == null ? null : o.' + fldName + '.copy());'
+    else:
+        return fldName + ' = o.' + fldName + ';'
+
+_tmplCopyMethod = Template('''
+%ACCESS%%CLASS-TYPE% copy() {
+    return new %CLASS-TYPE%(this, true);
 }
-%SET-FIELD-VAL%\
-'''
 
-_tmplParseFieldUndefaulted = '''
-if (json.has("%FIELD-NAME%")) {
-    fld = json.get("%FIELD-NAME%");
-} else {
-   throw new Error("field '%FIELD-NAME%' has no default value in the schema and is not set in the JSON file");
+// copy sharing the fields of this struct, but the structs and arrays on the path from pos, which are
+// copied in turn. So the value at the path can be set in the copy without changing this struct
+%ACCESS%%CLASS-TYPE% copyPath(KeyPath path, int pos) {
+    %CLASS-TYPE% _copy_ = new %CLASS-TYPE%(this, false);%OPT-COPY-NEXT-FIELD%
+    return _copy_;
 }
-%SET-FIELD-VAL%\
-'''
+
+private %CLASS-TYPE%(%CLASS-TYPE% o, boolean deep) {%SHARE-FIELDS%%OPT-DEEP-COPY-FIELDS%
+}
+''')
+
+_tmplDeepCopyFlds = Template('''
+
+if (deep) {%COPY-FIELDS%
+}\
+''')
+
+_tmplCopyNextFld = Template('''
+
+if (pos + 1 < path.segs.length) {
+    switch (path.codes[pos]) {
+%COPY-NEXT-FIELD%
+    }
+}\
+''')
+
+def _getCopyNextFld(fld, fldType, structDef):
+    if isinstance(fldType, list):
+        copyNext = '_copy_.' + fld + ' = copyArrPath_' + fldType[0] + '(' + fld + ', path, pos + 1);'
+    elif fldType in structDef:
+        copyNext = '_copy_.' + fld + ' = (' + fld + ' == null ? null : ' + fld + '.copyPath(path, pos + 1));'
+    else:
+        return None
+    return 'case ' + fld + '__ord:\n    ' + copyNext + '\n    break;'
+
+# -------------------------------------------------------------------------------
 
 # get declarations, field accessor defs and statements to set fields
+# returns the declarations, accessors, parse statements, copy statements of the fields, those sharing them and
+# those deep copying the structs and arrays, and the declarations of the defaults they are copied from
 def _getFieldRelatedCode(structDesc, enumDef, structDef, genIntf, isTopLevel):
     fldDecls = []
     fldAccessors = []
-    parseFields = []
+    parseCases = []
+    checkUnset = []
+    copyFields = []
+    shareFields = []
+    defaultDecls = []
+    (seenDecl, markSeen, notSeen) = _getSeenBitsetCode(len(structDesc))
     fldAccModifier = ('protected ' if genIntf else 'public ')
     for fldName, fldDesc in structDesc.items():
         fldImplType = _getFldJavaType(fldDesc, enumDef, structDef, False)
         fldVar = fldName
         fldDecls.append(fldAccModifier + fldImplType + ' '  + fldVar + ';')
+        shareFields.append(fldName + ' = o.' + fldName + ';')
+        if isinstance(fldDesc[schemaParser.NVDK_TYPE], list) or fldDesc[schemaParser.NVDK_TYPE] in structDef:
+            copyFields.append(_getCopyFldStatement(fldName, fldDesc[schemaParser.NVDK_TYPE], structDef))
         if isTopLevel and (schemaParser.NVDK_DEFAULT in fldDesc):
             fldDecls.append('private boolean ' + fldName + '__uses_default;')
+            shareFields.append(fldName + '__uses_default = o.' + fldName + '__uses_default;')
 
         if genIntf:
             fldIntfType = _getFldJavaType(fldDesc, enumDef, structDef, True)
             fldAccessors.append('public ' + fldIntfType + ' ' + fldVar + '() { return ' + fldVar + '; }')
 
+        ordinal = fldName + '__ord'
+        parseCases.append(_tmplParseFieldCase.render(
+                              SET_FIELD_VAL=_getAssignParsedFldStatements(fldName, fldDesc[schemaParser.NVDK_TYPE],
+                                                                          enumDef, structDef),
+                              MARK_SEEN=markSeen(ordinal),
+                              FIELD_NAME=fldName))
         if schemaParser.NVDK_DEFAULT in fldDesc:
-            if isTopLevel:
-                tmplParseField = _tmplParseFieldDefaultedTopLevel
-            else:
-                tmplParseField = _tmplParseFieldDefaultedInner
+            (defaultVal, defaultDecl) = _getDefaultCode(fldName, fldDesc[schemaParser.NVDK_TYPE],
+                                                        fldDesc[schemaParser.NVDK_DEFAULT], enumDef, structDef)
+            if defaultDecl != None:
+                defaultDecls.append(defaultDecl)
+            tmplFillDefault = (_tmplFillDefaultTopLevel if isTopLevel else _tmplFillDefaultInner)
+            checkUnset.append(tmplFillDefault.render(
+                                  NOT_SEEN=notSeen(ordinal),
+                                  DEFAULT_VAL=defaultVal,
+                                  FIELD_NAME=fldName))
         else:
-            tmplParseField = _tmplParseFieldUndefaulted
-
-        assignParsedFieldVal = _getAssignParsedFldStatements(fldName, fldDesc[schemaParser.NVDK_TYPE],
-                enumDef, structDef)
-        parseFields.append(tmplParseField
-                               .replace('%SET-FIELD-VAL%', assignParsedFieldVal)
-                               .replace('%FIELD-NAME%', fldName))
+            checkUnset.append(_tmplCheckUndefaultedSet.render(
+                                  NOT_SEEN=notSeen(ordinal),
+                                  FIELD_NAME=fldName))
 
-    return (fldDecls, fldAccessors, parseFields)
+    parseFields = lambda w: _tmplParseFields.emit(w,
+                      SEEN_DECL=seenDecl,
+                      PARSE_FIELD_CASES=indented(1, ''.join(parseCases)),
+                      CHECK_UNSET_FIELDS=''.join(checkUnset))
+    return (fldDecls, fldAccessors, parseFields, (copyFields, shareFields), defaultDecls)
 
 # -------------------------------------------------------------------------------------------------
 
-_tmplPPrintArrCall = '''pprintArr_%TY%(%VAL%, %INDENT%, sbuf, mode, selectionBits, %KEY-TAIL%, errMsg);'''
-_tmplPPrintStructCall = '''%TY%.pprintNullable(%VAL%, %INDENT%, sbuf, mode, selectionBits, %KEY-TAIL%, errMsg);'''
-_tmplPPrintNotQuotableBuiltInTypeCall = '''JsonSchema.pprint_%TY%(%VAL%, sbuf);'''
-_tmplPPrintQuotableBuiltInTypeCall = '''if (mode == JsonSchema.PrintMode.JSON) { JsonSchema.bprint(sbuf, "\\""); JsonSchema.pprint_%TY%(%VAL%, sbuf); JsonSchema.bprint(sbuf, "\\""); } else { JsonSchema.pprint_%TY%(%VAL%, sbuf); }'''
-_tmplPPrintEnumTypeCall = '''\
-JsonSchema.bprint(sbuf, mode == JsonSchema.PrintMode.JSON ? "\\"" + %VAL%.name() + "\\"" : %VAL%.name());'''
+# arguments of the path of a value passed to the next level, which are the path and the position in it of
+# the key segment of the level. the key of the value itself at the next level, or none for the whole value
+_pathTail = 'path, pos + 1'
+_wholePath = 'KeyPath.EMPTY, 0'
+
+_tmplPPrintArrCall = Template('''pprintArr_%TY%(%VAL%, %INDENT%, sbuf, mode, selectionBits, %PATH%, errMsg);''')
+_tmplPPrintStructCall = Template('''%TY%.pprintNullable(%VAL%, %INDENT%, sbuf, mode, selectionBits, %PATH%, errMsg);''')
+_tmplPPrintNotQuotableBuiltInTypeCall = Template('''JsonSchema.pprint_%TY%(%VAL%, sbuf);''')
+_tmplPPrintQuotableBuiltInTypeCall = Template('''if (mode == JsonSchema.PrintMode.JSON) { sbuf.append('"'); JsonSchema.pprint_%TY%(%VAL%, sbuf); sbuf.append('"'); } else { JsonSchema.pprint_%TY%(%VAL%, sbuf); }''')
+_tmplPPrintEnumTypeCall = Template('''\
+JsonSchema.pprint_enum(%VAL%, mode, sbuf);''')
 
-_tmplSelectAndRecurseIntoNextFld = '''\
-if (keyHead.equals("%FIELD-NAME%")) {
+_tmplSelectAndRecurseIntoNextFld = Template('''\
+case %FIELD-NAME%__ord:
     %RECURSE-INTO-NEXT-FLD%;
-}\
-'''
+    break;\
+''')
 
-_tmplPPrintLeafFld = '''\
-if (keyHead.equals("%FIELD-NAME%")) {
-    if (keyTail == null) {
+_tmplPPrintLeafFld = Template('''\
+case %FIELD-NAME%__ord:
+    if (pos + 1 == path.segs.length) {
         %PPRINT-LEAF-FLD%;
     } else {
-        JsonSchema.bprint(errMsg, "[Error] no such key '" + keyTail + "' in the JSON file");
+        errMsg.append("[Error] no such key '" + path.tail(pos + 1) + "' in the JSON file");
     }
-}\
-'''
+    break;\
+''')
 
 def _getPPrintNextStmts(fld, ty, enumDef, structDef):
     if isinstance(ty, list) or (ty in structDef):
 
         if isinstance(ty, list):
-            tmplPPrintCall = _tmplPPrintArrCall.replace('%TY%', ty[0])
+            tmplPPrintCall = _tmplPPrintArrCall
+            callee = ty[0]
         else:
-            classType = misc.getClasName(ty)
-            tmplPPrintCall = _tmplPPrintStructCall.replace('%TY%', classType)
-
-        pprintCall = (tmplPPrintCall
-                          .replace('%INDENT%', '0')
-                          .replace('%KEY-TAIL%', 'keyTail'))
-
-        return (_tmplSelectAndRecurseIntoNextFld
-                    .replace('%RECURSE-INTO-NEXT-FLD%', pprintCall)
-                    .replace('%VAL%', fld)
-                    .replace('%FIELD-NAME%', fld))
+            tmplPPrintCall = _tmplPPrintStructCall
+            callee = misc.getClasName(ty)
+
+        pprintCall = tmplPPrintCall.render(
+                          TY=callee,
+                          VAL=fld,
+                          INDENT='0',
+                          PATH=_pathTail)
+
+        return _tmplSelectAndRecurseIntoNextFld.render(
+                    RECURSE_INTO_NEXT_FLD=pprintCall,
+                    FIELD_NAME=fld)
     else:
         if (ty in builtInTypes.types):
 
@@ -245,111 +489,113 @@ def _getPPrintNextStmts(fld, ty, enumDef, structDef):
             else:
                 tmplPPrintCall = _tmplPPrintNotQuotableBuiltInTypeCall
 
-            pprintCall = tmplPPrintCall.replace('%TY%', ty)
+            pprintCall = tmplPPrintCall.render(TY=ty, VAL=fld)
 
         elif (ty in enumDef):
-            pprintCall = _tmplPPrintEnumTypeCall
+            pprintCall = _tmplPPrintEnumTypeCall.render(VAL=fld)
         else:
             assert False
 
-        return (_tmplPPrintLeafFld
-                    .replace('%PPRINT-LEAF-FLD%', pprintCall)
-                    .replace('%VAL%', fld)
-                    .replace('%FIELD-NAME%', fld))
+        return _tmplPPrintLeafFld.render(
+                    PPRINT_LEAF_FLD=pprintCall,
+                    FIELD_NAME=fld)
 
 # ----------------------------------------------------------------------------------------------------
 
-_tmplPrintComment = '''\
+_tmplPrintComment = Template('''\
     if ((selectionBits & JsonSchema.TOP_LEVEL_COMMENT) != 0) {
-        String fldComment = fldComments.get("%FIELD-NAME%").asStr().getString();
+        String fldComment = %FIELD-COMMENTS%.get("%FIELD-NAME%").asStr().getString();
         assert fldComment != null;
-        JsonSchema.bprint(sbuf, "\\n");
-        JsonSchema.bprint(sbuf, fldComment.replaceAll("\\\\n", "\\n"));
-        JsonSchema.bprint(sbuf, "\\n");
+        sbuf.append("\\n");
+        sbuf.append(fldComment.replaceAll("\\\\n", "\\n"));
+        sbuf.append("\\n");
     }
-'''
+''')
 
 _strNewLine = '''\
-    JsonSchema.bprint(sbuf, mode == JsonSchema.PrintMode.JSON ? ",\\n": "\\n");
+    sbuf.append(mode == JsonSchema.PrintMode.JSON ? ",\\n": "\\n");
 '''
 
-_tmplPlainFldPPrintStmts = '''
+_tmplPlainFldPPrintStmts = Template('''
 // %FIELD-NAME%
 //if ((selectionBits) != 0) {     TODO: implement filtering
 %OPT-NEW-LINE%\
 %OPT-PRINT-COMMENT%\
     JsonSchema.printIndent(indent + 1, sbuf);
     if (mode == JsonSchema.PrintMode.JSON) {
-        JsonSchema.bprint(sbuf, "\\"%FIELD-NAME%\\": ");
+        sbuf.append("\\"%FIELD-NAME%\\": ");
     } else {
-        JsonSchema.bprint(sbuf, "%FIELD-NAME%: ");
+        sbuf.append("%FIELD-NAME%: ");
     }
     %PPRINT-CALL%
 //}
-'''
+''')
 
-_tmplDefaultedTopLevelFldPPrintStmts = '''
+_tmplDefaultedTopLevelFldPPrintStmts = Template('''
 // %FIELD-NAME%
 //if ((selectionBits) != 0) {     TODO: implement filtering
 %OPT-NEW-LINE%\
 %OPT-PRINT-COMMENT%\
     JsonSchema.printIndent(indent + 1, sbuf);
     if ((selectionBits & JsonSchema.DEFAULT_COMMENT) != 0 && %FIELD-NAME%__uses_default) {
-        JsonSchema.bprint(sbuf, "//");
+        sbuf.append("//");
     }
     if (mode == JsonSchema.PrintMode.JSON) {
-        JsonSchema.bprint(sbuf, "\\"%FIELD-NAME%\\": ");
+        sbuf.append("\\"%FIELD-NAME%\\": ");
     } else {
-        JsonSchema.bprint(sbuf, "%FIELD-NAME%: ");
+        sbuf.append("%FIELD-NAME%: ");
     }
     if ((selectionBits & JsonSchema.DEFAULT_COMMENT) != 0 && %FIELD-NAME%__uses_default) {
-        JsonSchema.bprint(sbuf, "%default");
+        sbuf.append("%default");
     } else {
         %PPRINT-CALL%
     }
 //}
-'''
+''')
 
-def _getPPrintFldStmts(i, fld, ty, enumDef, structDef, writeComment, isDefaultedTopLevel):
+# fldComments is the Java expression of the field comments to print, if any
+def _getPPrintFldStmts(i, fld, ty, enumDef, structDef, fldComments, isDefaultedTopLevel):
 
     if isinstance(ty, list):
-        pprintCall = (_tmplPPrintArrCall
-                          .replace('%TY%', ty[0])
-                          .replace('%INDENT%', 'indent + 1')
-                          .replace('%KEY-TAIL%', 'null'))
+        pprintCall = _tmplPPrintArrCall.render(
+                          TY=ty[0],
+                          VAL=fld,
+                          INDENT='indent + 1',
+                          PATH=_wholePath)
     elif ty in builtInTypes.types:
         if ty in builtInTypes.typesQuotedOnlyInJSON:
             tmplPPrintBuiltInTypeCall = _tmplPPrintQuotableBuiltInTypeCall
         else:
             tmplPPrintBuiltInTypeCall = _tmplPPrintNotQuotableBuiltInTypeCall
 
-        pprintCall = tmplPPrintBuiltInTypeCall.replace('%TY%', ty)
+        pprintCall = tmplPPrintBuiltInTypeCall.render(TY=ty, VAL=fld)
     elif ty in enumDef:
-        pprintCall = _tmplPPrintEnumTypeCall
+        pprintCall = _tmplPPrintEnumTypeCall.render(VAL=fld)
     elif ty in structDef:
         classType = misc.getClasName(ty)
-        pprintCall = (_tmplPPrintStructCall
-                          .replace('%TY%', classType)
-                          .replace('%INDENT%', 'indent + 1')
-                          .replace('%KEY-TAIL%', 'null'))
+        pprintCall = _tmplPPrintStructCall.render(
+                          TY=classType,
+                          VAL=fld,
+                          INDENT='indent + 1',
+                          PATH=_wholePath)
 
     tmplFldPPrintStmts = _tmplDefaultedTopLevelFldPPrintStmts if isDefaultedTopLevel else _tmplPlainFldPPrintStmts
 
-    return (tmplFldPPrintStmts
-                .replace('%OPT-NEW-LINE%', _strNewLine if i > 0 else '')
-                .replace('%OPT-PRINT-COMMENT%', _tmplPrintComment if writeComment else '')
-                .replace('%PPRINT-CALL%', pprintCall)
-                .replace('%VAL%', fld)
-                .replace('%FIELD-NAME%', fld))
+    return tmplFldPPrintStmts.render(
+                OPT_NEW_LINE=_strNewLine if i > 0 else '',
+                OPT_PRINT_COMMENT=(_tmplPrintComment.render(FIELD_COMMENTS=fldComments, FIELD_NAME=fld)
+                                   if fldComments else ''),
+                PPRINT_CALL=pprintCall,
+                FIELD_NAME=fld)
 
 # -------------------------------------------------------------------------------------------
 
-_tmplUnsetDefaultFlag = '''
+_tmplUnsetDefaultFlag = Template('''
     %FLD%__uses_default = false;\
-'''
+''')
 
-_tmplUpdateFld = '''\
-if (keyHead.equals("%FLD%")) {
+_tmplUpdateFld = Template('''\
+case %FLD%__ord: {
     %FLD-JAVA-TYPE% newVal;
     try {
         newVal = %PARSE-NEW-VAL%;
@@ -369,26 +615,28 @@ if (keyHead.equals("%FLD%")) {
 %OPT-UNSET-DEFAULT-FLAG%
     return JsonSchema.SetErr.OK;
 }\
-'''
+''')
 
 def _getUpdateFld(fld, fldType, fldDefaulted, enumDef, structDef, isTopLevel):
-    parseNewVal = _getParseValTmpl(fldType, enumDef, structDef).replace('%VAL%', 'newValJSON')
+    parseNewVal = _getParseVal(fldType, 'newValJSON', enumDef, structDef)
 
     if fldDefaulted and isTopLevel:
-        tmpl = _tmplUpdateFld.replace('%OPT-UNSET-DEFAULT-FLAG%', _tmplUnsetDefaultFlag)
+        optUnsetDefaultFlag = _tmplUnsetDefaultFlag.render(FLD=fld)
     else:
-        tmpl = _tmplUpdateFld.replace('%OPT-UNSET-DEFAULT-FLAG%', '')
+        optUnsetDefaultFlag = ''
 
-    return (tmpl.replace('%FLD-JAVA-TYPE%', _schemaTypeToJavaType(fldType, enumDef, structDef, False))
-                .replace('%PARSE-NEW-VAL%', parseNewVal)
-                .replace('%FLD-JAVA-NAME%', fld)
-                .replace('%FLD%', fld))
+    return _tmplUpdateFld.render(
+                OPT_UNSET_DEFAULT_FLAG=optUnsetDefaultFlag,
+                FLD_JAVA_TYPE=_schemaTypeToJavaType(fldType, enumDef, structDef, False),
+                PARSE_NEW_VAL=parseNewVal,
+                FLD_JAVA_NAME=fld,
+                FLD=fld)
 
 # ---------------------------------------------------------------------------------------------------------
 
 
-_tmplInsertArrElem = '''\
-if (keyHead.equals("%FLD%")) {
+_tmplInsertArrElem = Template('''\
+case %FLD%__ord: {
     %ELEM-JAVA-TYPE% newVal;
     final int IDX_MAX = %FLD-JAVA-NAME% == null ? 0 : %FLD-JAVA-NAME%.length;
 
@@ -433,29 +681,31 @@ if (keyHead.equals("%FLD%")) {
 %OPT-UNSET-DEFAULT-FLAG%
     return JsonSchema.SetErr.OK;
 }\
-'''
+''')
 
 def _getInsertArrElem(fld, fldType, fldDefaulted, enumDef, structDef, isTopLevel):
     assert isinstance(fldType, list)
     elemType = fldType[0]
 
-    parseNewVal = _getParseValTmpl(elemType, enumDef, structDef).replace('%VAL%', 'newValJSON')
+    parseNewVal = _getParseVal(elemType, 'newValJSON', enumDef, structDef)
 
     if fldDefaulted and isTopLevel:
-        tmpl = _tmplInsertArrElem.replace('%OPT-UNSET-DEFAULT-FLAG%', _tmplUnsetDefaultFlag)
+        optUnsetDefaultFlag = _tmplUnsetDefaultFlag.render(FLD=fld)
     else:
-        tmpl = _tmplInsertArrElem.replace('%OPT-UNSET-DEFAULT-FLAG%', '')
+        optUnsetDefaultFlag = ''
 
-    return (tmpl.replace('%ELEM-JAVA-TYPE%', _schemaTypeToJavaType(elemType, enumDef, structDef, False))
-                .replace('%PARSE-NEW-VAL%', parseNewVal)
-                .replace('%FLD-JAVA-NAME%', fld)
-                .replace('%FLD%', fld))
+    return _tmplInsertArrElem.render(
+                OPT_UNSET_DEFAULT_FLAG=optUnsetDefaultFlag,
+                ELEM_JAVA_TYPE=_schemaTypeToJavaType(elemType, enumDef, structDef, False),
+                PARSE_NEW_VAL=parseNewVal,
+                FLD_JAVA_NAME=fld,
+                FLD=fld)
 
 
 # ---------------------------------------------------------------------------------------------------------
 
-_tmplRemoveArrElem = '''\
-if (keyHead.equals("%FLD%")) {
+_tmplRemoveArrElem = Template('''\
+case %FLD%__ord: {
     int IDX_MAX;
     if (%FLD-JAVA-NAME% != null && %FLD-JAVA-NAME%.length > 0) {
         IDX_MAX = %FLD-JAVA-NAME%.length - 1;
@@ -497,54 +747,56 @@ if (keyHead.equals("%FLD%")) {
 %OPT-UNSET-DEFAULT-FLAG%
     return JsonSchema.SetErr.OK;
 }\
-'''
+''')
 
 def _getRemoveArrElem(fld, fldType, fldDefaulted, enumDef, structDef, isTopLevel):
     assert isinstance(fldType, list)
     elemType = fldType[0]
 
     if fldDefaulted and isTopLevel:
-        tmpl = _tmplRemoveArrElem.replace('%OPT-UNSET-DEFAULT-FLAG%', _tmplUnsetDefaultFlag)
+        optUnsetDefaultFlag = _tmplUnsetDefaultFlag.render(FLD=fld)
     else:
-        tmpl = _tmplRemoveArrElem.replace('%OPT-UNSET-DEFAULT-FLAG%', '')
+        optUnsetDefaultFlag = ''
 
-    return (tmpl.replace('%ELEM-JAVA-TYPE%', _schemaTypeToJavaType(elemType, enumDef, structDef, False))
-                .replace('%FLD-JAVA-NAME%', fld)
-                .replace('%FLD%', fld))
+    return _tmplRemoveArrElem.render(
+                OPT_UNSET_DEFAULT_FLAG=optUnsetDefaultFlag,
+                ELEM_JAVA_TYPE=_schemaTypeToJavaType(elemType, enumDef, structDef, False),
+                FLD_JAVA_NAME=fld,
+                FLD=fld)
 
 # ---------------------------------------------------------------------------------------------------------
 
-_tmplRecurseSetArrWithDefaultFlag = '''\
-if (keyHead.equals("%FLD%")) {
-    JsonSchema.SetErr recRes = setArr_%FLD-TYPE%(mode, %FLD-JAVA-NAME%, %IS-ARR-SETTABLE%, keyTail, idx, newValJSON, checkOnly, onVal, errMsg);
+_tmplRecurseSetArrWithDefaultFlag = Template('''\
+case %FLD%__ord: {
+    JsonSchema.SetErr recRes = setArr_%FLD-TYPE%(mode, %FLD-JAVA-NAME%, %IS-ARR-SETTABLE%, path, pos + 1, idx, newValJSON, checkOnly, onVal, errMsg);
     if (!checkOnly && (recRes == JsonSchema.SetErr.OK)) {
         %FLD%__uses_default = false;
     }
     return recRes;
 }\
-'''
+''')
 
-_tmplRecurseSetNonArrWithDefaultFlag = '''\
-if (keyHead.equals("%FLD%")) {
-    JsonSchema.SetErr recRes = %CLASS-TYPE%.setNullable(%FLD-JAVA-NAME%, mode, keyTail, idx, newValJSON, checkOnly, onVal, errMsg);
+_tmplRecurseSetNonArrWithDefaultFlag = Template('''\
+case %FLD%__ord: {
+    JsonSchema.SetErr recRes = %CLASS-TYPE%.setNullable(%FLD-JAVA-NAME%, mode, path, pos + 1, idx, newValJSON, checkOnly, onVal, errMsg);
     if (!checkOnly && (recRes == JsonSchema.SetErr.OK)) {
         %FLD%__uses_default = false;
     }
     return recRes;
 }\
-'''
+''')
 
-_tmplRecurseSetArr = '''\
-if (keyHead.equals("%FLD%")) {
-    return setArr_%FLD-TYPE%(mode, %FLD-JAVA-NAME%, %IS-ARR-SETTABLE%, keyTail, idx, newValJSON, checkOnly, onVal, errMsg);
+_tmplRecurseSetArr = Template('''\
+case %FLD%__ord: {
+    return setArr_%FLD-TYPE%(mode, %FLD-JAVA-NAME%, %IS-ARR-SETTABLE%, path, pos + 1, idx, newValJSON, checkOnly, onVal, errMsg);
 }\
-'''
+''')
 
-_tmplRecurseSetNonArr = '''\
-if (keyHead.equals("%FLD%")) {
-    return %CLASS-TYPE%.setNullable(%FLD-JAVA-NAME%, mode, keyTail, idx, newValJSON, checkOnly, onVal, errMsg);
+_tmplRecurseSetNonArr = Template('''\
+case %FLD%__ord: {
+    return %CLASS-TYPE%.setNullable(%FLD-JAVA-NAME%, mode, path, pos + 1, idx, newValJSON, checkOnly, onVal, errMsg);
 }\
-'''
+''')
 
 def _getRecurseSet(fld, fldType, fldSettable, fldDefaulted, enumDef, structDef, isTopLevel):
     if isinstance(fldType, list):
@@ -552,18 +804,20 @@ def _getRecurseSet(fld, fldType, fldSettable, fldDefaulted, enumDef, structDef,
             tmpl = _tmplRecurseSetArrWithDefaultFlag
         else:
             tmpl = _tmplRecurseSetArr
-        return (tmpl.replace('%FLD%', fld)
-                    .replace('%FLD-JAVA-NAME%', fld)
-                    .replace('%FLD-TYPE%', fldType[0])
-                    .replace('%IS-ARR-SETTABLE%', 'true' if fldSettable else 'false'))
+        return tmpl.render(
+                    FLD=fld,
+                    FLD_JAVA_NAME=fld,
+                    FLD_TYPE=fldType[0],
+                    IS_ARR_SETTABLE='true' if fldSettable else 'false')
     elif fldType in structDef:
         if fldDefaulted and isTopLevel:
             tmpl = _tmplRecurseSetNonArrWithDefaultFlag
         else:
             tmpl = _tmplRecurseSetNonArr
-        return (tmpl.replace('%FLD%', fld)
-                    .replace('%FLD-JAVA-NAME%', fld)
-                    .replace('%CLASS-TYPE%', misc.getClasName(fldType)))
+        return tmpl.render(
+                    FLD=fld,
+                    FLD_JAVA_NAME=fld,
+                    CLASS_TYPE=misc.getClasName(fldType))
     else:
         assert False
 
@@ -580,31 +834,29 @@ _strStructSetCurrWithoutSettableArrs = '''
             return JsonSchema.SetErr.ERR_NOT_AN_ARRAY;\
 '''
 
-_tmplStructSetCurrWithSettableArrs = '''
+_tmplStructSetCurrWithSettableArrs = Template('''
         case INSERT:
             assert idx >= -1;
             assert newValJSON != null;
 
-            if (%IS-NOT-SETTABLE-ARRAY%) {
+            switch (fld) {
+%INSERT-ARR-ELEM%
+            default:
                 errMsg.append("[Error] unable to insert an element into a non-array field " + keyHead);
                 return JsonSchema.SetErr.ERR_NOT_AN_ARRAY;
             }
-%INSERT-ARR-ELEM%
-            assert false;   // unreachable
-            break;
 
         case REMOVE:
             assert idx >= -1;
             assert newValJSON == null;
 
-            if (%IS-NOT-SETTABLE-ARRAY%) {
+            switch (fld) {
+%REMOVE-ARR-ELEM%
+            default:
                 errMsg.append("[Error] unable to remove an element from a non-array field " + keyHead);
                 return JsonSchema.SetErr.ERR_NOT_AN_ARRAY;
-            }
-%REMOVE-ARR-ELEM%
-            assert false;   // unreachable
-            break;\
-'''
+            }\
+''')
 
 _strStructSetCurrWithoutSettables = '''
         // this struct has no settable fields at the current level
@@ -612,10 +864,13 @@ _strStructSetCurrWithoutSettables = '''
         return JsonSchema.SetErr.ERR_NOT_SETTABLE;\
 '''
 
-_tmplStructSetCurrWithSettables = '''
+_tmplStructSetCurrWithSettables = Template('''
         // keyHead is the field to set
 
-        if (%IS-NOT-SETTABLE%) {
+        switch (fld) {
+%SETTABLE-FIELD-CASES%
+            break;
+        default:
             errMsg.append("[Error] unable to set field " + keyHead + " which is not settable");
             return JsonSchema.SetErr.ERR_NOT_SETTABLE;
         }
@@ -624,9 +879,13 @@ _tmplStructSetCurrWithSettables = '''
         case UPDATE:
             assert idx == -1;
             assert newValJSON != null;
+
+            switch (fld) {
 %UPDATE-FIELD%
-            assert false;   // unreachable
-            break;
+            default:
+                assert false;   // unreachable
+                return JsonSchema.SetErr.ERR_UNREACHABLE;
+            }
 %SET-THIS-LEVEL-ARR-FIELDS%
 
         default:
@@ -635,42 +894,39 @@ _tmplStructSetCurrWithSettables = '''
 
         assert false;
         return JsonSchema.SetErr.ERR_UNREACHABLE;\
-'''
+''')
 
-_tmplStructSetDef = '''
-private JsonSchema.SetErr set(JsonSchema.SetMode mode, String key, int idx, Json newValJSON, boolean checkOnly, Object[] onVal, StringBuffer errMsg) {
+_tmplStructSetDef = Template('''
+private JsonSchema.SetErr set(JsonSchema.SetMode mode, KeyPath path, int pos, int idx, Json newValJSON, boolean checkOnly, Object[] onVal, StringBuffer errMsg) {
 
-    assert key != null: "key may not be null";
+    assert pos < path.segs.length: "key may not be null";
 
-    String keyHead, keyTail;
-    int delim = key.indexOf('.');
-    if (delim < 0) {
-        keyHead = key;
-        keyTail = null;
-    } else {
-        keyHead = key.substring(0, delim);
-        keyTail = key.substring(delim + 1);
-    }
+    String keyHead = path.segs[pos];
+    int fld = path.codes[pos];
 
-    if (keyTail == null) {
+    if (pos + 1 == path.segs.length) {
 %SET-THIS-LEVEL-FIELDS%
     } else {
-%CHECK-SIMPLE-FLD%
+        switch (fld) {
 %RECURSE-INTO-NEXT-FLD%
-        errMsg.append("[Error] invalid key segment " + keyHead);
-        return JsonSchema.SetErr.ERR_NO_SUCH_FIELD;
+        default:
+            errMsg.append("[Error] invalid key segment " + keyHead);
+            return JsonSchema.SetErr.ERR_NO_SUCH_FIELD;
+        }
     }
 }
-'''
+''')
 
-_tmplCheckSimpleFld = '''
-if (%IS-SIMPLE-FLD%) {
+_tmplCheckSimpleFld = Template('''\
+%SIMPLE-FIELD-CASES%
     errMsg.append("[Error] unable to recurse set into " + keyHead + " which has no substructures");
-    return JsonSchema.SetErr.ERR_DEREF_PRIMITIVE;
-}\
-'''
+    return JsonSchema.SetErr.ERR_DEREF_PRIMITIVE;\
+''')
 
-def _getSetMethodDef(struct, structDesc, enumDef, structDef, isTopLevel):
+def _getOrdinalCases(fields):
+    return '\n'.join('case ' + fld + '__ord:' for fld in fields)
+
+def _writeSetMethodDef(w, struct, structDesc, enumDef, structDef, isTopLevel):
     assert structDesc != None;
 
     fields = list(structDesc.keys())
@@ -695,15 +951,10 @@ def _getSetMethodDef(struct, structDesc, enumDef, structDef, isTopLevel):
             if isinstance(fldType, list):
                 settableArrayFld.append(fld)
 
-    # checkSimpleFld
-    if len(simpleFld) > 0:
-        isSimpleFld = ' || '.join(map(lambda fld: 'keyHead.equals("' + fld + '")', simpleFld))
-        checkSimpleFld = _tmplCheckSimpleFld.replace('%IS-SIMPLE-FLD%', isSimpleFld)
-    else:
-        checkSimpleFld = ''
-
-    # recurse
+    # recurse, after the check of simple fields
     recurse = []
+    if len(simpleFld) > 0:
+        recurse.append(_tmplCheckSimpleFld.render(SIMPLE_FIELD_CASES=_getOrdinalCases(simpleFld)))
     for fld in compoundFld:
         fldDesc = structDesc[fld]
         fldType = fldDesc[schemaParser.NVDK_TYPE]
@@ -711,12 +962,8 @@ def _getSetMethodDef(struct, structDesc, enumDef, structDef, isTopLevel):
         fldDefaulted = (schemaParser.NVDK_DEFAULT in fldDesc)
         recurse.append(_getRecurseSet(fld, fldType, fldSettable, fldDefaulted, enumDef, structDef, isTopLevel))
 
-    tmpl = _tmplStructSetDef
     if len(settableFld) > 0:
-        tmpl = tmpl.replace('%SET-THIS-LEVEL-FIELDS%', _tmplStructSetCurrWithSettables)
-
-        # isNotSettable
-        isNotSettable = ' && '.join(map(lambda fld: '!keyHead.equals("' + fld + '")', settableFld))
+        settableFldCases = _getOrdinalCases(settableFld)
 
         # update
         update = []
@@ -726,15 +973,7 @@ def _getSetMethodDef(struct, structDesc, enumDef, structDef, isTopLevel):
             fldDefaulted = (schemaParser.NVDK_DEFAULT in fldDesc)
             update.append(_getUpdateFld(fld, fldType, fldDefaulted, enumDef, structDef, isTopLevel))
 
-        tmpl = (tmpl.replace('%IS-NOT-SETTABLE%', isNotSettable)
-                    .replace('%UPDATE-FIELD%', util.indent(' else '.join(update), 3)))
-
         if len(settableArrayFld) > 0:
-            tmpl = tmpl.replace('%SET-THIS-LEVEL-ARR-FIELDS%', _tmplStructSetCurrWithSettableArrs)
-
-            # isNotSettableArray
-            isNotSettableArray = ' && '.join(map(lambda fld: '!keyHead.equals("' + fld + '")', settableArrayFld))
-
             # insertArrElem and removeArrElem
             insertArrElem = []
             removeArrElem = []
@@ -745,22 +984,28 @@ def _getSetMethodDef(struct, structDesc, enumDef, structDef, isTopLevel):
                 insertArrElem.append(_getInsertArrElem(fld, fldType, fldDefaulted, enumDef, structDef, isTopLevel))
                 removeArrElem.append(_getRemoveArrElem(fld, fldType, fldDefaulted, enumDef, structDef, isTopLevel))
 
-            tmpl = (tmpl.replace('%IS-NOT-SETTABLE-ARRAY%', isNotSettableArray)
-                        .replace('%INSERT-ARR-ELEM%', util.indent(' else '.join(insertArrElem), 3))
-                        .replace('%REMOVE-ARR-ELEM%', util.indent(' else '.join(removeArrElem), 3)))
+            setThisLevelArrFields = lambda w: _tmplStructSetCurrWithSettableArrs.emit(w,
+                        INSERT_ARR_ELEM=indented(3, '\n'.join(insertArrElem)),
+                        REMOVE_ARR_ELEM=indented(3, '\n'.join(removeArrElem)))
 
         else:
-            tmpl = tmpl.replace('%SET-THIS-LEVEL-ARR-FIELDS%', _strStructSetCurrWithoutSettableArrs)
+            setThisLevelArrFields = _strStructSetCurrWithoutSettableArrs
+
+        setThisLevelFields = lambda w: _tmplStructSetCurrWithSettables.emit(w,
+                    SETTABLE_FIELD_CASES=indented(2, settableFldCases),
+                    UPDATE_FIELD=indented(3, '\n'.join(update)),
+                    SET_THIS_LEVEL_ARR_FIELDS=setThisLevelArrFields)
     else:
-        tmpl = tmpl.replace('%SET-THIS-LEVEL-FIELDS%', _strStructSetCurrWithoutSettables)
+        setThisLevelFields = _strStructSetCurrWithoutSettables
 
-    return (tmpl.replace('%CHECK-SIMPLE-FLD%', util.indent(checkSimpleFld, 2))
-                .replace('%RECURSE-INTO-NEXT-FLD%', util.indent(' else '.join(recurse), 2)))
+    _tmplStructSetDef.emit(w,
+                SET_THIS_LEVEL_FIELDS=setThisLevelFields,
+                RECURSE_INTO_NEXT_FLD=indented(2, '\n'.join(recurse)))
 
 # -------------------------------------------------------------------------------------------
 
-_tmplParseArrFld = '''
-private static %ELEM-JAVA-TYPE%[] parseArr_%ELEM-TYPE%(Json fld) {
+_tmplParseArrFld = Template('''
+%ACCESS%static %ELEM-JAVA-TYPE%[] parseArr_%ELEM-TYPE%(Json fld) {
     if (JsonObj.NULL.equals(fld)) {
         return null;
     } else if (fld instanceof JSONArray) {
@@ -776,75 +1021,65 @@ private static %ELEM-JAVA-TYPE%[] parseArr_%ELEM-TYPE%(Json fld) {
         throw new Error("JSON value of a %ELEM-TYPE% array type field is neither null nor an array: " + fld.getClass());
     }
 }
-'''
+''')
 
-def _getArrParseDef(elemType, enumDef, structDef):
+def _writeArrParseDef(w, elemType, enumDef, structDef, split):
     #NOTE: elemType cannot be an array type
-    parseFld = _getParseValTmpl(elemType, enumDef, structDef).replace('%VAL%', 'fldElem')
-    return (_tmplParseArrFld
-                .replace('%ELEM-TYPE%', elemType)
-                .replace('%ELEM-JAVA-TYPE%', _schemaTypeToJavaType(elemType, enumDef, structDef, False))
-                .replace('%PARSE-FIELD-VAL%', parseFld))
-
-_tmplPPrintNonStructElem = '''
-if (keyTail == null) {
+    parseFld = _getParseVal(elemType, 'fldElem', enumDef, structDef)
+    _tmplParseArrFld.emit(w,
+                ACCESS=_getSharedAccess(split),
+                ELEM_TYPE=elemType,
+                ELEM_JAVA_TYPE=_schemaTypeToJavaType(elemType, enumDef, structDef, False),
+                PARSE_FIELD_VAL=parseFld)
+
+_tmplPPrintNonStructElem = Template('''
+if (pos + 1 == path.segs.length) {
     %PPRINT-CALL%
 } else {
-    JsonSchema.bprint(errMsg, "[Error] no such key '" + keyTail + "' in the JSON file");
+    errMsg.append("[Error] no such key '" + path.tail(pos + 1) + "' in the JSON file");
     return;
 }
-'''
+''')
 
-_tmplPPrintArr = '''
-private static void pprintArr_%ELEM-TYPE%(%ELEM-JAVA-TYPE%[] arr, int indent, StringBuffer sbuf,
-        JsonSchema.PrintMode mode, long selectionBits, String key, StringBuffer errMsg) {
-    if (key == null) {
+_tmplPPrintArr = Template('''
+%ACCESS%static void pprintArr_%ELEM-TYPE%(%ELEM-JAVA-TYPE%[] arr, int indent, StringBuilder sbuf,
+        JsonSchema.PrintMode mode, long selectionBits, KeyPath path, int pos, StringBuilder errMsg) {
+    if (pos == path.segs.length) {
         if (arr == null) {
-            JsonSchema.bprint(sbuf, "null");
+            sbuf.append("null");
         } else if (arr.length == 0) {
-            JsonSchema.bprint(sbuf, "[ ]");
+            sbuf.append("[ ]");
         } else {
-            JsonSchema.bprint(sbuf, "[\\n");
+            sbuf.append("[\\n");
             for (int i = 0; i < arr.length; i++) {
                 %ELEM-JAVA-TYPE% elem = arr[i];
                 if (i > 0) {
-                    JsonSchema.bprint(sbuf, mode == JsonSchema.PrintMode.JSON ? ",\\n": "\\n");
+                    sbuf.append(mode == JsonSchema.PrintMode.JSON ? ",\\n": "\\n");
                 }
                 JsonSchema.printIndent(indent + 1, sbuf);
                 %PPRINT-CALL%
             }
-            JsonSchema.bprint(sbuf, "\\n");
+            sbuf.append("\\n");
             JsonSchema.printIndent(indent, sbuf);
-            JsonSchema.bprint(sbuf, "]");
+            sbuf.append("]");
         }
     } else {
-        int delim, idx;
-        String keyHead, keyTail;
+        String keyHead = path.segs[pos];
+        int idx = path.codes[pos];
         assert indent == 0: "indent must be zero";
 
-        delim = key.indexOf('.');
-        if (delim < 0) {
-            keyHead = key;
-            keyTail = null;
-        } else {
-            keyHead = key.substring(0, delim);
-            keyTail = key.substring(delim + 1);
-        }
-
-        try {
-            idx = Integer.valueOf(keyHead, 10);
-        } catch (NumberFormatException e) {
-            JsonSchema.bprint(errMsg, "[Error] invalid array index (not an integer) " + keyHead);
+        if (idx == KeyPath.NOT_AN_INDEX) {
+            errMsg.append("[Error] invalid array index (not an integer) " + keyHead);
             return;
         }
 
         if (arr == null) {
-            JsonSchema.bprint(errMsg, String.format("[Error] unable to get the element %d of a null array", idx));
+            errMsg.append(String.format("[Error] unable to get the element %d of a null array", idx));
             return;
         }
 
-        if (idx >= arr.length) {
-            JsonSchema.bprint(errMsg,
+        if (idx < 0 || idx >= arr.length) {
+            errMsg.append(
                 String.format("[Error] invalid array index %d for an array with length %d", idx, arr.length));
             return;
         }
@@ -853,43 +1088,45 @@ private static void pprintArr_%ELEM-TYPE%(%ELEM-JAVA-TYPE%[] arr, int indent, St
 %PPRINT-ARR-ELEM%
     }
 }
-'''
+''')
 
-def _getArrPPrintDef(elemType, enumDef, structDef):
+def _writeArrPPrintDef(w, elemType, enumDef, structDef, split):
     if elemType in builtInTypes.types:
         if elemType in builtInTypes.typesQuotedOnlyInJSON:
             tmplPPrintBuiltInTypeCall = _tmplPPrintQuotableBuiltInTypeCall
         else:
             tmplPPrintBuiltInTypeCall = _tmplPPrintNotQuotableBuiltInTypeCall
 
-        pprintCall = (tmplPPrintBuiltInTypeCall.replace('%TY%', elemType))
-        pprintArrElem = _tmplPPrintNonStructElem
+        pprintCall = tmplPPrintBuiltInTypeCall.render(TY=elemType, VAL='elem')
+        pprintArrElem = _tmplPPrintNonStructElem.render(PPRINT_CALL=pprintCall)
     elif elemType in enumDef:
-        pprintCall = _tmplPPrintEnumTypeCall
-        pprintArrElem = _tmplPPrintNonStructElem
+        pprintCall = _tmplPPrintEnumTypeCall.render(VAL='elem')
+        pprintArrElem = _tmplPPrintNonStructElem.render(PPRINT_CALL=pprintCall)
     elif elemType in structDef:
         classType = misc.getClasName(elemType)
-        pprintCall = (_tmplPPrintStructCall
-                          .replace('%TY%', classType)
-                          .replace('%INDENT%', 'indent + 1')
-                          .replace('%KEY-TAIL%', 'null'))
-        pprintArrElem = (_tmplPPrintStructCall
-                             .replace('%TY%', classType)
-                             .replace('%INDENT%', '0')
-                             .replace('%KEY-TAIL%', 'keyTail'))
-
-    return (_tmplPPrintArr
-                .replace('%ELEM-TYPE%', elemType)
-                .replace('%ELEM-JAVA-TYPE%', _schemaTypeToJavaType(elemType, enumDef, structDef, False))
-                .replace('%PPRINT-ARR-ELEM%', util.indent(pprintArrElem, 2))
-                .replace('%PPRINT-CALL%', pprintCall)
-                .replace('%VAL%', 'elem'))
+        pprintCall = _tmplPPrintStructCall.render(
+                          TY=classType,
+                          VAL='elem',
+                          INDENT='indent + 1',
+                          PATH=_wholePath)
+        pprintArrElem = _tmplPPrintStructCall.render(
+                             TY=classType,
+                             VAL='elem',
+                             INDENT='0',
+                             PATH=_pathTail)
+
+    _tmplPPrintArr.emit(w,
+                ACCESS=_getSharedAccess(split),
+                ELEM_TYPE=elemType,
+                ELEM_JAVA_TYPE=_schemaTypeToJavaType(elemType, enumDef, structDef, False),
+                PPRINT_ARR_ELEM=indented(2, pprintArrElem),
+                PPRINT_CALL=pprintCall)
 
 
 
 # -------------------------------------------------------------------------------
 
-_tmplUpdateElem = '''\
+_tmplUpdateElem = Template('''\
 %ELEM-JAVA-TYPE% newVal;
 try {
     newVal = %PARSE-NEW-VAL%;
@@ -907,33 +1144,24 @@ if (checkOnly) {
 
 arr[elemIdx] = newVal;
 return JsonSchema.SetErr.OK;\
-'''
+''')
 
 def _getUpdateElem(elemType, enumDef, structDef):
     assert not isinstance(elemType, list)
-    parseNewVal = _getParseValTmpl(elemType, enumDef, structDef).replace('%VAL%', 'newValJSON')
-    return _tmplUpdateElem.replace('%PARSE-NEW-VAL%', parseNewVal)
+    parseNewVal = _getParseVal(elemType, 'newValJSON', enumDef, structDef)
+    return _tmplUpdateElem.render(
+                ELEM_JAVA_TYPE=_schemaTypeToJavaType(elemType, enumDef, structDef, False),
+                PARSE_NEW_VAL=parseNewVal)
 
 # ---------------------------------------------------------------------------------------------------------
 
-_tmplArrSetDef = '''
-private static JsonSchema.SetErr setArr_%ELEM-TYPE%(JsonSchema.SetMode mode, %ELEM-JAVA-TYPE%[] arr, boolean settable, String key, int idx, Json newValJSON, boolean checkOnly, Object[] onVal, StringBuffer errMsg) {
-    assert key != null;
+_tmplArrSetDef = Template('''
+%ACCESS%static JsonSchema.SetErr setArr_%ELEM-TYPE%(JsonSchema.SetMode mode, %ELEM-JAVA-TYPE%[] arr, boolean settable, KeyPath path, int pos, int idx, Json newValJSON, boolean checkOnly, Object[] onVal, StringBuffer errMsg) {
+    assert pos < path.segs.length;
 
-    String keyHead, keyTail;
-    int delim = key.indexOf('.');
-    if (delim < 0) {
-        keyHead = key;
-        keyTail = null;
-    } else {
-        keyHead = key.substring(0, delim);
-        keyTail = key.substring(delim + 1);
-    }
-
-    int elemIdx;
-    try {
-        elemIdx = Integer.valueOf(keyHead);
-    } catch (NumberFormatException e) {
+    String keyHead = path.segs[pos];
+    int elemIdx = path.codes[pos];
+    if (elemIdx == KeyPath.NOT_AN_INDEX) {
         errMsg.append("[Error] key segment " + keyHead + " must be an integer which is an array element index");
         return JsonSchema.SetErr.ERR_BAD_INDEX;
     }
@@ -953,7 +1181,7 @@ private static JsonSchema.SetErr setArr_%ELEM-TYPE%(JsonSchema.SetMode mode, %EL
         return JsonSchema.SetErr.ERR_INDEX_OUT_OF_RANGE;
     }
 
-    if (keyTail == null) {
+    if (pos + 1 == path.segs.length) {
         // keyHead is the field to set
 
         if (settable) {
@@ -984,91 +1212,157 @@ private static JsonSchema.SetErr setArr_%ELEM-TYPE%(JsonSchema.SetMode mode, %EL
 %ERROR-OR-RECURSE-INTO-NEXT-FLD%
     }
 }
-'''
+''')
 
-_tmplDoRecurse = '''\
-return %ELEM-JAVA-TYPE%.setNullable(arr[elemIdx], mode, keyTail, idx, newValJSON, checkOnly, onVal, errMsg);\
-'''
+_tmplDoRecurse = Template('''\
+return %ELEM-JAVA-TYPE%.setNullable(arr[elemIdx], mode, path, pos + 1, idx, newValJSON, checkOnly, onVal, errMsg);\
+''')
 
-_tmplRecurseError = '''\
+_tmplRecurseError = Template('''\
 errMsg.append("[Error] cannot recurse set into the array element " + keyHead + " of a simple type " + "%ELEM-TYPE%");
 return JsonSchema.SetErr.ERR_DEREF_PRIMITIVE;\
-'''
+''')
 
-def _getArrSetDef(elemType, enumDef, structDef):
+def _writeArrSetDef(w, elemType, enumDef, structDef, split):
     # array element cannot be of an array type
     assert not isinstance(elemType, list)
 
+    elemJavaType = _schemaTypeToJavaType(elemType, enumDef, structDef, False)
+
     if elemType in structDef:
-        errOrRec = _tmplDoRecurse
+        errOrRec = _tmplDoRecurse.render(ELEM_JAVA_TYPE=elemJavaType)
     else:
-        errOrRec = _tmplRecurseError
+        errOrRec = _tmplRecurseError.render(ELEM_TYPE=elemType)
 
     updateFld = _getUpdateElem(elemType, enumDef, structDef)
 
-    return (_tmplArrSetDef
-               .replace('%ERROR-OR-RECURSE-INTO-NEXT-FLD%', util.indent(errOrRec, 2))
-               .replace('%UPDATE-ELEM%', util.indent(updateFld, 4))
-               .replace('%ELEM-TYPE%', elemType)
-               .replace('%ELEM-JAVA-TYPE%', _schemaTypeToJavaType(elemType, enumDef, structDef, False))
-               )
+    _tmplArrSetDef.emit(w,
+               ACCESS=_getSharedAccess(split),
+               ERROR_OR_RECURSE_INTO_NEXT_FLD=indented(2, errOrRec),
+               UPDATE_ELEM=indented(4, updateFld),
+               ELEM_TYPE=elemType,
+               ELEM_JAVA_TYPE=elemJavaType)
+
+# --------------------------------------------------------------------------------------------------
+
+_tmplArrCompilePathDef = Template('''
+%ACCESS%static void compileArrPath_%ELEM-TYPE%(KeyPath path, int pos) {
+    if (pos == path.segs.length) {
+        return;
+    }
+
+    path.codes[pos] = KeyPath.parseIndex(path.segs[pos]);%OPT-COMPILE-ELEM%
+}
+''')
+
+def _writeArrCompilePathDef(w, elemType, enumDef, structDef, split):
+    if elemType in structDef:
+        optCompileElem = '\n    ' + misc.getClasName(elemType) + '.compilePath(path, pos + 1);'
+    else:
+        optCompileElem = ''
+    _tmplArrCompilePathDef.emit(w,
+               ACCESS=_getSharedAccess(split),
+               ELEM_TYPE=elemType,
+               OPT_COMPILE_ELEM=optCompileElem)
+
+# --------------------------------------------------------------------------------------------------
+
+# deep copy of an array of structs, for the copy constructors and the defaults of struct arrays
+_tmplArrCopyDef = Template('''
+%ACCESS%static %ELEM-JAVA-TYPE%[] copyArr_%ELEM-TYPE%(%ELEM-JAVA-TYPE%[] arr) {
+    if (arr == null) {
+        return null;
+    }
+
+    %ELEM-JAVA-TYPE%[] copy = new %ELEM-JAVA-TYPE%[arr.length];
+    for (int i = 0; i < arr.length; i++) {
+        copy[i] = (arr[i] == null ? null : arr[i].copy());
+    }
+    return copy;
+}
+''')
+
+# copy of an array on the path of a value to set, which shares its elements but the struct on the path from pos
+_tmplArrCopyPathDef = Template('''
+%ACCESS%static %ELEM-JAVA-TYPE%[] copyArrPath_%ELEM-TYPE%(%ELEM-JAVA-TYPE%[] arr, KeyPath path, int pos) {
+    if (arr == null) {
+        return null;
+    }
+
+    %ELEM-JAVA-TYPE%[] copy = arr.clone();%OPT-COPY-ELEM%
+    return copy;
+}
+''')
+
+_strCopyArrPathElem = '''
+
+    int i = path.codes[pos];
+    if (pos + 1 < path.segs.length && i >= 0 && i < copy.length && copy[i] != null) {
+        copy[i] = copy[i].copyPath(path, pos + 1);
+    }\
+'''
+
+def _writeArrCopyPathDef(w, elemType, enumDef, structDef, split):
+    _tmplArrCopyPathDef.emit(w,
+               ACCESS=_getSharedAccess(split),
+               ELEM_TYPE=elemType,
+               ELEM_JAVA_TYPE=_schemaTypeToJavaType(elemType, enumDef, structDef, False),
+               OPT_COPY_ELEM=(_strCopyArrPathElem if elemType in structDef else ''))
+
+def _writeArrCopyDef(w, elemType, enumDef, structDef, split):
+    assert elemType in structDef
+    _tmplArrCopyDef.emit(w,
+               ACCESS=_getSharedAccess(split),
+               ELEM_TYPE=elemType,
+               ELEM_JAVA_TYPE=_schemaTypeToJavaType(elemType, enumDef, structDef, False))
 
 # --------------------------------------------------------------------------------------------------
 
 _strEmptyStructPPrintBody = '''
-private void pprint(int indent, StringBuffer sbuf, JsonSchema.PrintMode mode, long selectionBits,
-        String key, StringBuffer errMsg) {
-    if (key == null) {
-        JsonSchema.bprint(sbuf, "{ }");
+private void pprint(int indent, StringBuilder sbuf, JsonSchema.PrintMode mode, long selectionBits,
+        KeyPath path, int pos, StringBuilder errMsg) {
+    if (pos == path.segs.length) {
+        sbuf.append("{ }");
     } else {
-        JsonSchema.bprint(errMsg, "[Error] no such key in the JSON file");
+        errMsg.append("[Error] no such key in the JSON file");
     }
 }\
 '''
 
-_tmplNonEmptyStructPPrintBody = '''
-private void pprint(int indent, StringBuffer sbuf, JsonSchema.PrintMode mode, long selectionBits,
-        String key, StringBuffer errMsg) {
-    if (key == null) {
-        JsonSchema.bprint(sbuf, "{\\n");
+_tmplNonEmptyStructPPrintBody = Template('''
+private void pprint(int indent, StringBuilder sbuf, JsonSchema.PrintMode mode, long selectionBits,
+        KeyPath path, int pos, StringBuilder errMsg) {
+    if (pos == path.segs.length) {
+        sbuf.append("{\\n");
 %PPRINT-FIELDS%
 %OPT-END-FOR-TOP-LEVEL%
-        JsonSchema.bprint(sbuf, "\\n");
+        sbuf.append("\\n");
         JsonSchema.printIndent(indent, sbuf);
-        JsonSchema.bprint(sbuf, "}");
+        sbuf.append("}");
     } else {
-        int delim;
-        String keyHead, keyTail;
+        String keyHead = path.segs[pos];
         assert indent == 0: "indent must be zero";
 
-        delim = key.indexOf('.');
-        if (delim < 0) {
-            keyHead = key;
-            keyTail = null;
-        } else {
-            keyHead = key.substring(0, delim);
-            keyTail = key.substring(delim + 1);
-        }
-
         // select and recurse into the next field
+        switch (path.codes[pos]) {
 %PPRINT-NEXT%
+        }
     }
 }\
-'''
+''')
 
-_strPPrintNextElse = '''\
-{
-    JsonSchema.bprint(errMsg, "[Error] invalid key segment " + keyHead);
-}\
+_strPPrintNextDefault = '''\
+default:
+    errMsg.append("[Error] invalid key segment " + keyHead);\
 '''
 
 _strPrintEnd = '''\
-JsonSchema.bprint(sbuf, ",\\n\\n");
+sbuf.append(",\\n\\n");
 JsonSchema.printIndent(indent + 1, sbuf);
-JsonSchema.bprint(sbuf, "\\"%end%\\": null");
+sbuf.append("\\"%end%\\": null");
 '''
 
-def _getPPrintMethodDef(structDesc, enumDef, structDef, writeComments, isTopLevel):
+def _writePPrintMethodDef(w, structDesc, enumDef, structDef, fldComments, isTopLevel):
     fields = list(structDesc.keys())
     if len(fields) > 0:
         pprintFields = []
@@ -1080,24 +1374,22 @@ def _getPPrintMethodDef(structDesc, enumDef, structDef, writeComments, isTopLeve
             fldDesc = structDesc[fld]
             fldType = fldDesc[schemaParser.NVDK_TYPE]
             pprintFields.append(_getPPrintFldStmts(i, fld, fldType, enumDef, structDef,
-                        writeComments, (schemaParser.NVDK_DEFAULT in fldDesc) and isTopLevel))
+                        fldComments, (schemaParser.NVDK_DEFAULT in fldDesc) and isTopLevel))
             pprintNext.append(_getPPrintNextStmts(fld, fldDesc[schemaParser.NVDK_TYPE], enumDef, structDef))
             i += 1
-        pprintNext.append(_strPPrintNextElse)
+        pprintNext.append(_strPPrintNextDefault)
 
-        pprintMethod = (_tmplNonEmptyStructPPrintBody
-                            .replace('%PPRINT-FIELDS%', util.indent(''.join(pprintFields), 2))
-                            .replace('%OPT-END-FOR-TOP-LEVEL%', util.indent(_strPrintEnd, 2) if isTopLevel else '')
-                            .replace('%PPRINT-NEXT%', util.indent(' else '.join(pprintNext), 2)))
+        _tmplNonEmptyStructPPrintBody.emit(w,
+                PPRINT_FIELDS=indented(2, ''.join(pprintFields)),
+                OPT_END_FOR_TOP_LEVEL=indented(2, _strPrintEnd) if isTopLevel else '',
+                PPRINT_NEXT=indented(2, '\n'.join(pprintNext)))
     else:
-        pprintMethod = _strEmptyStructPPrintBody
-
-    return pprintMethod
+        w.write(_strEmptyStructPPrintBody)
 
 # --------------------------------------------------------------------------------------------------
 
-_tmplInnerClassDef = '''
-static class %CLASS-TYPE%%OPT-IMPLEMENTS% {
+_tmplInnerClassDef = Template('''
+%CLASS-MODIFIERS%class %CLASS-TYPE%%OPT-IMPLEMENTS% {
 %FIELD-ACCESSORS%
 %FIELD-DECLS%
 
@@ -1105,87 +1397,174 @@ static class %CLASS-TYPE%%OPT-IMPLEMENTS% {
     // Private
     // ==========================
 
-    private static final JsonObj structDesc =
-        schemaJSON.get("%struct-def").asObj().get("%STRUCT-NAME%").asObj();
-
-    private %CLASS-TYPE%(JsonObj json) {
-        Json fld;
-
-        if (structDesc == null) {
+    // read when a default is first needed rather than when the class is initialized, so that the schema is
+    // not read from its resource, if any, only to load the class
+    private static JsonObj structDesc() {
+        JsonObj desc = %SCHEMA-JSON%.get("%struct-def").asObj().get("%STRUCT-NAME%").asObj();
+        if (desc == null) {
             throw new Error("cannot parse the struct descriptor string of %STRUCT-NAME%");
         }
-
-        Set schemaFields = structDesc.keySet();
-        Set jsonFields = new TreeSet(json.keySet());
-        jsonFields.remove("%end%");   // end marker
-        jsonFields.removeAll(schemaFields);
-        if (jsonFields.size() > 0) {
-            throw new Error("the JSON file has fields undeclared in the schema: " + jsonFields);
-        }
-%PARSE-FIELDS%
+        return desc;
     }
+%FIELD-ORDINALS%
+%DEFAULT-DECLS%
+    %ACCESS%%CLASS-TYPE%(JsonObj json) {
+        Json fld;
 
-    private static void pprintNullable(%CLASS-TYPE% val, int indent, StringBuffer sbuf, JsonSchema.PrintMode mode,
-            long selectionBits, String key, StringBuffer errMsg) {
+%PARSE-FIELDS%\
+    }
+%COPY-METHOD%
+    %ACCESS%static void pprintNullable(%CLASS-TYPE% val, int indent, StringBuilder sbuf, JsonSchema.PrintMode mode,
+            long selectionBits, KeyPath path, int pos, StringBuilder errMsg) {
 
         if (val == null) {
-            if (key == null) {
-                JsonSchema.bprint(sbuf, "null");
+            if (pos == path.segs.length) {
+                sbuf.append("null");
             } else {
-                JsonSchema.bprint(errMsg, "[Error] unable to get the field " + key + " of a null JSON object");
+                errMsg.append("[Error] unable to get the field " + path.tail(pos) + " of a null JSON object");
             }
         } else {
-            val.pprint(indent, sbuf, mode, selectionBits, key, errMsg);
+            val.pprint(indent, sbuf, mode, selectionBits, path, pos, errMsg);
         }
     }
 %PPRINT-METHOD%
 
-    private static JsonSchema.SetErr setNullable(%CLASS-TYPE% val, JsonSchema.SetMode mode, String key, int idx, Json newValJSON, boolean checkOnly, Object[] onVal, StringBuffer errMsg) {
+    %ACCESS%static JsonSchema.SetErr setNullable(%CLASS-TYPE% val, JsonSchema.SetMode mode, KeyPath path, int pos, int idx, Json newValJSON, boolean checkOnly, Object[] onVal, StringBuffer errMsg) {
 
         if (val == null) {
-            assert key != null: "key must be non-null";
-            errMsg.append("[Error] unable to set the field " + key + " of a null JSON object");
+            assert pos < path.segs.length: "key must be non-null";
+            errMsg.append("[Error] unable to set the field " + path.tail(pos) + " of a null JSON object");
             return JsonSchema.SetErr.ERR_DEREF_NULL;
         } else {
-            return val.set(mode, key, idx, newValJSON, checkOnly, onVal, errMsg);
+            return val.set(mode, path, pos, idx, newValJSON, checkOnly, onVal, errMsg);
         }
     }
 %SET-METHOD%
 }
-'''
+''')
 
 
-def _getInnerClassDef(struct, enumDef, structDef, outerIntfType, genIntf):
-    if genIntf:
-        optImplements = ' implements ' + outerIntfType + '.' + misc.getIntfName(struct)
+# the ordinals of the fields, in the order of their names, are the table which pprint and set switch on to
+# select the field of a key segment. compilePath resolves the segments of a key path, by a string switch in
+# fldOrdinal, that is, by their hash codes, once for all the uses of the path
+_tmplFldOrdinals = Template('''
+    // ordinals of the fields
+%FIELD-ORDINAL-DECLS%
+
+    private static int fldOrdinal(String name) {
+        switch (name) {
+%FIELD-ORDINAL-CASES%
+        default:
+            return -1;
+        }
+    }
+
+    %ACCESS%static void compilePath(KeyPath path, int pos) {
+        if (pos == path.segs.length) {
+            return;
+        }
+
+        path.codes[pos] = fldOrdinal(path.segs[pos]);%OPT-COMPILE-NEXT-FIELD%
+    }\
+''')
+
+_tmplCompileNextFld = Template('''
+
+switch (path.codes[pos]) {
+%COMPILE-NEXT-FIELD%
+}\
+''')
+
+def _getCompileNextFld(fld, fldType, structDef):
+    if isinstance(fldType, list):
+        compileNext = 'compileArrPath_' + fldType[0] + '(path, pos + 1);'
+    elif fldType in structDef:
+        compileNext = misc.getClasName(fldType) + '.compilePath(path, pos + 1);'
+    else:
+        return None
+    return 'case ' + fld + '__ord:\n    ' + compileNext + '\n    break;'
+
+def _getFldOrdinalsCode(structDesc, structDef, split):
+    fields = sorted(structDesc.keys())
+    compileNext = [ _getCompileNextFld(fld, structDesc[fld][schemaParser.NVDK_TYPE], structDef) for fld in fields ]
+    compileNext = [ c for c in compileNext if c != None ]
+    if compileNext:
+        optCompileNext = indented(2, _tmplCompileNextFld.render(COMPILE_NEXT_FIELD='\n'.join(compileNext)))
+    else:
+        optCompileNext = ''
+    return lambda w: _tmplFldOrdinals.emit(w,
+                ACCESS=_getSharedAccess(split),
+                FIELD_ORDINAL_DECLS=indented(1, '\n'.join('private static final int ' + fld + '__ord = ' + str(i) + ';'
+                                                          for i, fld in enumerate(fields))),
+                FIELD_ORDINAL_CASES=indented(2, '\n'.join('case "' + fld + '":\n    return ' + fld + '__ord;'
+                                                          for fld in fields)),
+                OPT_COMPILE_NEXT_FIELD=optCompileNext)
+
+def _getDefaultDeclsCode(defaultDecls):
+    return indented(1, ''.join('\n' + decl + '\n' for decl in defaultDecls)) if defaultDecls else ''
+
+def _getCopyMethodCode(clasType, structDesc, structDef, copyFields, split):
+    (deepCopyFields, shareFields) = copyFields
+    if deepCopyFields:
+        optDeepCopy = indented(1, _tmplDeepCopyFlds.render(
+                                      COPY_FIELDS=util.indent(''.join('\n' + stmt for stmt in deepCopyFields), 1)))
     else:
+        optDeepCopy = ''
+    copyNext = [ _getCopyNextFld(fld, structDesc[fld][schemaParser.NVDK_TYPE], structDef)
+                 for fld in sorted(structDesc.keys()) ]
+    copyNext = [ c for c in copyNext if c != None ]
+    if copyNext:
+        optCopyNext = indented(1, _tmplCopyNextFld.render(COPY_NEXT_FIELD=util.indent('\n'.join(copyNext), 1)))
+    else:
+        optCopyNext = ''
+    return indented(1, lambda w: _tmplCopyMethod.emit(w,
+                ACCESS=_getSharedAccess(split),
+                CLASS_TYPE=clasType,
+                OPT_COPY_NEXT_FIELD=optCopyNext,
+                SHARE_FIELDS=indented(1, ''.join('\n' + stmt for stmt in shareFields)),
+                OPT_DEEP_COPY_FIELDS=optDeepCopy))
+
+# Java expression of the parsed schema, which is read from a resource with useResources
+def _getSchemaJsonExpr(useResources):
+    return '_SchemaHolder_.json' if useResources else 'schemaJSON'
+
+# a split class is a package-private top-level one of its own, rather than nested in the implementation class,
+# and implements a split interface
+def _writeInnerClassDef(w, struct, enumDef, structDef, outerIntfType, genIntf, split=False, useResources=False):
+    if not genIntf:
         optImplements = ''
+    elif split:
+        optImplements = ' implements ' + misc.getIntfName(struct)
+    else:
+        optImplements = ' implements ' + outerIntfType + '.' + misc.getIntfName(struct)
 
     clasType = misc.getClasName(struct)
     structDesc = structDef[struct]
 
     # field related code: decl/accessor/set
-    (fldDecls, fldAccessors, parseFields) = _getFieldRelatedCode(structDesc, enumDef, structDef, genIntf, False)
-    # pprint method
-    pprintMethod = _getPPrintMethodDef(structDesc, enumDef, structDef, False, False)
-    # set method
-    setMethodDef = _getSetMethodDef(struct, structDesc, enumDef, structDef, False)
-
-    return (_tmplInnerClassDef
-                .replace('%CLASS-TYPE%', clasType)
-                .replace('%OPT-IMPLEMENTS%', optImplements)
-                .replace('%FIELD-ACCESSORS%', util.indent('\n'.join(fldAccessors), 1))
-                .replace('%FIELD-DECLS%', util.indent('\n'.join(fldDecls), 1))
-                .replace('%STRUCT-NAME%', struct)
-                .replace('%PARSE-FIELDS%', util.indent('\n'.join(parseFields), 2))
-                .replace('%PPRINT-METHOD%', util.indent(pprintMethod, 1))
-                .replace('%SET-METHOD%', util.indent(setMethodDef, 1))
-            )
-
-_tmplOptForOutermost = '''
+    (fldDecls, fldAccessors, parseFields, copyFields, defaultDecls) = \
+        _getFieldRelatedCode(structDesc, enumDef, structDef, genIntf, False)
+
+    _tmplInnerClassDef.emit(w,
+                CLASS_MODIFIERS=('' if split else 'static '),
+                ACCESS=_getSharedAccess(split),
+                SCHEMA_JSON=_getSchemaJsonExpr(useResources),
+                CLASS_TYPE=clasType,
+                OPT_IMPLEMENTS=optImplements,
+                FIELD_ACCESSORS=indented(1, '\n'.join(fldAccessors)),
+                FIELD_DECLS=indented(1, '\n'.join(fldDecls)),
+                STRUCT_NAME=struct,
+                PARSE_FIELDS=indented(2, parseFields),
+                FIELD_ORDINALS=_getFldOrdinalsCode(structDesc, structDef, split),
+                DEFAULT_DECLS=_getDefaultDeclsCode(defaultDecls),
+                COPY_METHOD=_getCopyMethodCode(clasType, structDesc, structDef, copyFields, split),
+                PPRINT_METHOD=indented(1, lambda w: _writePPrintMethodDef(w, structDesc, enumDef, structDef, None, False)),
+                SET_METHOD=indented(1, lambda w: _writeSetMethodDef(w, struct, structDesc, enumDef, structDef, False)))
+
+_tmplSchemaStrDef = Template('''
     // CAUTION: the following two lines must go first in this class definition
     private static final String schemaJsonStr = "%SCHEMA-JSON-STR%";
-    private static final JsonObj schemaJSON;
+    %ACCESS%static final JsonObj schemaJSON;
     static {
         try {
             schemaJSON = JsonObj.parse(schemaJsonStr);
@@ -1193,31 +1572,152 @@ _tmplOptForOutermost = '''
             throw new Error("unreachable", e);
         }
     }
+''')
+
+# the schema is read from a resource, rather than from a string constant limited to 65535 bytes, by a nested
+# holder class, so that it is read and parsed once, when the first class of the schema needing it is initialized
+_tmplSchemaResourceDef = Template('''
+    %ACCESS%static final class _SchemaHolder_ {
+        static final String jsonStr = readResource("%SCHEMA-RESOURCE%");
+        static final JsonObj json = parseResource("%SCHEMA-RESOURCE%", jsonStr);
+    }
+
+    private static String readResource(String name) {
+        InputStream in = %CLASS-TYPE%.class.getResourceAsStream(name);
+        if (in == null) {
+            throw new Error("cannot find the resource " + name + " of " + %CLASS-TYPE%.class.getName());
+        }
 
+        try {
+            try {
+                ByteArrayOutputStream bytes = new ByteArrayOutputStream();
+                byte[] buf = new byte[8192];
+                int n;
+                while ((n = in.read(buf)) > 0) {
+                    bytes.write(buf, 0, n);
+                }
+                return bytes.toString("UTF-8");
+            } finally {
+                in.close();
+            }
+        } catch (IOException e) {
+            throw new Error("cannot read the resource " + name, e);
+        }
+    }
+
+    private static JsonObj parseResource(String name, String jsonStr) {
+        try {
+            return JsonObj.parse(jsonStr);
+        } catch (ParseError e) {
+            throw new Error("cannot parse the resource " + name, e);
+        }
+    }
+''')
+
+_tmplOptForOutermost = Template('''%SCHEMA-DEF%
     public String getSchema() {
-        return schemaJsonStr;
+        return %SCHEMA-JSON-STR%;
+    }
+
+    // key of a value in the configuration, such as "a.b.3.c", compiled by compileKeyPath into the ordinals of
+    // its fields and the indices of its array elements, which can be kept and given to prettyPrint, update,
+    // insertArrElem and removeArrElem any number of times without parsing the key again
+    public static final class KeyPath {
+        static final KeyPath EMPTY = new KeyPath("", new String[0]);
+        static final int NOT_AN_INDEX = Integer.MIN_VALUE;
+
+        private final String key;
+        final String[] segs;
+        final int[] codes;      // ordinals of the fields and indices of the elements, as far as the key resolves
+
+        private KeyPath(String key, String[] segs) {
+            this.key = key;
+            this.segs = segs;
+            this.codes = new int[segs.length];
+        }
+
+        public String toString() {
+            return key;
+        }
+
+        // the key from the segment at pos, for error messages
+        String tail(int pos) {
+            StringBuilder sb = new StringBuilder(segs[pos]);
+            for (int i = pos + 1; i < segs.length; i++) {
+                sb.append('.').append(segs[i]);
+            }
+            return sb.toString();
+        }
+
+        static int parseIndex(String seg) {
+            try {
+                return Integer.parseInt(seg, 10);
+            } catch (NumberFormatException e) {
+                return NOT_AN_INDEX;
+            }
+        }
+    }
+
+    public static KeyPath compileKeyPath(String key) {
+        KeyPath path = new KeyPath(key, key.split("\\\\.", -1));
+        compilePath(path, 0);
+        return path;
+    }
+
+    // compileKeyPath for the callers holding KeyPathAccess
+    public KeyPath compileKey(String key) {
+        return compileKeyPath(key);
     }
 
     public void prettyPrint(StringBuffer sbuf, JsonSchema.PrintMode mode, long selectionBits, String key) {
-        String resStr;
-        StringBuffer resBuf, errMsg;
+        prettyPrint(sbuf, mode, selectionBits, (key == null ? null : compileKeyPath(key)));
+    }
 
-        resBuf = new StringBuffer();
-        errMsg = new StringBuffer();
-        pprint(0, resBuf, mode, selectionBits, key, errMsg);
+    public void prettyPrint(StringBuffer sbuf, JsonSchema.PrintMode mode, long selectionBits, KeyPath path) {
+        StringBuilder out = new StringBuilder();
+        prettyPrintTo(out, mode, selectionBits, path);
+        if (sbuf == null) {
+            System.out.print(out);
+        } else {
+            sbuf.append(out);
+        }
+    }
 
-        if (errMsg.length() > 0) {
-            resStr = errMsg.toString();
-            JsonSchema.bprint(sbuf, resStr);
+    // appends the revision and the pretty print, or the error message if it fails, to sb directly, without
+    // the intermediate buffers and copies of prettyPrint. The root of a snapshot, which never changes, is
+    // printed without locking it
+    public void prettyPrintTo(StringBuilder sb, JsonSchema.PrintMode mode, long selectionBits, KeyPath path) {
+        if (_read_only_) {
+            prettyPrintUnlocked(sb, mode, selectionBits, path);
         } else {
-            resStr = resBuf.toString();
-            JsonSchema.bprint(sbuf, _revision_ + ":");
-            JsonSchema.bprint(sbuf, resStr);
+            synchronized (this) {
+                prettyPrintUnlocked(sb, mode, selectionBits, path);
+            }
+        }
+    }
+
+    private void prettyPrintUnlocked(StringBuilder sb, JsonSchema.PrintMode mode, long selectionBits, KeyPath path) {
+        StringBuilder errMsg = new StringBuilder();
+        int start = sb.length();
+
+        sb.append(_revision_).append(':');
+        pprint(0, sb, mode, selectionBits, (path == null ? KeyPath.EMPTY : path), 0, errMsg);
+
+        if (errMsg.length() > 0) {
+            sb.setLength(start);
+            sb.append(errMsg);
         }
     }
 
     public JsonSchema.SetErr update(int targetRev, String key, String newValJsonStr, boolean checkOnly, boolean save,
             Object[] onVal, StringBuffer errMsg) {
+        return update(targetRev, compileKeyPath(key), newValJsonStr, checkOnly, save, onVal, errMsg);
+    }
+
+    public JsonSchema.SetErr update(int targetRev, KeyPath path, String newValJsonStr, boolean checkOnly, boolean save,
+            Object[] onVal, StringBuffer errMsg) {
+
+        checkWritable();
 
         Json jsonVal;
         try {
@@ -1227,18 +1727,28 @@ _tmplOptForOutermost = '''
             return JsonSchema.SetErr.ERR_JSON_PARSE;
         }
 
-        if (targetRev > 0 && targetRev != _revision_) {
-            errMsg.append("wrong revision");
-            return JsonSchema.SetErr.ERR_WRONG_REVISION;
+        JsonSchema.SetErr rc;
+        synchronized (this) {
+            if (targetRev > 0 && targetRev != _revision_) {
+                errMsg.append("wrong revision");
+                return JsonSchema.SetErr.ERR_WRONG_REVISION;
+            }
+
+            rc = setLive(JsonSchema.SetMode.UPDATE, path, -1, jsonVal, checkOnly, onVal, errMsg);
+            if (rc == JsonSchema.SetErr.OK && !checkOnly) {
+                _revision_++;
+                if (_snapshot_ != null) {
+                    _snapshot_ = new Snapshot(snapshotRoot(), _revision_);
+                }
+                if (_journal_ != null) {
+                    appendToJournal(JsonSchema.SetMode.UPDATE, path, -1, newValJsonStr, save);
+                }
+            }
         }
 
-        JsonSchema.SetErr rc = set(JsonSchema.SetMode.UPDATE, key, -1, jsonVal, checkOnly, onVal, errMsg);
         if (rc == JsonSchema.SetErr.OK && !checkOnly) {
-            _revision_++;
-            if (save) {
-                if (!saveToFile(errMsg)) {
-                    return JsonSchema.SetErr.ERR_FAILED_TO_SAVE;
-                }
+            if (!persistChange(save, errMsg)) {
+                return JsonSchema.SetErr.ERR_FAILED_TO_SAVE;
             }
         }
 
@@ -1247,6 +1757,13 @@ _tmplOptForOutermost = '''
 
     public JsonSchema.SetErr insertArrElem(int targetRev, String key, int idx, String newValJsonStr, boolean checkOnly,
             boolean save, Object[] onVal, StringBuffer errMsg) {
+        return insertArrElem(targetRev, compileKeyPath(key), idx, newValJsonStr, checkOnly, save, onVal, errMsg);
+    }
+
+    public JsonSchema.SetErr insertArrElem(int targetRev, KeyPath path, int idx, String newValJsonStr, boolean checkOnly,
+            boolean save, Object[] onVal, StringBuffer errMsg) {
+
+        checkWritable();
 
         Json jsonVal;
         try {
@@ -1256,18 +1773,28 @@ _tmplOptForOutermost = '''
             return JsonSchema.SetErr.ERR_JSON_PARSE;
         }
 
-        if (targetRev > 0 && targetRev != _revision_) {
-            errMsg.append("wrong revision");
-            return JsonSchema.SetErr.ERR_WRONG_REVISION;
+        JsonSchema.SetErr rc;
+        synchronized (this) {
+            if (targetRev > 0 && targetRev != _revision_) {
+                errMsg.append("wrong revision");
+                return JsonSchema.SetErr.ERR_WRONG_REVISION;
+            }
+
+            rc = setLive(JsonSchema.SetMode.INSERT, path, idx, jsonVal, checkOnly, onVal, errMsg);
+            if (rc == JsonSchema.SetErr.OK && !checkOnly) {
+                _revision_++;
+                if (_snapshot_ != null) {
+                    _snapshot_ = new Snapshot(snapshotRoot(), _revision_);
+                }
+                if (_journal_ != null) {
+                    appendToJournal(JsonSchema.SetMode.INSERT, path, idx, newValJsonStr, save);
+                }
+            }
         }
 
-        JsonSchema.SetErr rc = set(JsonSchema.SetMode.INSERT, key, idx, jsonVal, checkOnly, onVal, errMsg);
         if (rc == JsonSchema.SetErr.OK && !checkOnly) {
-            _revision_++;
-            if (save) {
-                if (!saveToFile(errMsg)) {
-                    return JsonSchema.SetErr.ERR_FAILED_TO_SAVE;
-                }
+            if (!persistChange(save, errMsg)) {
+                return JsonSchema.SetErr.ERR_FAILED_TO_SAVE;
             }
         }
 
@@ -1276,34 +1803,141 @@ _tmplOptForOutermost = '''
 
     public JsonSchema.SetErr removeArrElem(int targetRev, String key, int idx, boolean checkOnly, boolean save,
             Object[] onVal, StringBuffer errMsg) {
+        return removeArrElem(targetRev, compileKeyPath(key), idx, checkOnly, save, onVal, errMsg);
+    }
+
+    public JsonSchema.SetErr removeArrElem(int targetRev, KeyPath path, int idx, boolean checkOnly, boolean save,
+            Object[] onVal, StringBuffer errMsg) {
+
+        checkWritable();
 
-        if (targetRev > 0 && targetRev != _revision_) {
-            errMsg.append("wrong revision");
-            return JsonSchema.SetErr.ERR_WRONG_REVISION;
+        JsonSchema.SetErr rc;
+        synchronized (this) {
+            if (targetRev > 0 && targetRev != _revision_) {
+                errMsg.append("wrong revision");
+                return JsonSchema.SetErr.ERR_WRONG_REVISION;
+            }
+
+            rc = setLive(JsonSchema.SetMode.REMOVE, path, idx, null, checkOnly, onVal, errMsg);
+            if (rc == JsonSchema.SetErr.OK && !checkOnly) {
+                _revision_++;
+                if (_snapshot_ != null) {
+                    _snapshot_ = new Snapshot(snapshotRoot(), _revision_);
+                }
+                if (_journal_ != null) {
+                    appendToJournal(JsonSchema.SetMode.REMOVE, path, idx, null, save);
+                }
+            }
         }
 
-        JsonSchema.SetErr rc = set(JsonSchema.SetMode.REMOVE, key, idx, null, checkOnly, onVal, errMsg);
         if (rc == JsonSchema.SetErr.OK && !checkOnly) {
-            _revision_++;
-            if (save) {
-                if (!saveToFile(errMsg)) {
-                    return JsonSchema.SetErr.ERR_FAILED_TO_SAVE;
-                }
+            if (!persistChange(save, errMsg)) {
+                return JsonSchema.SetErr.ERR_FAILED_TO_SAVE;
             }
         }
 
         return rc;
     }
 
+    public SavePolicy getSavePolicy() {
+        return _save_policy_;
+    }
+
+    // sets how update, insertArrElem and removeArrElem save the changes when save is true. SavePolicy.IMMEDIATE
+    // by default
+    public void setSavePolicy(SavePolicy policy) {
+        checkWritable();
+        if (policy == null) {
+            throw new Error("save policy cannot be null");
+        }
+        _save_policy_ = policy;
+    }
+
+    // saves the current revision according to the save policy. The future completes with the revision written
+    // to the JSON file, which may be a later one when changes are coalesced, or exceptionally if the write fails
+    public CompletableFuture<Integer> save() {
+        checkWritable();
+        if (_save_policy_.mode() == SavePolicy.Mode.IMMEDIATE) {
+            CompletableFuture<Integer> future = new CompletableFuture<Integer>();
+            StringBuffer errMsg = new StringBuffer();
+            int rev = writeRevision(false, errMsg);
+            if (rev < 0) {
+                future.completeExceptionally(new Error(errMsg.toString()));
+            } else {
+                future.complete(rev);
+            }
+            return future;
+        } else {
+            return scheduleSave();
+        }
+    }
+
+    // writes the current revision to the JSON file in the calling thread, whatever the save policy, for example
+    // to flush the scheduled writes before exiting
+    public boolean saveNow(StringBuffer errMsg) {
+        checkWritable();
+        return saveToFile(errMsg);
+    }
+
+    // immutable state of the configuration at a revision, published in the snapshot mode. Any thread can read
+    // the latest one without locking or copying. Its root cannot be changed or saved
+    //
+    // The getters of the configuration itself read its fields without locking, and the fields are not
+    // volatile, so nothing orders those reads after the changes of other threads, in the snapshot mode or not.
+    // Only the root of snapshot(), published through a volatile field, is safe to read without the lock of the
+    // configuration while other threads change it
+    public static final class Snapshot {
+        public final %SNAPSHOT-ROOT-TYPE% root;
+        public final int revision;
+
+        private Snapshot(%CLASS-TYPE% root, int revision) {
+            this.root = root;
+            this.revision = revision;
+        }
+    }
+
+    // turns on the snapshot mode, in which each change is made to a copy of this object, copying only the
+    // structs and arrays on the path to the changed value and sharing the rest, whose fields this object then
+    // takes. The structs and arrays of the configuration are then never changed once made, so the latest
+    // snapshot, published with the revision of each change, shares them with this object
+    public synchronized void enableSnapshots() {
+        checkWritable();
+        if (_snapshot_ == null) {
+            _snapshot_ = new Snapshot(snapshotRoot(), _revision_);
+        }
+    }
+
+    // the latest snapshot, or null out of the snapshot mode
+    public Snapshot snapshot() {
+        return _snapshot_;
+    }
+
+    public static final long NO_JOURNAL = -1;
+
     %CLASS-TYPE%(String jsonFilePath, boolean prettyPrint, boolean rewrite) {
+        this(jsonFilePath, prettyPrint, rewrite, NO_JOURNAL);
+    }
+
+    // with a journalCompactThreshold other than NO_JOURNAL, the changes are appended to the journal
+    // <jsonFilePath>.journal, which is replayed over the JSON file here, rather than saved by rewriting the
+    // JSON file. The JSON file is rewritten, and the journal emptied, once the journal grows beyond the
+    // threshold in bytes, or on rewrite, save() and saveNow(). As without a journal, the changes made with save
+    // false are not persisted by themselves, but the journal then misses them, so the changes saved after them
+    // are saved by rewriting the JSON file according to the save policy until a rewrite has them all
+    %CLASS-TYPE%(String jsonFilePath, boolean prettyPrint, boolean rewrite, long journalCompactThreshold) {
         this(JsonSchema.readAndParseJSON(jsonFilePath, prettyPrint));
 
         _json_file_path_ = jsonFilePath;
         _revision_ = 1;
+        _saved_revision_ = 1;
+
+        if (journalCompactThreshold != NO_JOURNAL) {
+            openJournal(journalCompactThreshold, prettyPrint);
+        }
 
         if (prettyPrint) {
             System.out.println("JSON in effect:");
-            prettyPrint(null, JsonSchema.PrintMode.PLAIN, JsonSchema.ALL_TAGS, null);
+            prettyPrint(null, JsonSchema.PrintMode.PLAIN, JsonSchema.ALL_TAGS, (KeyPath) null);
             System.out.println("");
         }
 
@@ -1318,9 +1952,15 @@ _tmplOptForOutermost = '''
             }
         }
     }
-'''
+''')
+
+_tmplFldCommentsResourceDef = Template('''
+private static final class _FldCommentsHolder_ {
+    static final JsonObj json = parseResource("%FIELD-COMMENTS-RESOURCE%", readResource("%FIELD-COMMENTS-RESOURCE%"));
+}
+''')
 
-_tmplFldComments = '''
+_tmplFldComments = Template('''
 private static final String fldCommentsStr = "%CONF-FLD-COMMENTS-STR%";
 private static final JsonObj fldComments;
 static {
@@ -1330,57 +1970,301 @@ static {
         throw new Error("unreachable", e);
     }
 }
-'''
+''')
 
-_tmplOptPrivForOutermost = '''\
+_tmplOptPrivForOutermost = Template('''\
 %OPT-CONF-FLD-COMMENTS%\
     private String _json_file_path_;
     private int _revision_;
 
+    private volatile SavePolicy _save_policy_ = SavePolicy.IMMEDIATE;
+    private int _saved_revision_;                       // revision in the JSON file
+    private CompletableFuture<Integer> _pending_save_;  // of the scheduled write which has not started yet
+    private final Object _save_lock_ = new Object();    // keeps the writes in the order of their revisions
+    private Journal _journal_;                          // null without a journal
+    private String _journal_error_;                     // why the journal cannot be appended until it is reset
+    private boolean _journal_behind_;                   // the journal misses a change made with save false
+    private volatile Snapshot _snapshot_;               // null out of the snapshot mode
+    private boolean _read_only_;                        // true for the roots of snapshots
+    private long _journal_compact_threshold_;
+
     private boolean saveToFile(StringBuffer errMsgO) {
-        boolean ret = false;
-        String resStr;
-        StringBuffer resBuf, errMsg;
+        return writeRevision(false, errMsgO) >= 0;
+    }
 
-        resBuf = new StringBuffer();
-        errMsg = new StringBuffer();
-        pprint(0, resBuf, JsonSchema.PrintMode.JSON, JsonSchema.ALL_TAGS | JsonSchema.TOP_LEVEL_COMMENT | JsonSchema.DEFAULT_COMMENT,
-                null, errMsg);
+    private void openJournal(long compactThreshold, boolean logLoading) {
+        File journalFile = Journal.getJournalFile(_json_file_path_);
+        Journal journal = new Journal(journalFile);
+        List<Journal.Entry> entries;
+        try {
+            entries = journal.open(new File(_json_file_path_), _save_policy_.fsync());
+        } catch (IOException e) {
+            throw new Error("[Error] cannot open the journal " + journalFile, e);
+        }
 
-        if (errMsg.length() > 0) {
-            resStr = errMsg.toString();
-            errMsgO.append("[Error] failed to get the JSON string to save: ");
-            errMsgO.append(resStr);
+        // replayed before _journal_ is set, not to journal the changes again. The revisions of the entries
+        // are those of the process which appended them, so only their order is checked
+        Object[] onVal = new Object[1];
+        int prevRev = -1;
+        for (Journal.Entry e: entries) {
+            StringBuffer errMsg = new StringBuffer();
+            JsonSchema.SetErr rc;
+            if (prevRev >= 0 && e.rev != prevRev + 1) {
+                throw new Error("[Error] revision " + e.rev + " in the journal " + journalFile +
+                        " does not follow revision " + prevRev);
+            }
+            prevRev = e.rev;
+            switch (e.mode) {
+                case UPDATE:
+                    rc = update(_revision_, compileKeyPath(e.key), e.val, false, false, onVal, errMsg);
+                    break;
+                case INSERT:
+                    rc = insertArrElem(_revision_, compileKeyPath(e.key), e.idx, e.val, false, false, onVal, errMsg);
+                    break;
+                default:
+                    rc = removeArrElem(_revision_, compileKeyPath(e.key), e.idx, false, false, onVal, errMsg);
+                    break;
+            }
+            if (rc != JsonSchema.SetErr.OK) {
+                throw new Error("[Error] cannot replay revision " + e.rev + " in the journal " + journalFile + ": " +
+                        errMsg);
+            }
+        }
+        if (logLoading && entries.size() > 0) {
+            System.out.println("# replayed " + entries.size() + " change(s) in the journal " + journalFile);
+        }
+
+        _journal_ = journal;
+        _journal_compact_threshold_ = compactThreshold;
+    }
+
+    // called with the object locked. In the snapshot mode, the change is made to a copy of this object sharing
+    // all but the path, and this object takes the fields of the copy, so that no struct or array which may have
+    // been published is changed, and a reader of this object sees the changed value or the one it replaces
+    private JsonSchema.SetErr setLive(JsonSchema.SetMode mode, KeyPath path, int idx, Json newValJSON,
+            boolean checkOnly, Object[] onVal, StringBuffer errMsg) {
+        if (_snapshot_ == null || checkOnly) {
+            return set(mode, path, 0, idx, newValJSON, checkOnly, onVal, errMsg);
+        }
+
+        %CLASS-TYPE% next = copyPath(path, 0);
+        JsonSchema.SetErr rc = next.set(mode, path, 0, idx, newValJSON, false, onVal, errMsg);
+        if (rc == JsonSchema.SetErr.OK) {
+            takeFields(next);
+        }
+        return rc;
+    }
+
+    private void takeFields(%CLASS-TYPE% o) {%TAKE-FIELDS%
+    }
+
+    // root of a snapshot, sharing the fields of this object
+    private %CLASS-TYPE% snapshotRoot() {
+        %CLASS-TYPE% root = new %CLASS-TYPE%(this, false);
+        root._revision_ = _revision_;
+        root._read_only_ = true;
+        return root;
+    }
+
+    private void checkWritable() {
+        if (_read_only_) {
+            throw new Error("[Error] the root of a snapshot cannot be changed or saved");
+        }
+    }
+
+    // called with the object locked, right after the change, so that the journal has the changes in order.
+    // A change made with save false is not journaled, and neither is any change after it, since the journal is
+    // replayed in order, until a write of the JSON file, which has them all, resets the journal. Once an append
+    // fails, the journal misses the change and may end with a part of its line, so nothing more is appended to
+    // it until a compaction, which persistChange forces, resets it
+    private void appendToJournal(JsonSchema.SetMode mode, KeyPath path, int idx, String newValJsonStr,
+            boolean save) {
+        if (!save) {
+            _journal_behind_ = true;
+        }
+        if (_journal_error_ != null || _journal_behind_) {
+            return;
+        }
+        try {
+            _journal_.append(_revision_, mode, idx, path.toString(), newValJsonStr, _save_policy_.fsync());
+        } catch (IOException e) {
+            _journal_error_ = "[Error] cannot append the change to the journal: " + e.getMessage();
+        }
+    }
+
+    // saves the change if save is true. With a journal which has the change already, compacts the journal if
+    // it has grown beyond the threshold. With a journal missing a change made with save false, saves the change
+    // according to the save policy, as without a journal
+    private boolean persistChange(boolean save, StringBuffer errMsg) {
+        if (!save) {
+            return true;
+        }
+        if (_journal_ == null) {
+            return saveChange(errMsg);
+        }
+
+        boolean compact;
+        boolean behind;
+        String journalError;
+        synchronized (this) {
+            journalError = _journal_error_;
+            behind = _journal_behind_;
+            compact = _journal_.size() > _journal_compact_threshold_;
+        }
+        if (journalError != null) {
+            // the change is not safe in the journal, so it is written to the JSON file before returning,
+            // whatever the save policy
+            StringBuffer compactErrMsg = new StringBuffer();
+            if (saveToFile(compactErrMsg)) {
+                return true;
+            }
+            errMsg.append(journalError + "\\n" + compactErrMsg);
+            return false;
+        } else if (behind) {
+            return saveChange(errMsg);
+        } else if (compact) {
+            // the change is safe in the journal, so a failure to compact loses nothing, and is reported in
+            // errMsg without failing the change
+            StringBuffer compactErrMsg = new StringBuffer();
+            if (!saveChange(compactErrMsg)) {
+                errMsg.append("[Warning] cannot compact the journal: " + compactErrMsg);
+            }
+        }
+        return true;
+    }
+
+    private boolean saveChange(StringBuffer errMsg) {
+        if (_save_policy_.mode() == SavePolicy.Mode.IMMEDIATE) {
+            return saveToFile(errMsg);
+        } else {
+            // failures are reported by the future and on System.err
+            scheduleSave();
+            return true;
+        }
+    }
+
+    // the write scheduled and not started yet writes all the revisions made until it starts, so the later
+    // changes join it instead of scheduling writes of their own
+    private CompletableFuture<Integer> scheduleSave() {
+        final CompletableFuture<Integer> future;
+        synchronized (this) {
+            if (_pending_save_ != null) {
+                return _pending_save_;
+            }
+            future = new CompletableFuture<Integer>();
+            _pending_save_ = future;
+        }
+
+        // scheduled with the object unlocked, since an executor may run the write in the calling thread, which
+        // would then take _save_lock_ while holding the object, against the order of writeRevision
+        try {
+            _save_policy_.schedule(() -> runScheduledSave(future));
+        } catch (RuntimeException e) {
+            synchronized (this) {
+                if (_pending_save_ == future) {
+                    _pending_save_ = null;
+                }
+            }
+            future.completeExceptionally(e);
+        }
+        return future;
+    }
+
+    private void runScheduledSave(CompletableFuture<Integer> future) {
+        synchronized (this) {
+            _pending_save_ = null;
+        }
+
+        StringBuffer errMsg = new StringBuffer();
+        int rev = writeRevision(true, errMsg);
+        if (rev < 0) {
+            System.err.println(errMsg);
+            future.completeExceptionally(new Error(errMsg.toString()));
         } else {
-            resStr = resBuf.toString();
+            future.complete(rev);
+        }
+    }
+
+    // writes the current revision to the JSON file, unless it is already there and onlyIfUnsaved is true, and
+    // resets the journal if any. returns the revision in the file, or -1 if the write fails
+    private int writeRevision(boolean onlyIfUnsaved, StringBuffer errMsgO) {
+        synchronized (_save_lock_) {
+            StringBuilder resBuf = new StringBuilder();
+            StringBuilder errMsg = new StringBuilder();
+            int rev;
+
+            // rendered with the object locked, and written with it unlocked, so that the changes go on meanwhile
+            synchronized (this) {
+                rev = _revision_;
+                if (onlyIfUnsaved && rev == _saved_revision_) {
+                    return rev;
+                }
+                pprint(0, resBuf, JsonSchema.PrintMode.JSON,
+                        JsonSchema.ALL_TAGS | JsonSchema.TOP_LEVEL_COMMENT | JsonSchema.DEFAULT_COMMENT,
+                        KeyPath.EMPTY, 0, errMsg);
+            }
+
+            if (errMsg.length() > 0) {
+                errMsgO.append("[Error] failed to get the JSON string to save: ");
+                errMsgO.append(errMsg);
+                return -1;
+            }
+
+            File jsonFile = new File(_json_file_path_);
             try {
-                File jsonFile = new File(_json_file_path_);
                 if (jsonFile.canWrite()) {
-                    byte[] bytes = resStr.getBytes("UTF-8");
-                    FileOutputStream out = null;
-                    try {
-                        out = new FileOutputStream(jsonFile);
-                        out.write(bytes);
-                    } finally {
-                        if (out != null) {
-                            out.close();
-                        }
-                    }
-
-                    ret = true;
+                    // to a temporary file renamed over the JSON file, which is never left half written
+                    JsonSchema.writeFileAtomically(resBuf, jsonFile, _save_policy_.fsync());
                 } else {
                     errMsgO.append("[Error] the JSON file is not writable");
+                    return -1;
                 }
             } catch (Throwable e) {
                 errMsgO.append("[Error] cannot write the JSON to the file: " + e.getMessage());
+                return -1;
             }
-        }
 
-        return ret;
+            // read from the file just written, which only the holder of _save_lock_ writes
+            String journalHeader = null;
+            IOException journalHeaderErr = null;
+            if (_journal_ != null) {
+                try {
+                    journalHeader = Journal.getHeader(jsonFile);
+                } catch (IOException e) {
+                    journalHeaderErr = e;
+                }
+            }
+
+            synchronized (this) {
+                _saved_revision_ = rev;
+                if (_journal_ == null) {
+                    return rev;
+                }
+
+                // changes are journaled with the object locked, so the journal keeps those made during the
+                // write. Unless it has them all, it keeps none, and stays behind until a write has them all
+                boolean complete = (_journal_error_ == null && !_journal_behind_);
+                try {
+                    if (journalHeaderErr != null) {
+                        throw journalHeaderErr;
+                    }
+                    _journal_.reset(journalHeader, (complete ? rev : _revision_), _save_policy_.fsync());
+                } catch (IOException e) {
+                    _journal_error_ = "[Error] cannot empty the journal: " + e.getMessage();
+                    errMsgO.append(_journal_error_);
+                    return -1;
+                }
+                if (_revision_ == rev) {
+                    _journal_error_ = null;
+                    _journal_behind_ = false;
+                }
+                return rev;
+            }
+        }
     }
-'''
+''')
 
-_tmplTopClassDef = '''
+_tmplTopClassDef = Template('''
 class %CLASS-TYPE%%OPT-IMPLEMENTS% {
 %OPT-FOR-OUTERMOST%
 %FIELD-ACCESSORS%
@@ -1394,82 +2278,194 @@ class %CLASS-TYPE%%OPT-IMPLEMENTS% {
 
 %NVDK-DEFAULT-DEF%\
 %OPT-PRIV-FOR-OUTERMOST%\
-    private static final JsonObj structDesc =
-        schemaJSON.get("%struct-def").asObj().get("%STRUCT-NAME%").asObj();
-
-    private %CLASS-TYPE%(JsonObj json) {
-        Json fld;
-
-        if (structDesc == null) {
+    // read when a default is first needed rather than when the class is initialized, so that the schema is
+    // not read from its resource, if any, only to load the class
+    private static JsonObj structDesc() {
+        JsonObj desc = %SCHEMA-JSON%.get("%struct-def").asObj().get("%STRUCT-NAME%").asObj();
+        if (desc == null) {
             throw new Error("cannot parse the struct descriptor string of %STRUCT-NAME%");
         }
-
-        Set schemaFields = structDesc.keySet();
-        Set jsonFields = new TreeSet(json.keySet());
-        jsonFields.remove("%end%");   // end marker
-        jsonFields.removeAll(schemaFields);
-        if (jsonFields.size() > 0) {
-            throw new Error("the JSON file has fields undeclared in the schema: " + jsonFields);
-        }
-%PARSE-FIELDS%
+        return desc;
     }
+%FIELD-ORDINALS%
+%DEFAULT-DECLS%
+    %ACCESS%%CLASS-TYPE%(JsonObj json) {
+        Json fld;
 
-    private static void pprintNullable(%CLASS-TYPE% val, int indent, StringBuffer sbuf, JsonSchema.PrintMode mode,
-            int contentMask, String key, StringBuffer errMsg) {
+%PARSE-FIELDS%\
+    }
+%COPY-METHOD%
+    %ACCESS%static void pprintNullable(%CLASS-TYPE% val, int indent, StringBuilder sbuf, JsonSchema.PrintMode mode,
+            int contentMask, KeyPath path, int pos, StringBuilder errMsg) {
 
         if (val == null) {
-            if (key == null) {
-                JsonSchema.bprint(sbuf, "null");
+            if (pos == path.segs.length) {
+                sbuf.append("null");
             } else {
-                JsonSchema.bprint(errMsg, "[Error] unable to get the field " + key + " of a JSON null");
+                errMsg.append("[Error] unable to get the field " + path.tail(pos) + " of a JSON null");
             }
         } else {
-            val.pprint(indent, sbuf, mode, contentMask, key, errMsg);
+            val.pprint(indent, sbuf, mode, contentMask, path, pos, errMsg);
         }
     }
 %PPRINT-METHOD%
 
-    private static JsonSchema.SetErr setNullable(%CLASS-TYPE% val, JsonSchema.SetMode mode, String key, int idx, Json newValJSON, boolean checkOnly, Object[] onVal, StringBuffer errMsg) {
+    %ACCESS%static JsonSchema.SetErr setNullable(%CLASS-TYPE% val, JsonSchema.SetMode mode, KeyPath path, int pos, int idx, Json newValJSON, boolean checkOnly, Object[] onVal, StringBuffer errMsg) {
 
         if (val == null) {
-            assert key != null: "key must be non-null";
-            errMsg.append("[Error] unable to set the field " + key + " of a JSON null");
+            assert pos < path.segs.length: "key must be non-null";
+            errMsg.append("[Error] unable to set the field " + path.tail(pos) + " of a JSON null");
             return JsonSchema.SetErr.ERR_DEREF_NULL;
         } else {
-            return val.set(mode, key, idx, newValJSON, checkOnly, onVal, errMsg);
+            return val.set(mode, path, pos, idx, newValJSON, checkOnly, onVal, errMsg);
         }
     }
 %SET-METHOD%
 %ARRAY-METHODS%\
 }
-'''
+''')
+
+# write obj as compact JSON escaped to be the content of a Java string literal. the JSON text is encoded in
+# chunks, each of which is escaped and written on its own. escape sequences never straddle chunks because
+# every JSON string is encoded within a single chunk.
+_jsonChunkSize = 1 << 16
+
+def _writeJsonAsJavaStr(w, obj, escapeNewLine):
+    def flush(chunks):
+        text = ''.join(chunks).replace(r'\"', r'\\"').replace('"', r'\"')
+        if escapeNewLine:
+            text = text.replace(r'\n', r'\\n')
+        w.write(text)
+
+    chunks = []
+    size = 0
+    for chunk in json.JSONEncoder(separators=(',', ':')).iterencode(obj):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= _jsonChunkSize:
+            flush(chunks)
+            chunks = []
+            size = 0
+    flush(chunks)
+
+# the inner classes and array methods are written one by one as they are generated
+
+# rendered is the list of futures of the fragments rendered by a process pool, if any
+def _writeInnerClassDefs(w, outerStruct, enumDef, structDef, intfType, genIntf, useResources, rendered=None):
+    if rendered != None:
+        _writeRendered(w, rendered)
+        return
 
-def _getInnerClassDefs(outerStruct, enumDef, structDef, intfType, genIntf):
-    innerClasses = []
     for struct in structDef:
         if (struct != outerStruct):
-            innerClasses.append(_getInnerClassDef(struct, enumDef, structDef, intfType, genIntf))
+            _writeInnerClassDef(w, struct, enumDef, structDef, intfType, genIntf, False, useResources)
 
-    if len(innerClasses) > 0:
-        return util.indent(''.join(innerClasses), 1)
-    else:
-        return ''
+def _writeArrayMethodDefs(w, arrElemTypes, enumDef, structDef, split, rendered=None):
+    if len(arrElemTypes) > 0:
+        w.write('\n// array methods\n')
+    if rendered != None:
+        _writeRendered(w, rendered)
+        return
 
-def _getArrayMethodDefs(arrElemTypes, enumDef, structDef):
-    arrMethodDefs = []
     for elemType in arrElemTypes:
-        arrMethodDefs.append(_getArrParseDef(elemType, enumDef, structDef))
-        arrMethodDefs.append(_getArrPPrintDef(elemType, enumDef, structDef))
-        arrMethodDefs.append(_getArrSetDef(elemType, enumDef, structDef))
+        _writeArrayMethodDef(w, elemType, enumDef, structDef, split)
+
+def _writeArrayMethodDef(w, elemType, enumDef, structDef, split):
+    _writeArrParseDef(w, elemType, enumDef, structDef, split)
+    _writeArrPPrintDef(w, elemType, enumDef, structDef, split)
+    _writeArrSetDef(w, elemType, enumDef, structDef, split)
+    _writeArrCompilePathDef(w, elemType, enumDef, structDef, split)
+    _writeArrCopyPathDef(w, elemType, enumDef, structDef, split)
+    if elemType in structDef:
+        _writeArrCopyDef(w, elemType, enumDef, structDef, split)
 
-    if len(arrMethodDefs) > 0:
-        return util.indent('\n// array methods\n' + ''.join(arrMethodDefs), 1)
-    else:
-        return ''
+# ------Split Classes-------------------------------------------------------
+
+# In the split mode, every inner class and the array methods go to top-level classes of their own, each in its
+# own compilation unit in the package of the implementation class, so that no single file grows with the whole
+# schema and javac can compile the files in parallel. The members the classes use of each other are then
+# package-private instead of private, and the interfaces of the structs are split out of the interface of the
+# schema in the same way.
+
+_tmplArrayMethodsClassDef = Template('''
+class %CLASS-TYPE% {
+%ARRAY-METHODS%\
+}
+''')
+
+def _writeSplitClassDefs(openSplitFile, schemaName, enumDef, structDef, innerStructs, arrElemTypes, intfType,
+                         genIntf, useResources, renderedInnerClasses, renderedArrayMethods):
+    if renderedInnerClasses != None:
+        texts = _iterRendered(renderedInnerClasses)
+
+    for struct in innerStructs:
+        w = CodeWriter(openSplitFile(misc.getClasName(struct)))
+        if renderedInnerClasses != None:
+            w.write(next(texts))
+        else:
+            _writeInnerClassDef(w, struct, enumDef, structDef, intfType, genIntf, True, useResources)
+        w.finish()
+
+    if len(arrElemTypes) > 0:
+        w = CodeWriter(openSplitFile(misc.getArrClasName(schemaName)))
+        _tmplArrayMethodsClassDef.emit(w,
+                    CLASS_TYPE=misc.getArrClasName(schemaName),
+                    ARRAY_METHODS=indented(1, lambda w: _writeArrayMethodDefs(w, arrElemTypes, enumDef, structDef,
+                                                                              True, renderedArrayMethods)))
+        w.finish()
+
+# ------Parallel Rendering--------------------------------------------------
+
+# Inner classes and array methods can be rendered on a process pool. Each task renders a contiguous chunk of
+# structs or array element types, without indentation, to a list of strings, one for each of them, and the
+# strings are written in the order of the chunks under the frames of the slot they fill, or to the files of
+# their own in the split mode. A CodeWriter transforms every line the same however the text is split into
+# writes, so the class is byte-identical to the one of a serial run.
+
+_CHUNKS_PER_JOB = 4
+
+_workerArgs = None  # (enumDef, structDef, intfType, genIntf, split, useResources) in worker processes
+
+def _initWorker(enumDef, structDef, intfType, genIntf, split, useResources):
+    global _workerArgs
+    _workerArgs = (enumDef, structDef, intfType, genIntf, split, useResources)
+
+def _render(write, items):
+    texts = []
+    for item in items:
+        buf = io.StringIO()
+        write(CodeWriter(buf), item)
+        texts.append(buf.getvalue())
+    return texts
+
+def _renderInnerClassDefs(structs):
+    (enumDef, structDef, intfType, genIntf, split, useResources) = _workerArgs
+    return _render(lambda w, struct: _writeInnerClassDef(w, struct, enumDef, structDef, intfType, genIntf, split,
+                                                         useResources),
+                   structs)
+
+def _renderArrayMethodDefs(elemTypes):
+    (enumDef, structDef, _, _, split, _) = _workerArgs
+    return _render(lambda w, elemType: _writeArrayMethodDef(w, elemType, enumDef, structDef, split), elemTypes)
+
+def _submitChunks(pool, jobs, render, items):
+    size = max(1, -(-len(items) // (jobs * _CHUNKS_PER_JOB)))
+    return [ pool.submit(render, items[i:i + size]) for i in range(0, len(items), size) ]
+
+def _iterRendered(futures):
+    for f in futures:
+        for text in f.result():
+            yield text
+
+def _writeRendered(w, futures):
+    for text in _iterRendered(futures):
+        w.write(text)
 
 ### Public ###
 
-def writeIntf(intfFile, enumDef, structDef, schemaName):
+# with openSplitFile, a function which opens the file of an interface of the given name in the interface
+# package, the interfaces of the structs are written to files of their own rather than nested
+def writeIntf(intfFile, enumDef, structDef, schemaName, openSplitFile=None):
     intfType = misc.getIntfName(schemaName)
 
     # get field accessor decls
@@ -1479,76 +2475,154 @@ def writeIntf(intfFile, enumDef, structDef, schemaName):
         fldJavaType = _getFldJavaType(desc, enumDef, structDef, True)
         fldAccessors.append(fldJavaType + ' ' + fld + '();')
 
-    # get enum defs
-    enumDefStrs = _getEnumDefStrList(enumDef, True)
-
-    # get inner interface defs corresponding to structs in the schema
-    innerIntfDefs = []
-    for name, desc in structDef.items():
-        if name != schemaName:
-            innerIntfDefs.append(_getInnerIntfDef(name, desc, enumDef, structDef))
+    # inner interface defs corresponding to structs in the schema, written as they are generated
+    def writeInnerIntfDefs(w):
+        for name, desc in structDef.items():
+            if name != schemaName:
+                _writeInnerIntfDef(w, name, desc, enumDef, structDef)
+
+    w = CodeWriter(intfFile)
+    _tmplIntfDef.emit(w,
+                      INTERFACE_TYPE=intfType,
+                      FIELD_ACCESSORS=indented(1, '\n'.join(fldAccessors)),
+                      ENUM_DEFS=indented(1, lambda w: _writeEnumDefs(w, enumDef)),
+                      NESTED_INTERFACE_DEFS=('' if openSplitFile else indented(1, writeInnerIntfDefs)))
+    w.finish()
+
+    if openSplitFile:
+        for name, desc in structDef.items():
+            if name != schemaName:
+                w = CodeWriter(openSplitFile(misc.getIntfName(name)))
+                _writeInnerIntfDef(w, name, desc, enumDef, structDef, True)
+                w.finish()
+
+def getClassDef(schemaName, enumDef, structDef, arrElemTypes, genIntf, fldComments, jobs=1):
+    buf = io.StringIO()
+    writeClassDef(buf, schemaName, enumDef, structDef, arrElemTypes, genIntf, fldComments, jobs)
+    return buf.getvalue()
+
+# write the implementation class to clasFile, fragment by fragment, so that the whole class is never held in
+# memory at once. with jobs > 1, inner classes and array methods are rendered on a pool of that many processes.
+# with openSplitFile, a function which opens the file of a class of the given name in the class package, they
+# are written in the split mode instead, and the interface is taken to be split as well (see writeIntf).
+# with useResources, the schema and the field comments are read from the resources written by
+# writeSchemaResource and writeFldCommentsResource when they are first used, instead of string constants.
+def writeClassDef(clasFile, schemaName, enumDef, structDef, arrElemTypes, genIntf, fldComments, jobs=1,
+                  openSplitFile=None, useResources=False):
+    split = (openSplitFile != None)
 
-    intfFile.write(_tmplIntfDef
-                       .replace('%INTERFACE-TYPE%', intfType)
-                       .replace('%FIELD-ACCESSORS%', util.indent('\n'.join(fldAccessors), 1))
-                       .replace('%ENUM-DEFS%', util.indent(''.join(enumDefStrs), 1))
-                       .replace('%NESTED-INTERFACE-DEFS%', util.indent(''.join(innerIntfDefs), 1)))
-
-def getClassDef(schemaName, enumDef, structDef, arrElemTypes, genIntf, fldComments):
-    enumDefStrList = []
+    clasType = misc.getClasName(schemaName)
+    keyPathAccess = 'KeyPathAccess<' + clasType + '.KeyPath>'
     if genIntf:
         intfType = misc.getIntfName(schemaName)
-        optImplements = ' implements ' + intfType + ', ConfigAccess'
+        optImplements = ' implements ' + intfType + ', ' + keyPathAccess
+        enumDefs = ''   # defined in the interface
     else:
         intfType = None
-        optImplements = ' implements ConfigAccess'
-        enumDefStrList = _getEnumDefStrList(enumDef, False)
+        optImplements = ' implements ' + keyPathAccess
+        enumDefs = lambda w: _writeEnumDefs(w, enumDef)
 
-    clasType = misc.getClasName(schemaName)
     structDesc = structDef[schemaName]
+    access = _getSharedAccess(split)
 
     # field related code: decl/accessor/set
-    (fldDecls, fldAccessors, parseFields) = _getFieldRelatedCode(structDesc, enumDef, structDef, genIntf, True)
-    # pprint method
-    pprintMethod = _getPPrintMethodDef(structDesc, enumDef, structDef, (fldComments != None), True)
-    # set method
-    setMethodDef = _getSetMethodDef(schemaName, structDesc, enumDef, structDef, True)
+    (fldDecls, fldAccessors, parseFields, copyFields, defaultDecls) = \
+        _getFieldRelatedCode(structDesc, enumDef, structDef, genIntf, True)
 
-    nvdkDefaultDef = '    private static final String NVDK_DEFAULT = "' + schemaParser.NVDK_DEFAULT + '";\n'
-    innerClasses = _getInnerClassDefs(schemaName, enumDef, structDef, intfType, genIntf)
-    arrayMethods = _getArrayMethodDefs(arrElemTypes, enumDef, structDef)
+    nvdkDefaultDef = '    ' + access + 'static final String NVDK_DEFAULT = "' + schemaParser.NVDK_DEFAULT + '";\n'
 
     # optForOutermost
-    schema = dict()
-    schema['%struct-def'] = structDef
-    schemaJsonStr = json.dumps(schema, separators=(',', ':'))
-    schemaJsonStr = schemaJsonStr.replace(r'\"', r'\\"').replace('"', r'\"')
-    optForOutermost = _tmplOptForOutermost.replace('%SCHEMA-JSON-STR%', schemaJsonStr)
+    if useResources:
+        schemaDef = lambda w: _tmplSchemaResourceDef.emit(w,
+                ACCESS=access,
+                SCHEMA_RESOURCE=misc.getSchemaResourceName(schemaName),
+                CLASS_TYPE=clasType)
+        schemaJsonStr = '_SchemaHolder_.jsonStr'
+    else:
+        schema = dict()
+        schema['%struct-def'] = structDef
+        schemaDef = lambda w: _tmplSchemaStrDef.emit(w,
+                SCHEMA_JSON_STR=lambda w: _writeJsonAsJavaStr(w, schema, False),
+                ACCESS=access)
+        schemaJsonStr = 'schemaJsonStr'
+    optForOutermost = lambda w: _tmplOptForOutermost.emit(w,
+                SCHEMA_DEF=schemaDef,
+                SCHEMA_JSON_STR=schemaJsonStr,
+                CLASS_TYPE=clasType,
+                SNAPSHOT_ROOT_TYPE=intfType if genIntf else clasType)
 
     # optPrivForOutermost
     if fldComments == None:
-        optPrivForOutermost = _tmplOptPrivForOutermost.replace('%OPT-CONF-FLD-COMMENTS%', '')
+        optConfFldComments = ''
+        fldCommentsExpr = None
+    elif useResources:
+        optConfFldComments = indented(1, _tmplFldCommentsResourceDef.render(
+                FIELD_COMMENTS_RESOURCE=misc.getFldCommentsResourceName(schemaName)))
+        fldCommentsExpr = '_FldCommentsHolder_.json'
     else:
-        fldCommentsStr = json.dumps(fldComments, separators=(',', ':'))
-        fldCommentsStr = fldCommentsStr.replace(r'\"', r'\\"').replace('"', r'\"').replace(r'\n', r'\\n')
-        fldComments = _tmplFldComments.replace('%CONF-FLD-COMMENTS-STR%', fldCommentsStr)
-        fldComments = util.indent(fldComments , 1);
-        optPrivForOutermost = _tmplOptPrivForOutermost.replace('%OPT-CONF-FLD-COMMENTS%', fldComments)
-
-    return (_tmplTopClassDef
-                .replace('%OPT-FOR-OUTERMOST%', optForOutermost)
-                .replace('%CLASS-TYPE%', clasType)
-                .replace('%OPT-IMPLEMENTS%', optImplements)
-                .replace('%FIELD-ACCESSORS%', util.indent('\n'.join(fldAccessors), 1))
-                .replace('%FIELD-DECLS%', util.indent('\n'.join(fldDecls), 1))
-                .replace('%ARRAY-METHODS%', arrayMethods)
-                .replace('%STRUCT-NAME%', schemaName)
-                .replace('%PARSE-FIELDS%', util.indent('\n'.join(parseFields), 2))
-                .replace('%NESTED-CLASSES%', innerClasses)
-                .replace('%ENUM-DEFS%', ''.join(enumDefStrList) if len(enumDefStrList) > 0 else '')
-                .replace('%NVDK-DEFAULT-DEF%', nvdkDefaultDef)
-                .replace('%OPT-PRIV-FOR-OUTERMOST%', optPrivForOutermost)
-                .replace('%PPRINT-METHOD%', util.indent(pprintMethod, 1))
-                .replace('%SET-METHOD%', util.indent(setMethodDef, 1))
-            )
-
+        optConfFldComments = indented(1, lambda w: _tmplFldComments.emit(w,
+                CONF_FLD_COMMENTS_STR=lambda w: _writeJsonAsJavaStr(w, fldComments, True)))
+        fldCommentsExpr = 'fldComments'
+    optPrivForOutermost = lambda w: _tmplOptPrivForOutermost.emit(w, OPT_CONF_FLD_COMMENTS=optConfFldComments,
+                                                                  CLASS_TYPE=clasType,
+                                                                  TAKE_FIELDS=indented(2, ''.join('\n' + stmt
+                                                                                for stmt in copyFields[1])))
+
+    innerStructs = [ struct for struct in structDef if struct != schemaName ]
+    pool = None
+    renderedArrayMethods = None
+    renderedInnerClasses = None
+    if jobs > 1 and len(innerStructs) + len(arrElemTypes) > 1:
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=_initWorker,
+                                                      initargs=(enumDef, structDef, intfType, genIntf, split,
+                                                                useResources))
+        renderedArrayMethods = _submitChunks(pool, jobs, _renderArrayMethodDefs, arrElemTypes)
+        renderedInnerClasses = _submitChunks(pool, jobs, _renderInnerClassDefs, innerStructs)
+
+    if split:
+        arrayMethods = ''
+        nestedClasses = ''
+    else:
+        arrayMethods = indented(1, lambda w: _writeArrayMethodDefs(w, arrElemTypes, enumDef, structDef, False,
+                                                                   renderedArrayMethods))
+        nestedClasses = indented(1, lambda w: _writeInnerClassDefs(w, schemaName, enumDef, structDef, intfType,
+                                                                   genIntf, useResources, renderedInnerClasses))
+
+    try:
+        w = CodeWriter(clasFile)
+        _tmplTopClassDef.emit(w,
+                    OPT_FOR_OUTERMOST=optForOutermost,
+                    CLASS_TYPE=clasType,
+                    OPT_IMPLEMENTS=optImplements,
+                    ACCESS=access,
+                    SCHEMA_JSON=_getSchemaJsonExpr(useResources),
+                    FIELD_ACCESSORS=indented(1, '\n'.join(fldAccessors)),
+                    FIELD_DECLS=indented(1, '\n'.join(fldDecls)),
+                    ARRAY_METHODS=arrayMethods,
+                    STRUCT_NAME=schemaName,
+                    PARSE_FIELDS=indented(2, parseFields),
+                    FIELD_ORDINALS=_getFldOrdinalsCode(structDesc, structDef, split),
+                    DEFAULT_DECLS=_getDefaultDeclsCode(defaultDecls),
+                    COPY_METHOD=_getCopyMethodCode(clasType, structDesc, structDef, copyFields, split),
+                    NESTED_CLASSES=nestedClasses,
+                    ENUM_DEFS=enumDefs,
+                    NVDK_DEFAULT_DEF=nvdkDefaultDef,
+                    OPT_PRIV_FOR_OUTERMOST=optPrivForOutermost,
+                    PPRINT_METHOD=indented(1,
+                            lambda w: _writePPrintMethodDef(w, structDesc, enumDef, structDef, fldCommentsExpr, True)),
+                    SET_METHOD=indented(1, lambda w: _writeSetMethodDef(w, schemaName, structDesc, enumDef, structDef, True)))
+        w.finish()
+
+        if split:
+            _writeSplitClassDefs(openSplitFile, schemaName, enumDef, structDef, innerStructs, arrElemTypes,
+                                 intfType, genIntf, useResources, renderedInnerClasses, renderedArrayMethods)
+    finally:
+        if pool:
+            pool.shutdown(cancel_futures=True)
+
+# write the schema as the compact JSON text which the string constant of the implementation class holds otherwise
+def writeSchemaResource(f, structDef):
+    json.dump({ '%struct-def': structDef }, f, separators=(',', ':'))
+
+def writeFldCommentsResource(f, fldComments):
+    json.dump(fldComments, f, separators=(',', ':'))
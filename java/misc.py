@@ -16,3 +16,14 @@ def getIntfName(name):
 
 def getClasName(name):
     return getIntfName(name) + 'Base'
+
+# class of the array methods of a schema in the split mode
+def getArrClasName(schemaName):
+    return getClasName(schemaName) + 'Arrays'
+
+# resources of the schema and the field comments of a schema, next to its implementation class
+def getSchemaResourceName(schemaName):
+    return getClasName(schemaName) + '.schema.json'
+
+def getFldCommentsResourceName(schemaName):
+    return getClasName(schemaName) + '.comments.json'
@@ -0,0 +1,182 @@
+package com.mycompany.app.c;
+
+import io.github.hyunikn.jsonschemalib.JsonSchema;
+import io.github.hyunikn.jsonschemalib.SavePolicy;
+
+import java.io.File;
+import java.io.IOException;
+
+import java.lang.management.ManagementFactory;
+import java.lang.management.MonitorInfo;
+import java.lang.management.ThreadInfo;
+import java.lang.management.ThreadMXBean;
+
+import java.nio.file.Files;
+import java.nio.file.StandardCopyOption;
+
+import java.util.concurrent.Executor;
+import java.util.concurrent.SynchronousQueue;
+import java.util.concurrent.ThreadPoolExecutor;
+import java.util.concurrent.TimeUnit;
+
+import org.junit.Test;
+
+import static org.junit.Assert.assertEquals;
+import static org.junit.Assert.assertTrue;
+
+// in the package of the generated TestBase, whose constructors are package-private
+public class SavePolicyTest {
+
+    private static final int THREADS = 4;
+    private static final int CHANGES = 200;
+    private static final int SAMPLES_IN_WRITE = 10;
+
+    // a copy of the sample generated by run-json-schema.sh, which the tests change and save
+    private static String copySample() throws IOException {
+        File file = File.createTempFile("test", ".json");
+        file.deleteOnExit();
+        Files.copy(new File("test.sample.json").toPath(), file.toPath(), StandardCopyOption.REPLACE_EXISTING);
+        return file.getPath();
+    }
+
+    // changes the configuration in some threads, saving each change, while another thread saves it in turn
+    // with saveNow, and checks that the last revision is the one in the file. Times out on a deadlock
+    private static void changeAndSave(Executor executor) throws Exception {
+        final String path = copySample();
+        final TestBase conf = new TestBase(path, false, false);
+        conf.setSavePolicy(SavePolicy.background(executor, false));
+
+        final StringBuffer errMsgs = new StringBuffer();
+        Thread[] changers = new Thread[THREADS];
+        for (int i = 0; i < THREADS; i++) {
+            final int id = i;
+            changers[i] = new Thread(() -> {
+                for (int j = 0; j < CHANGES; j++) {
+                    StringBuffer errMsg = new StringBuffer();
+                    JsonSchema.SetErr rc = conf.update(0, "s", "\"" + id + "-" + j + "\"", false, true,
+                            new Object[1], errMsg);
+                    if (rc != JsonSchema.SetErr.OK) {
+                        errMsgs.append(rc + ": " + errMsg + "\n");
+                    }
+                }
+            });
+        }
+        Thread saver = new Thread(() -> {
+            for (int j = 0; j < CHANGES; j++) {
+                StringBuffer errMsg = new StringBuffer();
+                if (!conf.saveNow(errMsg)) {
+                    errMsgs.append(errMsg + "\n");
+                }
+            }
+        });
+
+        for (Thread t: changers) {
+            t.start();
+        }
+        saver.start();
+        for (Thread t: changers) {
+            t.join();
+        }
+        saver.join();
+        assertEquals("", errMsgs.toString());
+
+        int rev = conf.save().get(10, TimeUnit.SECONDS);
+        assertEquals(1 + THREADS * CHANGES, rev);
+
+        TestBase saved = new TestBase(path, false, false);
+        assertEquals(conf.s(), saved.s());
+    }
+
+    @Test(timeout = 30000)
+    public void directExecutorDoesNotDeadlock() throws Exception {
+        changeAndSave(Runnable::run);
+    }
+
+    // a saturated pool running the rejected writes in the threads scheduling them
+    @Test(timeout = 30000)
+    public void callerRunsExecutorDoesNotDeadlock() throws Exception {
+        ThreadPoolExecutor pool = new ThreadPoolExecutor(1, 1, 0, TimeUnit.MILLISECONDS,
+                new SynchronousQueue<Runnable>(), new ThreadPoolExecutor.CallerRunsPolicy());
+        try {
+            changeAndSave(pool);
+        } finally {
+            pool.shutdown();
+            assertTrue(pool.awaitTermination(10, TimeUnit.SECONDS));
+        }
+    }
+
+    // whether the thread is writing the JSON file
+    private static boolean isWriting(ThreadInfo info) {
+        for (StackTraceElement frame: info.getStackTrace()) {
+            if (frame.getMethodName().equals("writeFileAtomically")) {
+                return true;
+            }
+        }
+        return false;
+    }
+
+    // changes the configuration in a thread, saving each change with a debounced policy, while the test thread
+    // samples the thread of the debounced saves, and checks that it never holds the lock of the configuration
+    // while it writes the file. Then checks that the last revision is the one in the file
+    @Test(timeout = 30000)
+    public void debouncedSaveDoesNotLockConfiguration() throws Exception {
+        final String path = copySample();
+        final TestBase conf = new TestBase(path, false, false);
+        conf.setSavePolicy(SavePolicy.debounced(1, true));
+
+        final StringBuffer errMsgs = new StringBuffer();
+        final int[] changes = new int[1];
+        final boolean[] stop = new boolean[1];
+        Thread changer = new Thread(() -> {
+            while (true) {
+                synchronized (stop) {
+                    if (stop[0]) {
+                        break;
+                    }
+                }
+                StringBuffer errMsg = new StringBuffer();
+                JsonSchema.SetErr rc = conf.update(0, "s", "\"" + changes[0] + "\"", false, true, new Object[1],
+                        errMsg);
+                if (rc != JsonSchema.SetErr.OK) {
+                    errMsgs.append(rc + ": " + errMsg + "\n");
+                    break;
+                }
+                changes[0]++;
+            }
+        });
+        changer.start();
+
+        ThreadMXBean mx = ManagementFactory.getThreadMXBean();
+        int confHash = System.identityHashCode(conf);
+        int inWrite = 0;
+        int locked = 0;
+        long deadline = System.currentTimeMillis() + 20000;
+        while (inWrite < SAMPLES_IN_WRITE && System.currentTimeMillis() < deadline && changer.isAlive()) {
+            for (ThreadInfo info: mx.dumpAllThreads(true, false)) {
+                if (!info.getThreadName().equals("json-schema-debounced-save") || !isWriting(info)) {
+                    continue;
+                }
+                inWrite++;
+                for (MonitorInfo m: info.getLockedMonitors()) {
+                    if (m.getIdentityHashCode() == confHash && m.getClassName().equals(TestBase.class.getName())) {
+                        locked++;
+                    }
+                }
+            }
+        }
+
+        synchronized (stop) {
+            stop[0] = true;
+        }
+        changer.join();
+        assertEquals("", errMsgs.toString());
+        assertTrue("no debounced write was sampled", inWrite > 0);
+        assertEquals("samples of a debounced write holding the lock of the configuration", 0, locked);
+
+        int rev = conf.save().get(10, TimeUnit.SECONDS);
+        assertEquals(1 + changes[0], rev);
+
+        TestBase saved = new TestBase(path, false, false);
+        assertEquals(conf.s(), saved.s());
+    }
+}
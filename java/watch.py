@@ -0,0 +1,156 @@
+import os
+import time
+import hashlib
+import traceback
+
+from common import commentedJson, cache
+from . import generator, batch
+
+POLL_INTERVAL = 0.5     # seconds
+DEBOUNCE = 0.3          # seconds without changes before regenerating
+
+# JSON documents of the schema files, kept while their contents stay the same, so that a file included by
+# several schemas or unchanged since the previous generation is not read into a document again.
+# schemaParser.parse does not modify the documents, so they can be shared by parses.
+class _DocCache:
+    def __init__(self):
+        self._docs = {}     # path -> (digest of the content, document)
+
+    def load(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+
+        cached = self._docs.get(path)
+        if cached != None and cached[0] == digest:
+            return cached[1]
+
+        doc = commentedJson.loads(data.decode('utf-8'), path)
+        self._docs[path] = (digest, doc)
+        return doc
+
+def _getStamp(path):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return None
+
+def _getDigest(path):
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+# Resident generator of the schemas of a manifest, which polls their schema files and generated files and
+# regenerates the schemas whose inputs have changed, or whose outputs have been changed or removed by hand.
+#
+# Schema files are compared by their contents once their stamps (modification time and size) change, so that
+# touching a file does not regenerate anything. Changes are coalesced until no more of them come for the
+# debounce interval, as editors and checkouts write several files or the same file several times in a row.
+class Watcher:
+
+    def __init__(self, entries, cacheDir, pollInterval=POLL_INTERVAL, debounce=DEBOUNCE):
+        self._entries = entries
+        self._cacheDir = cacheDir
+        self._pollInterval = pollInterval
+        self._debounce = debounce
+        self._docs = _DocCache()
+        self._irs = cache.MemoryIrCache()  # so that schemas whose files have not changed are not parsed again
+
+        self._inputs = {}       # schema name -> set of schema files
+        self._outputs = {}      # schema name -> set of generated files
+        for e in entries:
+            name = e[batch.MKEY_NAME]
+            self._inputs[name] = set(e[batch.MKEY_SCHEMA_FILES])
+            self._outputs[name] = set(generator.getOutputs(name, e[batch.MKEY_SAMPLE_DIR],
+                    e[batch.MKEY_PKG_ROOT_DIR], e[batch.MKEY_CLASS_PKG], e[batch.MKEY_INTERFACE_PKG],
+                    resourceDir=e[batch.MKEY_RESOURCE_DIR]).values())
+        self._allInputs = set().union(*self._inputs.values())
+
+        self._stamps = {}       # path -> stamp at the last scan
+        self._digests = {}      # schema file -> digest of its content at the last scan
+
+    def _getPaths(self):
+        paths = set()
+        for name in self._inputs:
+            paths |= self._inputs[name] | self._outputs[name]
+        return sorted(paths)
+
+    # return the paths changed since the last scan
+    def _scan(self, paths):
+        changed = set()
+        for path in paths:
+            stamp = _getStamp(path)
+            if stamp == self._stamps.get(path, -1):
+                continue
+            self._stamps[path] = stamp
+
+            if path in self._allInputs:
+                digest = _getDigest(path)
+                if digest == self._digests.get(path, -1):
+                    continue
+                self._digests[path] = digest
+            changed.add(path)
+        return changed
+
+    def _generate(self, entries):
+        failed = []
+        for e in entries:
+            name = e[batch.MKEY_NAME]
+            print('=== ' + name)
+            try:
+                outputs = generator.generate(name, e[batch.MKEY_SAMPLE_DIR], e[batch.MKEY_PKG_ROOT_DIR],
+                        e[batch.MKEY_CLASS_PKG], e[batch.MKEY_INTERFACE_PKG], self._cacheDir,
+                        e[batch.MKEY_SCHEMA_FILES], shareStructs=e[batch.MKEY_SHARE_STRUCTS],
+                        split=e[batch.MKEY_SPLIT], resourceDir=e[batch.MKEY_RESOURCE_DIR],
+                        loadFile=self._docs.load, memIrCache=self._irs)
+                # split files come and go with the structs of the schema
+                self._outputs[name] = set(outputs.values())
+            except generator.ArgError as err:
+                print('error: ' + str(err))
+                failed.append(name)
+            except Exception:
+                print(traceback.format_exc().rstrip('\n'))
+                failed.append(name)
+
+            # what has just been generated is not a change
+            self._scan(sorted(self._outputs[name]))
+
+        print('')
+        print(str(len(entries) - len(failed)) + ' schema(s) generated, ' + str(len(failed)) + ' failed' +
+              ((': ' + ', '.join(failed)) if failed else ''))
+
+    # coalesce the changes following the given ones until none comes for the debounce interval
+    def _waitForQuiet(self, paths, changed):
+        quietSince = time.monotonic()
+        while time.monotonic() - quietSince < self._debounce:
+            time.sleep(min(self._pollInterval, self._debounce))
+            more = self._scan(paths)
+            if more:
+                changed |= more
+                quietSince = time.monotonic()
+        return changed
+
+    # generate all the schemas, then regenerate them as their files change, until interrupted
+    def run(self):
+        self._scan(self._getPaths())
+        self._generate(self._entries)
+        paths = self._getPaths()
+        print('watching ' + str(len(paths)) + ' files of ' + str(len(self._entries)) + ' schema(s), ' +
+              'press Ctrl-C to stop')
+
+        while True:
+            time.sleep(self._pollInterval)
+            changed = self._scan(paths)
+            if not changed:
+                continue
+            changed = self._waitForQuiet(paths, changed)
+
+            print('')
+            print(time.strftime('%H:%M:%S') + ' changed: ' + ', '.join(sorted(changed)))
+            affected = [ e for e in self._entries
+                         if (self._inputs[e[batch.MKEY_NAME]] | self._outputs[e[batch.MKEY_NAME]]) & changed ]
+            self._generate(affected)
+            paths = self._getPaths()
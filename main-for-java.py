@@ -1,49 +1,53 @@
 import getopt, sys, os
 
-from common import schemaParser, sampleGenerator
-from java import misc, loaderGenerator
+from java import generator
+from common import profiler
+
+_CACHE_DIR_ENV = 'JSON_SCHEMA_CACHE_DIR'
 
 def _printUsage():
     print('usage:')
     print('python3 -m json-schema/java <schema name> <sample directory> <package root directory> ' +
-          '<class package> [ -i|--interface-package <interface package> ] <schema file> ...')
-
-def _checkArgs(schemaName, sampleDir, pkgRootDir, clasPkg, intfPkg, schemaFiles):
+          '<class package> [ -i|--interface-package <interface package> ] [ -c|--cache-dir <cache directory> ] ' +
+          '[ -j|--jobs <number of processes> ] [ -s|--share-structs ] [ --split ] ' +
+          '[ -r|--resource-dir <resource root directory> ] [ --profile ] ' +
+          '[ --profile-report <JSON file> ] [ --cprofile <pstats file> ] <schema file> ...')
     print('')
-    print('  schema name: ' + schemaName)
-    print('   sample dir: ' + sampleDir)
-    print(' pkg root dir: ' + pkgRootDir)
-    print('    class pkg: ' + clasPkg)
-    print('interface pkg: ' + (intfPkg if intfPkg else '<none>'))
-    print(' schema files: ' + str(schemaFiles))
+    print('  The cache directory, which can be shared by several checkouts or CI workers, can also be given')
+    print('  by the environment variable ' + _CACHE_DIR_ENV + '. It also keeps the parsed schemas, so that a')
+    print('  schema generated again with other arguments is not parsed again.')
     print('')
+    print('  With more than one job, the inner classes and array methods of the implementation class are')
+    print('  rendered on a pool of processes. The generated files are the same as with one job, the default.')
+    print('')
+    print('  With --share-structs, the field comments of the sample and of the pretty-printed configuration')
+    print('  refer to named structs by name, and define each of them once, instead of expanding them in place.')
+    print('')
+    print('  With --split, the classes of the structs and the array methods are written to package-private')
+    print('  classes of their own in the class package, and the interfaces of the structs to public interfaces')
+    print('  of their own in the interface package, rather than nested in the implementation class and the')
+    print('  interface. Struct names must then be unique among the schemas generated in the same packages, and')
+    print('  the files of structs removed from a schema are left to be removed by hand.')
+    print('')
+    print('  With a resource root directory, such as src/main/resources, the schema and the field comments')
+    print('  are written to compact JSON resources in the class package there, which the implementation')
+    print('  class reads when they are first used, instead of to string constants in the class, which are')
+    print('  parsed when the class is loaded and cannot exceed 65535 bytes.')
+    print('')
+    print('  --profile prints the wall time, CPU time and peak of traced memory of every phase. The profile')
+    print('  is also written to the JSON file given by --profile-report, and the whole run is profiled by')
+    print('  cProfile with --cprofile. Both of them imply --profile.')
 
-    # sample dir must exist
-    if not os.path.isdir(sampleDir):
-        print('error: ' + sampleDir + ' is not an existing directory');
-        sys.exit(1)
-
-    # package root dir must exist
-    if not os.path.isdir(pkgRootDir):
-        print('error: ' + pkgRootDir + ' is not an existing directory');
+def _parseJobs(a):
+    try:
+        jobs = int(a)
+    except ValueError:
+        jobs = 0
+    if jobs < 1:
+        print('error: number of processes must be a positive integer: ' + a)
+        _printUsage()
         sys.exit(1)
-
-    # class dir must exist
-    clasDir = pkgRootDir + '/' + clasPkg.replace('.', '/')
-    if not os.path.isdir(clasDir):
-        print('creating a directory ' + clasDir + ' to put the generated implementation class file in');
-        os.makedirs(clasDir)
-
-    # interface dir must exist
-    if intfPkg:
-        intfDir = pkgRootDir + '/' + intfPkg.replace('.', '/')
-        if not os.path.isdir(intfDir):
-            print('creating a directory ' + intfDir + ' to put the generated interface file in');
-            os.makedirs(intfDir)
-    else:
-        intfDir = None
-
-    return (clasDir, intfDir)
+    return jobs
 
 def main():
     if len(sys.argv) < 6:
@@ -56,74 +60,65 @@ def main():
     clasPkg = sys.argv[4]
 
     try:
-        opts, schemaFiles = getopt.getopt(sys.argv[5:], "i:", ['interface-package='])
+        opts, schemaFiles = getopt.getopt(sys.argv[5:], "i:c:j:sr:", ['interface-package=', 'cache-dir=', 'jobs=',
+                                                                    'share-structs', 'split', 'resource-dir=',
+                                                                    'profile', 'profile-report=', 'cprofile='])
     except getopt.GetoptError as err:
         print(err)
         _printUsage()
         sys.exit(1)
 
     intfPkg = None  # default is not to generate an interface
+    cacheDir = os.environ.get(_CACHE_DIR_ENV)   # default is not to use a cache
+    jobs = 1
+    shareStructs = False
+    split = False
+    resourceDir = None
+    profile = False
+    profileReport = None
+    cProfilePath = None
 
     for o, a in opts:
         if o == '-i' or o == '--interface-package':
             intfPkg = a
+        elif o == '-c' or o == '--cache-dir':
+            cacheDir = a
+        elif o == '-j' or o == '--jobs':
+            jobs = _parseJobs(a)
+        elif o == '-s' or o == '--share-structs':
+            shareStructs = True
+        elif o == '--split':
+            split = True
+        elif o == '-r' or o == '--resource-dir':
+            resourceDir = a
+        elif o == '--profile':
+            profile = True
+        elif o == '--profile-report':
+            profile = True
+            profileReport = a
+        elif o == '--cprofile':
+            profile = True
+            cProfilePath = a
         else:
             assert False, ('illegal option ' + o)
 
-    (clasDir, intfDir) = _checkArgs(schemaName, sampleDir, pkgRootDir, clasPkg, intfPkg, schemaFiles)
-
-    (enumDef, structDef, arrElemTypes) = schemaParser.parse(schemaName, schemaFiles)
-
-    samplePath = sampleDir + '/' + schemaName + '.sample.json'
-    fldComments = sampleGenerator.generate(samplePath, enumDef, structDef, schemaName)
-    assert fldComments != None
-
-    genIntf = (intfPkg != None)
-
-    if genIntf:
-        # create a java file defining the interface
-        intfName = misc.getIntfName(schemaName)
-        print("creating the interface file " + intfDir + '/' + intfName + '.java')
-        intfFile = misc.createJavaFile(intfName, intfPkg, intfDir, [
-                "io.github.hyunikn.jsonschemalib.UINT64"
-        ])
-        try:
-            loaderGenerator.writeIntf(intfFile, enumDef, structDef, schemaName)
-        except:
-            intfFile.close()
-            os.remove(intfFile.name)
-            raise
-
-        intfFile.close()
-
-    # create a java file defining the implementation class
-    imports = [
-        "io.github.hyunikn.jsonschemalib.*",
-        "io.github.hyunikn.jsonden.*",
-        "io.github.hyunikn.jsonden.exception.*",
-        'io.github.getify.minify.Minify',
-        'java.io.File',
-        'java.io.FileOutputStream',
-        'java.util.TreeSet',
-        'java.util.Set',
-    ]
-    if genIntf:
-        imports.append(intfPkg + '.' + intfName)
-
-    clasName = misc.getClasName(schemaName)
-    print("creating the implementation class file " + clasDir + '/' + clasName + '.java')
-    clasFile = misc.createJavaFile(clasName, clasPkg, clasDir, imports)
+    if profile:
+        profiler.start(cProfilePath)
     try:
-        clasDef = loaderGenerator.getClassDef(schemaName, enumDef, structDef, arrElemTypes, genIntf, fldComments)
-        clasFile.write(clasDef)
-    except:
-        clasFile.close()
-        os.remove(clasFile.name)
-        raise
+        generator.generate(schemaName, sampleDir, pkgRootDir, clasPkg, intfPkg, cacheDir, schemaFiles, jobs,
+                           shareStructs, split, resourceDir)
+    except generator.ArgError as err:
+        print('error: ' + str(err))
+        sys.exit(1)
 
-    clasFile.close()
+    if profile:
+        report = profiler.stop()
+        report['schema'] = schemaName
+        profiler.printReport(report)
+        if profileReport:
+            profiler.writeReport(report, profileReport)
 
 if __name__ == '__main__':
     main()
-else:
+elif __name__ != '__mp_main__':     # worker processes started by 'spawn' import this as __mp_main__
     raise Exception('can only be run')